@@ -8,10 +8,16 @@ Gera roteiro, imagens e audio usando Gemini API
 import json
 import sys
 import os
+import re
 import base64
+import bisect
+import binascii
+import struct
 import wave
+import time
+import threading
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # Configuracoes
 # Todas as 30 vozes disponiveis no Gemini TTS
@@ -33,8 +39,62 @@ VOZES_GEMINI = {
 
 IDIOMAS = {"Portugues": "pt-BR", "Ingles": "en-US", "Espanhol": "es-ES"}
 
+# Modelos usados (texto, imagem, TTS) e a chave de cada um em apiUsage
+MODELO_TEXTO = "gemini-2.0-flash"
+MODELO_IMAGEM = "gemini-2.5-flash-image"
+MODELO_TTS = "gemini-2.5-flash-preview-tts"
+USO_API_POR_MODELO = {MODELO_TEXTO: "texto", MODELO_IMAGEM: "imagens", MODELO_TTS: "tts"}
+
+# Chamadas simultaneas por modelo (por execucao, ou para o lote inteiro em generate_batch)
+LIMITES_POR_MODELO = {MODELO_TEXTO: 8, MODELO_IMAGEM: 5, MODELO_TTS: 3}
+
+# Erros transitorios da API que valem nova tentativa (quota, sobrecarga, timeout):
+# codigo HTTP / status do google.genai.errors.APIError, e falhas de rede do httpx (sem codigo)
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+STATUS_TRANSITORIOS = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+ERROS_REDE_TRANSITORIOS = {"TransportError", "TimeoutException"}  # Bases dos erros de rede do httpx
+
+# Formato do audio retornado pelo Gemini TTS: PCM 24kHz 16-bit mono
+TTS_SAMPLE_RATE = 24000
+TTS_SAMPLE_WIDTH = 2
+TTS_CHANNELS = 1
+
+# Tamanho dos chunks de TTS (em caracteres)
+TTS_CHUNK_ALVO = 1800
+TTS_CHUNK_MAX = 2000
+
+# Abreviacoes que terminam em ponto mas nao encerram a frase (por codigo de IDIOMAS)
+ABREVIACOES = {
+    "pt-BR": {"sr", "sra", "srta", "dr", "dra", "prof", "profa", "etc", "av", "pag", "ex", "aprox", "vs", "obs"},
+    "en-US": {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "etc", "vs", "approx", "no", "fig", "inc"},
+    "es-ES": {"sr", "sra", "srta", "dr", "dra", "prof", "ud", "uds", "etc", "pag", "aprox", "vs", "av"},
+}
+
+# Fronteiras de corte, em ordem de preferencia: paragrafo > frase > clausula
+_FRONTEIRAS = re.compile(
+    r'(?P<paragrafo>\n[ \t]*\n)'
+    r'|(?P<frase>[.!?\u2026]+["\'\u201d\u2019\u00bb)\]]*(?=\s|$)|\n)'
+    r'|(?P<clausula>[,;:\u2014\u2013](?=\s))'
+)
+_PRIORIDADE = {"paragrafo": 3, "frase": 2, "clausula": 1}
+
+# Emenda das partes de audio: pausa entre as falas e crossfade na juncao
+EMENDA_PAUSA_MS = 250
+EMENDA_CROSSFADE_MS = 30
+EMENDA_LIMIAR_DBFS = -45  # Abaixo disso a janela conta como silencio
+
+# Legendas (SRT): trechos de no maximo duas linhas de ~42 chars
+SRT_CHARS_ALVO = 60
+SRT_CHARS_MAX = 84
+SRT_JANELA_MS = 20  # Janela da energia de curto prazo
+SRT_PAUSA_MIN_MS = 120  # Silencio minimo para contar como pausa entre frases
+
 ASPECTOS = {"16:9": "16:9", "9:16": "9:16", "1:1": "1:1", "4:3": "4:3", "3:4": "3:4"}
 
+# Resolucao final das imagens por aspecto (pos-processamento com Pillow)
+RESOLUCOES_ASPECTO = {"16:9": (1920, 1080), "9:16": (1080, 1920), "1:1": (1080, 1080),
+                      "4:3": (1440, 1080), "3:4": (1080, 1440)}
+
 ESTILOS_IMAGEM = {
     "Fotografia Profissional": {
         "prefix": "A professional 4K HDR photo of",
@@ -98,8 +158,1115 @@ def update_progress(progress_file, progress, status, log_msg=None, project_path=
         json.dump(data, f, ensure_ascii=False)
 
 
-def generate_content(params):
-    """Gera conteudo completo: roteiro, imagens e audio"""
+def _eh_abreviacao(texto, pos, abreviacoes):
+    """Verifica se o ponto em texto[pos] fecha uma abreviacao ou inicial (ex: 'Dr.', 'J.')"""
+    if texto[pos] != '.':
+        return False
+    inicio = pos
+    while inicio > 0 and pos - inicio < 8 and texto[inicio - 1].isalpha():
+        inicio -= 1
+    palavra = texto[inicio:pos]
+    if not palavra:
+        return False
+    return palavra.lower() in abreviacoes or (len(palavra) == 1 and palavra.isupper())
+
+
+def _listar_fronteiras(texto, idioma):
+    """Lista [(posicao_de_corte, prioridade), ...] em ordem, numa unica passada"""
+    abreviacoes = ABREVIACOES.get(idioma, ABREVIACOES["pt-BR"])
+    fronteiras = []
+    for m in _FRONTEIRAS.finditer(texto):
+        tipo = m.lastgroup
+        if tipo == "frase" and _eh_abreviacao(texto, m.start(), abreviacoes):
+            continue
+        # Paragrafo corta antes da quebra; frase e clausula logo depois da pontuacao
+        fronteiras.append((m.start() if tipo == "paragrafo" else m.end(), _PRIORIDADE[tipo]))
+    return fronteiras
+
+
+def _pular_espacos(texto, pos):
+    while pos < len(texto) and texto[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _recuar_espacos(texto, pos, limite):
+    while pos > limite and texto[pos - 1].isspace():
+        pos -= 1
+    return pos
+
+
+def dividir_frases(texto, idioma="pt-BR"):
+    """Divide o texto em frases (e paragrafos). Retorna offsets [(inicio, fim), ...]"""
+    frases = []
+    inicio = _pular_espacos(texto, 0)
+    for pos, prioridade in _listar_fronteiras(texto, idioma):
+        if prioridade < _PRIORIDADE["frase"] or pos <= inicio:
+            continue
+        fim = _recuar_espacos(texto, pos, inicio)
+        if fim > inicio:
+            frases.append((inicio, fim))
+        inicio = _pular_espacos(texto, pos)
+    fim = _recuar_espacos(texto, len(texto), inicio)
+    if fim > inicio:
+        frases.append((inicio, fim))
+    return frases
+
+
+def segmentar_texto(texto, alvo=TTS_CHUNK_ALVO, maximo=TTS_CHUNK_MAX, idioma="pt-BR"):
+    """
+    Divide o texto em trechos de ate `maximo` chars, mirando em `alvo`.
+    Prefere cortar em paragrafos, depois em frases, depois em clausulas
+    (virgula, ponto e virgula...), e so em ultimo caso num espaco qualquer.
+
+    Faz uma unica passada no texto e retorna offsets [(inicio, fim), ...]
+    em vez de copias, sem espacos nas pontas de cada trecho.
+    """
+    maximo = max(1, int(maximo))
+    alvo = min(max(1, int(alvo)), maximo)
+    minimo = alvo // 2
+    n = len(texto)
+    fronteiras = _listar_fronteiras(texto, idioma)
+
+    trechos = []
+    inicio = _pular_espacos(texto, 0)
+    i = 0
+    while n - inicio > maximo:
+        janela_ini, janela_fim, alvo_abs = inicio + minimo, inicio + maximo, inicio + alvo
+
+        # Fronteiras antes da janela nunca mais serao usadas
+        while i < len(fronteiras) and fronteiras[i][0] <= janela_ini:
+            i += 1
+
+        corte, melhor = None, None
+        j = i
+        while j < len(fronteiras) and fronteiras[j][0] <= janela_fim:
+            pos, prioridade = fronteiras[j]
+            chave = (prioridade, -abs(pos - alvo_abs))
+            if melhor is None or chave > melhor:
+                corte, melhor = pos, chave
+            j += 1
+
+        if corte is None:
+            espaco = texto.rfind(' ', janela_ini, janela_fim)
+            corte = espaco if espaco > janela_ini else janela_fim
+
+        fim = _recuar_espacos(texto, corte, inicio)
+        if fim > inicio:
+            trechos.append((inicio, fim))
+        inicio = _pular_espacos(texto, corte)
+
+    fim = _recuar_espacos(texto, n, inicio)
+    if fim > inicio:
+        trechos.append((inicio, fim))
+    return trechos
+
+
+def formatar_tempo_srt(seconds):
+    """Converte segundos para formato SRT: HH:MM:SS,mmm"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def detectar_pausas(parte_path, janela_ms=SRT_JANELA_MS, pausa_min_ms=SRT_PAUSA_MIN_MS):
+    """
+    Encontra as pausas da fala num WAV do TTS pela energia de curto prazo (NumPy, vetorizado).
+    Retorna (inicio_fala, fim_fala, [(inicio_pausa, fim_pausa), ...]) em segundos,
+    ou None se o NumPy nao estiver instalado ou o audio nao tiver contraste fala/silencio.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+
+    with wave.open(parte_path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            return None
+        taxa = wav.getframerate()
+        canais = wav.getnchannels()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+    if canais > 1:
+        pcm = pcm[:len(pcm) // canais * canais].reshape(-1, canais).mean(axis=1)
+
+    janela = max(1, taxa * janela_ms // 1000)
+    n = len(pcm) // janela
+    if n < 2:
+        return None
+    blocos = pcm[:n * janela].astype(np.float32).reshape(n, janela)
+    energia = 10 * np.log10(np.mean(blocos * blocos, axis=1) + 1.0)
+
+    # Limiar entre o piso de ruido e o nivel tipico da fala
+    piso, fala = np.percentile(energia, 5), np.percentile(energia, 90)
+    if fala - piso < 12:
+        return None
+    silencio = energia < max(piso + 6, fala - 30)
+
+    com_fala = np.flatnonzero(~silencio)
+    primeiro, ultimo = com_fala[0], com_fala[-1] + 1
+    segundos = janela / taxa
+
+    # Trechos de silencio entre a primeira e a ultima janela com fala
+    bordas = np.diff(np.concatenate(([0], silencio[primeiro:ultimo].astype(np.int8), [0])))
+    inicios = np.flatnonzero(bordas == 1) + primeiro
+    fins = np.flatnonzero(bordas == -1) + primeiro
+    longas = (fins - inicios) * janela_ms >= pausa_min_ms
+    pausas = [(float(a * segundos), float(b * segundos)) for a, b in zip(inicios[longas], fins[longas])]
+    return float(primeiro * segundos), float(ultimo * segundos), pausas
+
+
+def dividir_legendas(texto, idioma="pt-BR"):
+    """Divide o texto em legendas: uma por frase, e frases longas em trechos de ate SRT_CHARS_MAX"""
+    legendas = []
+    for ini, fim in dividir_frases(texto, idioma):
+        if fim - ini <= SRT_CHARS_MAX:
+            legendas.append(texto[ini:fim])
+        else:
+            frase = texto[ini:fim]
+            legendas.extend(frase[a:b] for a, b in segmentar_texto(frase, SRT_CHARS_ALVO, SRT_CHARS_MAX, idioma))
+    return [" ".join(l.split()) for l in legendas]
+
+
+def alinhar_legendas(texto, duracao, pausas=None, idioma="pt-BR"):
+    """
+    Distribui as legendas de uma parte no tempo do audio dela.
+    Cada corte comeca na estimativa proporcional ao numero de caracteres e, com `pausas`
+    (detectar_pausas), vai para a pausa mais proxima dentro da tolerancia.
+    Retorna [(inicio, fim, texto), ...] em segundos relativos ao inicio da parte.
+    """
+    legendas = dividir_legendas(texto, idioma)
+    if not legendas or duracao <= 0:
+        return []
+    fala_ini, fala_fim, lista = pausas if pausas else (0.0, duracao, [])
+    fala = fala_fim - fala_ini
+    centros = [(a + b) / 2 for a, b in lista]
+    total = sum(len(l) for l in legendas)
+
+    resultado = []
+    inicio = fala_ini
+    ultimo_centro = fala_ini
+    acumulado = 0
+    for legenda in legendas[:-1]:
+        acumulado += len(legenda)
+        estimativa = fala_ini + fala * acumulado / total
+        tolerancia = max(0.6, 0.5 * fala * len(legenda) / total)
+        escolhida = None
+        k = bisect.bisect_left(centros, estimativa)
+        for j in (k - 1, k):
+            if 0 <= j < len(centros) and centros[j] > ultimo_centro and abs(centros[j] - estimativa) <= tolerancia:
+                if escolhida is None or abs(centros[j] - estimativa) < abs(centros[escolhida] - estimativa):
+                    escolhida = j
+        if escolhida is None:
+            fim, proximo = estimativa, estimativa
+        else:
+            fim, proximo = lista[escolhida]
+            ultimo_centro = centros[escolhida]
+        fim = max(fim, inicio)
+        resultado.append((inicio, fim, legenda))
+        inicio = max(proximo, fim)
+    resultado.append((inicio, max(fala_fim, inicio), legendas[-1]))
+    return resultado
+
+
+def montar_srt(chunks, partes, idioma="pt-BR"):
+    """
+    Monta o SRT com legendas por frase a partir dos chunks e do audio de cada parte, sem chamadas de rede.
+    partes: [(parte_path, duracao, corte_inicio), ...] na ordem dos chunks (duracao 0 = parte sem audio;
+    corte_inicio = segundos cortados do comeco da parte pela emenda, ver duracoes.json).
+    Retorna (texto_srt, total_legendas, alinhamento) onde alinhamento e "energia" ou "proporcional".
+    """
+    linhas = []
+    numero = 0
+    offset = 0.0
+    por_energia = 0
+    for chunk_text, (parte_path, duracao, corte_inicio) in zip(chunks, partes):
+        if duracao <= 0:
+            continue
+        pausas = detectar_pausas(parte_path) if parte_path and os.path.exists(parte_path) else None
+        por_energia += pausas is not None
+        for inicio, fim, legenda in alinhar_legendas(chunk_text, duracao + corte_inicio, pausas, idioma):
+            inicio = min(max(inicio - corte_inicio, 0.0), duracao)
+            fim = min(max(fim - corte_inicio, inicio), duracao)
+            numero += 1
+            linhas.append(f"{numero}")
+            linhas.append(f"{formatar_tempo_srt(offset + inicio)} --> {formatar_tempo_srt(offset + fim)}")
+            linhas.append(legenda)
+            linhas.append("")  # Linha em branco
+        offset += duracao
+    return "\n".join(linhas), numero, "energia" if por_energia else "proporcional"
+
+
+def instrucoes_posicao(parte_num, num_partes):
+    """Instrucoes de abertura/fechamento conforme a posicao da parte (pt, en, es)"""
+    is_primeira = parte_num == 0
+    is_ultima = parte_num == num_partes - 1
+    if is_primeira and is_ultima:
+        pos_pt = "Comece de forma impactante e termine com call-to-action"
+        pos_en = "Start with an impactful hook and end with a call-to-action"
+        pos_es = "Comienza de forma impactante y termina con call-to-action"
+    elif is_primeira:
+        pos_pt = "Comece de forma impactante. NAO conclua ainda."
+        pos_en = "Start with an impactful hook. DO NOT conclude yet."
+        pos_es = "Comienza de forma impactante. NO concluyas aun."
+    elif is_ultima:
+        pos_pt = "Continue e termine com call-to-action forte"
+        pos_en = "Continue and end with a strong call-to-action"
+        pos_es = "Continua y termina con un call-to-action fuerte"
+    else:
+        pos_pt = "Continue desenvolvendo. NAO conclua ainda."
+        pos_en = "Continue developing. DO NOT conclude yet."
+        pos_es = "Continua desarrollando. NO concluyas aun."
+    return pos_pt, pos_en, pos_es
+
+
+def montar_prompt_outline(tema, instrucoes, idioma, num_partes):
+    """Prompt que pede o esboco do roteiro: um ponto (beat) por parte, em JSON"""
+    if idioma == "Ingles":
+        return f"""Create the OUTLINE of a narration script for a video about: {tema}
+{f'Instructions: {instrucoes}' if instrucoes else ''}
+Return EXACTLY {num_partes} beats, one per part, in narrative order (hook first, call-to-action last).
+Each beat: 1-2 sentences describing what that part covers.
+Return ONLY a JSON array of {num_partes} strings, in English."""
+    elif idioma == "Espanhol":
+        return f"""Crea el ESQUEMA de una narracion para video sobre: {tema}
+{f'Instrucciones: {instrucoes}' if instrucoes else ''}
+Devuelve EXACTAMENTE {num_partes} puntos, uno por parte, en orden narrativo (gancho primero, call-to-action al final).
+Cada punto: 1-2 frases describiendo lo que cubre esa parte.
+Devuelve SOLO un array JSON de {num_partes} strings, en espanol."""
+    return f"""Crie o ESBOCO de uma narracao para video sobre: {tema}
+{f'Instrucoes: {instrucoes}' if instrucoes else ''}
+Retorne EXATAMENTE {num_partes} partes, uma por trecho, em ordem narrativa (gancho primeiro, call-to-action no final).
+Cada parte: 1-2 frases descrevendo o que aquele trecho aborda.
+Retorne APENAS um array JSON com {num_partes} strings, em portugues."""
+
+
+def parse_outline(texto, num_partes):
+    """Extrai a lista de beats da resposta do esboco. Retorna None se nao vier no formato esperado"""
+    texto = (texto or "").strip()
+    inicio, fim = texto.find('['), texto.rfind(']')
+    beats = None
+    if inicio != -1 and fim > inicio:
+        try:
+            beats = json.loads(texto[inicio:fim + 1])
+        except ValueError:
+            beats = None
+    if not isinstance(beats, list):
+        # Fallback: uma linha por beat ("1. ...", "- ...")
+        beats = [re.sub(r'^\s*(?:\d+[.)]|[-*])\s*', '', l).strip() for l in texto.splitlines()]
+        beats = [b for b in beats if len(b) > 10]
+    beats = [str(b).strip() for b in beats if str(b).strip()]
+    if len(beats) < num_partes:
+        return None
+    return beats[:num_partes]
+
+
+def montar_prompt_parte_outline(tema, instrucoes, idioma, outline, parte_num, chars_por_parte):
+    """Prompt de uma parte no modo paralelo: esboco completo + beats vizinhos no lugar do texto anterior"""
+    num_partes = len(outline)
+    pos_pt, pos_en, pos_es = instrucoes_posicao(parte_num, num_partes)
+    esboco = "\n".join(f"{i + 1}. {b}" for i, b in enumerate(outline))
+    anterior = outline[parte_num - 1] if parte_num > 0 else ""
+    seguinte = outline[parte_num + 1] if parte_num < num_partes - 1 else ""
+
+    if idioma == "Ingles":
+        return f"""Write a narration script for a video about: {tema}
+LENGTH: ~{chars_por_parte} characters. Part {parte_num + 1}/{num_partes}.
+{f'Instructions: {instrucoes}' if instrucoes else ''}
+OUTLINE:
+{esboco}
+THIS PART COVERS ONLY: {outline[parte_num]}
+{f'PREVIOUS PART COVERED: {anterior} (do not repeat it)' if anterior else ''}
+{f'NEXT PART WILL COVER: {seguinte} (do not anticipate it)' if seguinte else ''}
+RULES: Write ONLY spoken text. NO visual instructions or timestamps. {pos_en}
+Return ONLY narration text in English."""
+    elif idioma == "Espanhol":
+        return f"""Escribe narracion para video sobre: {tema}
+LONGITUD: ~{chars_por_parte} chars. Parte {parte_num + 1}/{num_partes}.
+{f'Instrucciones: {instrucoes}' if instrucoes else ''}
+ESQUEMA:
+{esboco}
+ESTA PARTE CUBRE SOLO: {outline[parte_num]}
+{f'PARTE ANTERIOR CUBRIO: {anterior} (no lo repitas)' if anterior else ''}
+{f'PROXIMA PARTE CUBRIRA: {seguinte} (no lo anticipes)' if seguinte else ''}
+REGLAS: Solo texto hablado. SIN instrucciones visuales. {pos_es}
+Devuelve SOLO narracion en espanol."""
+    return f"""Escreva narracao para video sobre: {tema}
+TAMANHO: ~{chars_por_parte} chars. Parte {parte_num + 1}/{num_partes}.
+{f'Instrucoes: {instrucoes}' if instrucoes else ''}
+ESBOCO:
+{esboco}
+ESTA PARTE ABORDA SOMENTE: {outline[parte_num]}
+{f'PARTE ANTERIOR ABORDOU: {anterior} (nao repita)' if anterior else ''}
+{f'PROXIMA PARTE VAI ABORDAR: {seguinte} (nao antecipe)' if seguinte else ''}
+REGRAS: So texto falado. SEM instrucoes visuais. {pos_pt}
+Retorne APENAS narracao em portugues."""
+
+
+def _normalizar_frase(frase):
+    return re.sub(r'\W+', ' ', frase).strip().lower()
+
+
+def costurar_partes(partes, idioma="pt-BR"):
+    """
+    Emenda as partes geradas em paralelo sem chamar o modelo de novo:
+    se uma parte comeca repetindo as ultimas frases da anterior, remove a repeticao.
+    Retorna (partes, quantidade de emendas corrigidas).
+    """
+    corrigidas = 0
+    resultado = []
+    for parte in partes:
+        if resultado:
+            cauda = resultado[-1][-600:]
+            finais = {_normalizar_frase(cauda[ini:fim]) for ini, fim in dividir_frases(cauda, idioma)[-2:]}
+            removidas = False
+            while parte:
+                frases = dividir_frases(parte[:600], idioma)
+                if not frases or _normalizar_frase(parte[frases[0][0]:frases[0][1]]) not in finais:
+                    break
+                parte = parte[frases[0][1]:].lstrip()
+                removidas = True
+            corrigidas += removidas
+        resultado.append(parte)
+    return resultado, corrigidas
+
+
+class CanalProgresso:
+    """
+    Canal de progresso da geracao para o frontend.
+    - progress_file: snapshot JSON com o estado atual (mesmo formato de update_progress)
+    - events_file: stream NDJSON append-only, um evento por linha, para a UI acompanhar (tail)
+    Rajadas sao agrupadas: no maximo `max_escritas_por_seg` gravacoes por segundo,
+    e cada evento custa O(1) independente de quantos chunks existem.
+    """
+
+    def __init__(self, progress_file=None, events_file=None, max_escritas_por_seg=4):
+        self.progress_file = progress_file
+        self._intervalo = 1.0 / max(1, max_escritas_por_seg)
+        self._lock = threading.Lock()
+        self._eventos = []
+        self._estado = None
+        self._ultima_escrita = 0.0
+        self._timer = None
+        self._inicio = time.monotonic()
+        self._events = open(events_file, 'a', encoding='utf-8') if events_file else None
+
+    def update(self, progress, status, log_msg=None, project_path=None):
+        """Atualiza o estado (progresso + status); equivale a update_progress"""
+        evento = {"stage": "progresso", "progress": round(progress, 1), "status": status}
+        if log_msg:
+            evento["log"] = log_msg
+        if project_path:
+            evento["projectPath"] = project_path
+        self._registrar(evento, (progress, status, log_msg, project_path))
+
+    def evento(self, stage, item=None, latency=None, nbytes=None, **extra):
+        """Registra um evento de conclusao (ex: parte de roteiro, imagem, parte de audio)"""
+        evento = {"stage": stage}
+        if item is not None:
+            evento["item"] = item
+        if latency is not None:
+            evento["latency_ms"] = round(latency * 1000, 1)
+        if nbytes is not None:
+            evento["bytes"] = nbytes
+        evento.update(extra)
+        self._registrar(evento)
+
+    def _registrar(self, evento, estado=None):
+        evento["t"] = round(time.monotonic() - self._inicio, 3)
+        with self._lock:
+            if self._events:
+                self._eventos.append(evento)
+            if estado is not None:
+                self._estado = estado
+            espera = self._intervalo - (time.monotonic() - self._ultima_escrita)
+            if espera <= 0:
+                self._gravar()
+            elif self._timer is None:
+                # Garante que o fim de uma rajada chega ao disco mesmo sem novos eventos
+                self._timer = threading.Timer(espera, self._gravar_pendentes)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _gravar_pendentes(self):
+        with self._lock:
+            self._timer = None
+            self._gravar()
+
+    def _gravar(self):
+        """Grava eventos e snapshot pendentes (chamar com o lock)"""
+        if self._eventos:
+            self._events.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self._eventos))
+            self._events.flush()
+            self._eventos = []
+        if self._estado is not None and self.progress_file:
+            progress, status, log_msg, project_path = self._estado
+            update_progress(self.progress_file, progress, status, log_msg, project_path)
+            self._estado = None
+        self._ultima_escrita = time.monotonic()
+
+    def fechar(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._gravar()
+            if self._events:
+                self._events.close()
+                self._events = None
+
+
+class MetricasGeracao:
+    """
+    Metricas das chamadas aos modelos, seguras para uso a partir das threads de geracao:
+    chamadas, erros, retries, bytes recebidos e histograma de latencia por modelo.
+    Exporta resumo (p50/p95/p99) para projeto_info.json e texto no formato Prometheus.
+    Com `pai`, tudo que for registrado tambem vai para o agregado (metricas do lote).
+    """
+
+    BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+    def __init__(self, pai=None):
+        self._lock = threading.Lock()
+        self._modelos = {}
+        self._pai = pai
+
+    def _modelo(self, modelo):
+        if modelo not in self._modelos:
+            self._modelos[modelo] = {"chamadas": 0, "erros": 0, "retries": 0, "bytes": 0, "latencias": []}
+        return self._modelos[modelo]
+
+    def registrar(self, modelo, latencia, erro=False):
+        """Registra uma tentativa de chamada (com ou sem sucesso)"""
+        with self._lock:
+            m = self._modelo(modelo)
+            m["chamadas"] += 1
+            m["latencias"].append(latencia)
+            if erro:
+                m["erros"] += 1
+        if self._pai:
+            self._pai.registrar(modelo, latencia, erro)
+
+    def retry(self, modelo):
+        with self._lock:
+            self._modelo(modelo)["retries"] += 1
+        if self._pai:
+            self._pai.retry(modelo)
+
+    def adicionar_bytes(self, modelo, nbytes):
+        with self._lock:
+            self._modelo(modelo)["bytes"] += nbytes
+        if self._pai:
+            self._pai.adicionar_bytes(modelo, nbytes)
+
+    @staticmethod
+    def _percentil(ordenadas, p):
+        if not ordenadas:
+            return 0.0
+        return ordenadas[min(len(ordenadas) - 1, int(round(p / 100.0 * (len(ordenadas) - 1))))]
+
+    def uso_api(self):
+        """Chamadas bem-sucedidas por tipo (formato do apiUsage)"""
+        uso = {"texto": 0, "imagens": 0, "tts": 0}
+        with self._lock:
+            for modelo, m in self._modelos.items():
+                chave = USO_API_POR_MODELO.get(modelo, modelo)
+                uso[chave] = uso.get(chave, 0) + m["chamadas"] - m["erros"]
+        return uso
+
+    def resumo(self):
+        with self._lock:
+            resumo = {}
+            for modelo, m in self._modelos.items():
+                lat = sorted(m["latencias"])
+                resumo[modelo] = {
+                    "chamadas": m["chamadas"],
+                    "erros": m["erros"],
+                    "retries": m["retries"],
+                    "bytes": m["bytes"],
+                    "latencia_s": {
+                        "p50": round(self._percentil(lat, 50), 3),
+                        "p95": round(self._percentil(lat, 95), 3),
+                        "p99": round(self._percentil(lat, 99), 3),
+                        "media": round(sum(lat) / len(lat), 3) if lat else 0.0,
+                        "max": round(lat[-1], 3) if lat else 0.0
+                    }
+                }
+            return resumo
+
+    def prometheus(self, labels=None):
+        """Texto no formato de exposicao do Prometheus (para o textfile collector)"""
+        extra = "".join(f',{k}="{v}"' for k, v in (labels or {}).items())
+        linhas = [
+            "# HELP capcut_creator_calls_total Chamadas aos modelos (tentativas)",
+            "# TYPE capcut_creator_calls_total counter",
+        ]
+        with self._lock:
+            modelos = {k: dict(v, latencias=sorted(v["latencias"])) for k, v in self._modelos.items()}
+        for modelo, m in modelos.items():
+            linhas.append(f'capcut_creator_calls_total{{model="{modelo}"{extra}}} {m["chamadas"]}')
+        for nome, campo, ajuda in (("errors", "erros", "Chamadas com erro"),
+                                   ("retries", "retries", "Novas tentativas apos erro transitorio"),
+                                   ("bytes", "bytes", "Bytes recebidos")):
+            linhas.append(f"# HELP capcut_creator_{nome}_total {ajuda}")
+            linhas.append(f"# TYPE capcut_creator_{nome}_total counter")
+            for modelo, m in modelos.items():
+                linhas.append(f'capcut_creator_{nome}_total{{model="{modelo}"{extra}}} {m[campo]}')
+        linhas.append("# HELP capcut_creator_latency_seconds Latencia por chamada")
+        linhas.append("# TYPE capcut_creator_latency_seconds histogram")
+        for modelo, m in modelos.items():
+            lat = m["latencias"]
+            i = 0
+            for limite in self.BUCKETS:
+                while i < len(lat) and lat[i] <= limite:
+                    i += 1
+                linhas.append(f'capcut_creator_latency_seconds_bucket{{model="{modelo}",le="{limite}"{extra}}} {i}')
+            linhas.append(f'capcut_creator_latency_seconds_bucket{{model="{modelo}",le="+Inf"{extra}}} {len(lat)}')
+            linhas.append(f'capcut_creator_latency_seconds_sum{{model="{modelo}"{extra}}} {sum(lat):.6f}')
+            linhas.append(f'capcut_creator_latency_seconds_count{{model="{modelo}"{extra}}} {len(lat)}')
+        linhas.append("# HELP capcut_creator_latency_quantile_seconds Percentis de latencia da execucao")
+        linhas.append("# TYPE capcut_creator_latency_quantile_seconds gauge")
+        for modelo, m in modelos.items():
+            for q in (50, 95, 99):
+                valor = self._percentil(m["latencias"], q)
+                linhas.append(f'capcut_creator_latency_quantile_seconds{{model="{modelo}",quantile="{q / 100}"{extra}}} {valor:.6f}')
+        return "\n".join(linhas) + "\n"
+
+    def salvar_prometheus(self, path, labels=None):
+        """Grava o arquivo .prom de forma atomica (o scraper nunca le arquivo pela metade)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus(labels))
+        os.replace(temp_path, path)
+
+
+def _erro_transitorio(erro):
+    """Decide pelo codigo/status da excecao do SDK, nunca pelo texto da mensagem"""
+    codigo = getattr(erro, 'code', None)
+    if isinstance(codigo, int) and codigo in CODIGOS_TRANSITORIOS:
+        return True
+    if getattr(erro, 'status', None) in STATUS_TRANSITORIOS:
+        return True
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    return any(classe.__name__ in ERROS_REDE_TRANSITORIOS for classe in type(erro).__mro__)
+
+
+def chamar_modelo(client, metricas, modelo, contents, config=None, max_retries=2):
+    """
+    Chama client.models.generate_content registrando latencia/erros em `metricas`.
+    Erros transitorios (quota, 5xx) sao repetidos ate max_retries vezes com backoff exponencial.
+    """
+    tentativa = 0
+    while True:
+        inicio = time.perf_counter()
+        try:
+            if config is None:
+                response = client.models.generate_content(model=modelo, contents=contents)
+            else:
+                response = client.models.generate_content(model=modelo, contents=contents, config=config)
+            metricas.registrar(modelo, time.perf_counter() - inicio)
+            return response
+        except Exception as e:
+            metricas.registrar(modelo, time.perf_counter() - inicio, erro=True)
+            if tentativa >= max_retries or not _erro_transitorio(e):
+                raise
+            tentativa += 1
+            metricas.retry(modelo)
+            time.sleep(min(30, 2 ** tentativa))
+
+
+class PoolsModelos:
+    """
+    Um pool de threads por modelo. Cada tarefa submetida ocupa uma "vaga" daquele modelo,
+    entao varios projetos podem dividir o mesmo orcamento de concorrencia (generate_batch).
+    O pool de processos do pos-processamento das imagens tambem e um so, criado no primeiro uso.
+    """
+
+    def __init__(self, limites=None):
+        limites = dict(LIMITES_POR_MODELO, **(limites or {}))
+        self._executores = {
+            modelo: ThreadPoolExecutor(max_workers=max(1, int(n)), thread_name_prefix=f"pool-{modelo}")
+            for modelo, n in limites.items()
+        }
+        self._lock = threading.Lock()
+        self._processos = None
+
+    def submit(self, modelo, fn, *args, **kwargs):
+        return self._executores[modelo].submit(fn, *args, **kwargs)
+
+    def processos(self):
+        """Pool de processos (cpu_count) dividido por todas as execucoes que usam estes pools"""
+        with self._lock:
+            if self._processos is None:
+                self._processos = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+            return self._processos
+
+    def fechar(self):
+        for executor in self._executores.values():
+            executor.shutdown(wait=True)
+        if self._processos is not None:
+            self._processos.shutdown(wait=True)
+
+
+def alocar_pasta_projeto(pasta_saida):
+    """
+    Cria a proxima pasta de projeto (001, 002, ...). Usa os.mkdir, que e atomico:
+    se outra execucao criar o mesmo numero antes, tenta o seguinte.
+    """
+    existentes = [int(f) for f in os.listdir(pasta_saida)
+                  if f.isdigit() and len(f) == 3 and os.path.isdir(os.path.join(pasta_saida, f))]
+    next_num = max(existentes, default=0) + 1
+    while True:
+        projeto_pasta = os.path.join(pasta_saida, f"{next_num:03d}")
+        try:
+            os.mkdir(projeto_pasta)
+            return projeto_pasta
+        except FileExistsError:
+            next_num += 1
+
+
+def processar_imagem(tarefa):
+    """
+    Roda num processo do pool: decodifica a imagem uma vez, recorta/redimensiona para a
+    resolucao do aspecto (sem ampliar) e grava JPEG ou WebP no lugar do original.
+    """
+    index, path, largura, altura, formato, qualidade, manter_original = tarefa
+    from PIL import Image, ImageOps
+
+    try:
+        bytes_original = os.path.getsize(path)
+        with Image.open(path) as img:
+            img.draft('RGB', (largura, altura))  # JPEG: decodifica ja reduzido
+            escala = min(1.0, img.width / largura, img.height / altura)
+            tamanho = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+            saida = ImageOps.fit(img.convert('RGB'), tamanho, Image.LANCZOS)
+
+        destino = os.path.splitext(path)[0] + ('.webp' if formato == 'webp' else '.jpg')
+        temp_path = f"{destino}.tmp"
+        if formato == 'webp':
+            saida.save(temp_path, 'WEBP', quality=qualidade, method=4)
+        else:
+            saida.save(temp_path, 'JPEG', quality=qualidade, optimize=True, progressive=True)
+        os.replace(temp_path, destino)
+
+        if os.path.abspath(destino) != os.path.abspath(path):
+            if manter_original:
+                originais = os.path.join(os.path.dirname(path), "originais")
+                os.makedirs(originais, exist_ok=True)
+                os.replace(path, os.path.join(originais, os.path.basename(path)))
+            else:
+                os.remove(path)
+
+        return {"index": index, "arquivo": os.path.basename(destino), "largura": saida.width,
+                "altura": saida.height, "bytes_original": bytes_original, "bytes": os.path.getsize(destino)}
+    except Exception as e:
+        return {"index": index, "arquivo": os.path.basename(path), "erro": str(e)}
+
+
+def processar_imagens(imagens, aspecto, formato="jpg", qualidade=88, manter_originais=False,
+                      ao_concluir=None, max_workers=None, pool=None):
+    """
+    Pos-processa as imagens geradas num pool de processos (uma imagem por tarefa).
+    imagens: [(index, path), ...]. Retorna os resultados em ordem de index,
+    ou None se o Pillow nao estiver instalado (as imagens ficam como vieram).
+    pool: ProcessPoolExecutor compartilhado (PoolsModelos.processos); sem ele, cria e encerra um.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return None
+
+    largura, altura = RESOLUCOES_ASPECTO.get(aspecto, RESOLUCOES_ASPECTO["9:16"])
+    tarefas = [(index, path, largura, altura, formato, qualidade, manter_originais) for index, path in imagens]
+    if not tarefas:
+        return []
+    if pool is None:
+        workers = max(1, min(len(tarefas), max_workers or os.cpu_count() or 1))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return processar_imagens(imagens, aspecto, formato, qualidade, manter_originais, ao_concluir, pool=pool)
+    resultados = []
+    for future in as_completed([pool.submit(processar_imagem, t) for t in tarefas]):
+        resultado = future.result()
+        resultados.append(resultado)
+        if ao_concluir:
+            ao_concluir(resultado)
+    return sorted(resultados, key=lambda r: r["index"])
+
+
+def abrir_wav_tts(path):
+    """Abre um WAV para escrita no formato do Gemini TTS"""
+    wav = wave.open(path, 'wb')
+    wav.setnchannels(TTS_CHANNELS)
+    wav.setsampwidth(TTS_SAMPLE_WIDTH)
+    wav.setframerate(TTS_SAMPLE_RATE)
+    return wav
+
+
+class EscritorWavStream:
+    """
+    WAV no formato do Gemini TTS gravado conforme o audio chega (modo ttsStreaming).
+    O cabecalho comeca com tamanho zero e e corrigido a cada `intervalo_cabecalho` segundos
+    e no fechamento, entao a parte ja pode ser tocada ate onde chegou.
+    """
+
+    def __init__(self, path, intervalo_cabecalho=0.5):
+        self._f = open(path, 'wb')
+        self._resto = b''  # Byte de uma amostra dividida entre dois pedacos
+        self._intervalo = intervalo_cabecalho
+        self._ultima_correcao = time.monotonic()
+        self.bytes_escritos = 0
+        self._f.write(self._cabecalho(0))
+
+    @staticmethod
+    def _cabecalho(tamanho_dados):
+        bloco = TTS_SAMPLE_WIDTH * TTS_CHANNELS
+        return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + tamanho_dados, b'WAVE', b'fmt ', 16, 1,
+                           TTS_CHANNELS, TTS_SAMPLE_RATE, TTS_SAMPLE_RATE * bloco, bloco,
+                           TTS_SAMPLE_WIDTH * 8, b'data', tamanho_dados)
+
+    @property
+    def frames(self):
+        return self.bytes_escritos // (TTS_SAMPLE_WIDTH * TTS_CHANNELS)
+
+    def escrever(self, dados):
+        """Grava so amostras inteiras; o que sobrar fica para o proximo pedaco"""
+        if self._resto:
+            dados = self._resto + bytes(dados)
+        util = len(dados) - len(dados) % (TTS_SAMPLE_WIDTH * TTS_CHANNELS)
+        self._resto = bytes(dados[util:])
+        self._f.write(memoryview(dados)[:util])
+        self.bytes_escritos += util
+        if time.monotonic() - self._ultima_correcao >= self._intervalo:
+            self._corrigir_cabecalho()
+
+    def _corrigir_cabecalho(self):
+        pos = self._f.tell()
+        self._f.seek(0)
+        self._f.write(self._cabecalho(self.bytes_escritos))
+        self._f.seek(pos)
+        self._f.flush()
+        self._ultima_correcao = time.monotonic()
+
+    def fechar(self):
+        if not self._f.closed:
+            self._corrigir_cabecalho()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+class DecodificadorBase64:
+    """
+    Decodifica base64 que chega em pedacos de tamanho qualquer.
+    So os ate 3 caracteres que nao fecham um grupo ficam guardados entre um pedaco e outro;
+    o restante e decodificado direto de um memoryview do buffer, sem copias intermediarias.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def decodificar(self, dados):
+        if isinstance(dados, str):
+            dados = dados.encode('ascii')
+        self._buffer += dados
+        util = len(self._buffer) - len(self._buffer) % 4
+        if not util:
+            return b''
+        with memoryview(self._buffer) as view:
+            saida = binascii.a2b_base64(view[:util])
+        del self._buffer[:util]
+        return saida
+
+    def finalizar(self):
+        """Decodifica o que sobrou (resposta terminada sem padding)"""
+        if not self._buffer:
+            return b''
+        resto = bytes(self._buffer) + b'=' * (-len(self._buffer) % 4)
+        self._buffer.clear()
+        return binascii.a2b_base64(resto)
+
+
+def gravar_tts_stream(client, metricas, contents, config, parte_path, ao_primeiro_audio=None, max_retries=2):
+    """
+    Chama o TTS em streaming e grava o PCM em parte_path conforme os pedacos chegam,
+    com memoria limitada a um pedaco por parte. Retorna (frames, bytes, segundos ate o primeiro audio).
+    Erros transitorios so sao repetidos se nenhum audio tiver sido gravado ainda.
+    """
+    tentativa = 0
+    while True:
+        inicio = time.perf_counter()
+        primeiro_audio = None
+        decodificador = DecodificadorBase64()
+        try:
+            with EscritorWavStream(parte_path) as wav:
+                stream = client.models.generate_content_stream(model=MODELO_TTS, contents=contents, config=config)
+                for resposta in stream:
+                    candidatos = getattr(resposta, 'candidates', None) or []
+                    if not candidatos or not candidatos[0].content:
+                        continue
+                    for part in candidatos[0].content.parts or []:
+                        if not (hasattr(part, 'inline_data') and part.inline_data):
+                            continue
+                        dados = part.inline_data.data
+                        if isinstance(dados, str):
+                            dados = decodificador.decodificar(dados)
+                        if not dados:
+                            continue
+                        wav.escrever(dados)
+                        if primeiro_audio is None:
+                            primeiro_audio = time.perf_counter() - inicio
+                            if ao_primeiro_audio:
+                                ao_primeiro_audio(primeiro_audio)
+                wav.escrever(decodificador.finalizar())
+            metricas.registrar(MODELO_TTS, time.perf_counter() - inicio)
+            metricas.adicionar_bytes(MODELO_TTS, wav.bytes_escritos)
+            return wav.frames, wav.bytes_escritos, primeiro_audio
+        except Exception as e:
+            metricas.registrar(MODELO_TTS, time.perf_counter() - inicio, erro=True)
+            if primeiro_audio is not None or tentativa >= max_retries or not _erro_transitorio(e):
+                raise
+            tentativa += 1
+            metricas.retry(MODELO_TTS)
+            time.sleep(min(30, 2 ** tentativa))
+
+
+def _dados_wav(path):
+    """Offset e tamanho (bytes) do chunk 'data' de um WAV"""
+    with open(path, 'rb') as f:
+        cabecalho = f.read(12)
+        if len(cabecalho) < 12 or cabecalho[:4] != b'RIFF' or cabecalho[8:12] != b'WAVE':
+            raise ValueError(f"WAV invalido: {path}")
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"WAV sem dados: {path}")
+            nome, tamanho = struct.unpack('<4sI', chunk)
+            if nome == b'data':
+                inicio = f.tell()
+                return inicio, min(tamanho, os.path.getsize(path) - inicio)
+            f.seek(tamanho + (tamanho & 1), 1)
+
+
+def _limites_fala(amostras, janela, limiar, janelas_por_bloco=256):
+    """
+    Primeira e ultima amostra com fala (com resolucao de uma janela).
+    Varre so as pontas do memmap, um bloco de janelas por vez. None se a parte for so silencio.
+    """
+    import numpy as np
+
+    n = len(amostras) // janela
+
+    def janelas_com_fala(a, b):
+        blocos = np.asarray(amostras[a * janela:b * janela], dtype=np.float32).reshape(b - a, janela)
+        return np.flatnonzero(np.mean(blocos * blocos, axis=1) > limiar)
+
+    inicio = None
+    for a in range(0, n, janelas_por_bloco):
+        idx = janelas_com_fala(a, min(n, a + janelas_por_bloco))
+        if len(idx):
+            inicio = a + int(idx[0])
+            break
+    if inicio is None:
+        return None
+    fim = inicio + 1
+    for b in range(n, inicio, -janelas_por_bloco):
+        a = max(inicio, b - janelas_por_bloco)
+        idx = janelas_com_fala(a, b)
+        if len(idx):
+            fim = a + int(idx[-1]) + 1
+            break
+    return inicio * janela, fim * janela
+
+
+class ConcatenadorWav:
+    """
+    Monta o audio completo em streaming, anexando as partes em ordem
+    assim que cada uma (e todas as anteriores) estiverem prontas.
+    Le as partes do disco em blocos, entao a memoria fica constante
+    independente do tamanho do roteiro. O header RIFF e corrigido no fechamento.
+
+    Com `emenda` = (pausa_ms, crossfade_ms) e o NumPy instalado, a emenda e feita na mesma passada:
+    corta o silencio das pontas de cada parte (ficam ~pausa_ms entre as falas) e une as partes
+    com crossfade de potencia constante. So o fim da parte anterior (o crossfade) fica em memoria.
+    `info` tem a posicao de cada parte no audio completo:
+    [{index, arquivo, inicio, duracao, corte_inicio, duracao_original}, ...] em segundos.
+    """
+
+    def __init__(self, destino, total_partes, bloco_frames=65536, emenda=None):
+        self.destino = destino
+        self.bloco_frames = bloco_frames
+        self.frames_escritos = 0
+        self.info = []
+        self._partes = [None] * total_partes  # caminho da parte, ou False se falhou
+        self._proxima = 0
+        self._wav = None
+        self._np = None
+        self._pendente = None  # Fim da parte anterior, guardado para o crossfade com a proxima
+        if emenda:
+            try:
+                import numpy as np
+            except ImportError:
+                np = None
+            if np is not None:
+                pausa_ms, crossfade_ms = emenda
+                self._np = np
+                self._janela = max(1, TTS_SAMPLE_RATE * SRT_JANELA_MS // 1000)
+                self._limiar = (32768 * 10 ** (EMENDA_LIMIAR_DBFS / 20)) ** 2
+                self._crossfade = TTS_SAMPLE_RATE * crossfade_ms // 1000
+                self._margem = TTS_SAMPLE_RATE * pausa_ms // 2000 + self._crossfade // 2
+
+    @property
+    def emendado(self):
+        return self._np is not None
+
+    def parte_pronta(self, index, parte_path):
+        self._partes[index] = parte_path
+        self._anexar_disponiveis()
+
+    def parte_falhou(self, index):
+        self._partes[index] = False
+        self._anexar_disponiveis()
+
+    @property
+    def completo(self):
+        return self._proxima == len(self._partes)
+
+    def _anexar_disponiveis(self):
+        while self._proxima < len(self._partes) and self._partes[self._proxima] is not None:
+            parte_path = self._partes[self._proxima]
+            info = {"index": self._proxima + 1, "arquivo": os.path.basename(parte_path) if parte_path else None,
+                    "inicio": self.frames_escritos / TTS_SAMPLE_RATE, "duracao": 0.0,
+                    "corte_inicio": 0.0, "duracao_original": 0.0}
+            self.info.append(info)
+            if parte_path:
+                if self._wav is None:
+                    self._wav = abrir_wav_tts(self.destino)
+                if self._np is not None:
+                    self._anexar_emendado(parte_path, info)
+                else:
+                    self._anexar(parte_path, info)
+            self._proxima += 1
+        if self.completo:
+            self.fechar()
+
+    def _gravar(self, amostras):
+        np = self._np
+        for i in range(0, len(amostras), self.bloco_frames):
+            self._wav.writeframesraw(np.ascontiguousarray(amostras[i:i + self.bloco_frames], dtype='<i2').tobytes())
+        self.frames_escritos += len(amostras)
+
+    def _anexar(self, parte_path, info):
+        with wave.open(parte_path, 'rb') as src:
+            info["duracao_original"] = src.getnframes() / TTS_SAMPLE_RATE
+            while True:
+                frames = src.readframes(self.bloco_frames)
+                if not frames:
+                    break
+                self._wav.writeframesraw(frames)
+                self.frames_escritos += len(frames) // (TTS_SAMPLE_WIDTH * TTS_CHANNELS)
+
+    def _anexar_emendado(self, parte_path, info):
+        """Le a parte por memmap, corta o silencio das pontas e grava com crossfade na anterior"""
+        np = self._np
+        try:
+            offset, tamanho = _dados_wav(parte_path)
+            amostras = np.memmap(parte_path, dtype='<i2', mode='r', offset=offset,
+                                 shape=(tamanho // TTS_SAMPLE_WIDTH,))
+            limites = _limites_fala(amostras, self._janela, self._limiar)
+        except Exception as e:
+            # Parte que nao da para analisar: daqui em diante as partes entram inteiras
+            print(f"[AUDIO-WARN] Emenda das partes: {str(e)}", file=sys.stderr)
+            self._descarregar_pendente()
+            self._np = None
+            self._anexar(parte_path, info)
+            return
+
+        ini, fim = (0, len(amostras)) if limites is None else limites
+        ini, fim = max(0, ini - self._margem), min(len(amostras), fim + self._margem)
+        trecho = amostras[ini:fim]
+        info["corte_inicio"] = ini / TTS_SAMPLE_RATE
+        info["duracao_original"] = len(amostras) / TTS_SAMPLE_RATE
+
+        pendente = self._pendente
+        if pendente is not None and len(pendente):
+            k = min(len(pendente), len(trecho))
+            self._gravar(pendente[:len(pendente) - k])
+            info["inicio"] = self.frames_escritos / TTS_SAMPLE_RATE
+            t = np.linspace(0.0, np.pi / 2, k, dtype=np.float32)
+            mistura = pendente[len(pendente) - k:] * np.cos(t) + trecho[:k].astype(np.float32) * np.sin(t)
+            self._gravar(np.clip(np.rint(mistura), -32768, 32767))
+            trecho = trecho[k:]
+        else:
+            info["inicio"] = self.frames_escritos / TTS_SAMPLE_RATE
+
+        guardar = min(self._crossfade, len(trecho))
+        self._gravar(trecho[:len(trecho) - guardar])
+        self._pendente = np.asarray(trecho[len(trecho) - guardar:], dtype=np.float32)
+        del amostras
+
+    def _descarregar_pendente(self):
+        if self._pendente is not None and len(self._pendente):
+            self._gravar(self._np.rint(self._pendente))
+        self._pendente = None
+
+    def fechar(self):
+        """Grava o fim guardado para o crossfade e fecha o arquivo (o modulo wave corrige o header RIFF aqui)"""
+        if self._wav is None:
+            return
+        self._descarregar_pendente()
+        self._wav.close()
+        self._wav = None
+        # Duracao de cada parte = ate o inicio da proxima parte com audio
+        com_audio = [p for p in self.info if p["arquivo"]]
+        for atual, proxima in zip(com_audio, com_audio[1:] + [None]):
+            atual["duracao"] = (proxima["inicio"] if proxima else self.frames_escritos / TTS_SAMPLE_RATE) - atual["inicio"]
+
+
+def generate_content(params, pools=None, metricas_lote=None):
+    """
+    Gera conteudo completo: roteiro, imagens e audio.
+    `pools` permite dividir os pools por modelo com outras execucoes (generate_batch);
+    sem ele, a execucao cria e encerra os seus.
+    """
+    if pools is not None:
+        return _gerar_conteudo(params, pools, metricas_lote)
+    pools = PoolsModelos()
+    try:
+        return _gerar_conteudo(params, pools, metricas_lote)
+    finally:
+        pools.fechar()
+
+
+def _gerar_conteudo(params, pools, metricas_lote=None):
+    """
+    Executa a geracao com o canal de progresso aberto. O evento "fim" e o fechamento do
+    canal acontecem em qualquer desfecho (sucesso, erro retornado ou excecao), para a UI
+    que acompanha o stream nunca ficar esperando uma execucao que ja terminou.
+    """
+    progresso = CanalProgresso(params.get('progressFile'), params.get('eventsFile'), int(params.get('progressMaxHz', 4)))
+    resultado = {"success": False, "error": "Generation interrupted"}
+    try:
+        resultado = _executar_geracao(params, pools, metricas_lote, progresso)
+        return resultado
+    except Exception as e:
+        resultado = {"success": False, "error": str(e)}
+        raise
+    finally:
+        if resultado.get("success"):
+            progresso.evento("fim", ok=True, projectPath=resultado["projectPath"],
+                             audioPartsOk=resultado["audioPartsOk"], audioPartsTotal=resultado["audioPartsTotal"])
+        else:
+            progresso.evento("fim", ok=False, error=resultado.get("error"))
+        progresso.fechar()
+
+
+def _executar_geracao(params, pools, metricas_lote, progresso):
     try:
         from google import genai
         from google.genai import types
@@ -117,13 +1284,23 @@ def generate_content(params):
     tamanho_roteiro = int(params.get('tamanhoRoteiro', 2000))
     qtd_imagens = int(params.get('qtdImagens', 5))
     pasta_saida = params.get('pastaSaida')
-    progress_file = params.get('progressFile')
     gerar_imagens = params.get('gerarImagens', True)  # Por padrao gera imagens
 
     # Novos parametros para modo roteiro manual
     modo_roteiro = params.get('modoRoteiro', False)  # Se usuario colou o roteiro
     roteiro_chunks = params.get('roteiroChunks', [])  # Chunks ja divididos pelo frontend
     gerar_srt = params.get('gerarSRT', False)  # Se deve gerar arquivo SRT
+    roteiro_paralelo = params.get('roteiroParalelo', False)  # Esboco + partes em paralelo
+    tts_streaming = params.get('ttsStreaming', False)  # Grava o audio conforme chega do TTS
+    otimizar_imagens = params.get('otimizarImagens', True)  # Recorta/redimensiona e converte as imagens
+    formato_imagem = params.get('formatoImagem', 'jpg')  # 'jpg' ou 'webp'
+    qualidade_imagem = int(params.get('qualidadeImagem', 88))
+    manter_originais = params.get('manterOriginais', False)  # Guarda os PNGs em imagens/originais
+    emenda_suave = params.get('emendaSuave', True)  # Corta silencio e faz crossfade entre as partes
+    pausa_entre_partes = int(params.get('pausaEntrePartesMs', EMENDA_PAUSA_MS))
+    crossfade_ms = int(params.get('crossfadeMs', EMENDA_CROSSFADE_MS))
+    tts_chunk_alvo = int(params.get('ttsChunkAlvo', TTS_CHUNK_ALVO))
+    tts_chunk_max = int(params.get('ttsChunkMax', TTS_CHUNK_MAX))
 
     if not api_key:
         return {"success": False, "error": "API Key not provided"}
@@ -133,21 +1310,16 @@ def generate_content(params):
     # Criar cliente
     client = genai.Client(api_key=api_key)
 
-    # Contadores de uso da API
-    api_usage = {
-        "texto": 0,    # Chamadas de geracao de texto (gemini-2.0-flash)
-        "imagens": 0,  # Chamadas de geracao de imagem (gemini-2.5-flash-preview-image)
-        "tts": 0       # Chamadas de TTS (gemini-2.5-flash-preview-tts)
-    }
+    # Metricas de uso da API (chamadas, latencia, bytes, retries, erros por modelo)
+    metricas = MetricasGeracao(metricas_lote)
+    max_retries = int(params.get('maxRetries', 2))
+
+    def chamar(modelo, contents, config=None):
+        """Chamada feita pela thread da execucao, ocupando uma vaga do pool do modelo"""
+        return pools.submit(modelo, chamar_modelo, client, metricas, modelo, contents, config, max_retries).result()
 
     # Criar pasta do projeto com numero sequencial (001, 002, etc)
-    existing_folders = [f for f in os.listdir(pasta_saida) if os.path.isdir(os.path.join(pasta_saida, f)) and f.isdigit() and len(f) == 3]
-    if existing_folders:
-        next_num = max(int(f) for f in existing_folders) + 1
-    else:
-        next_num = 1
-    projeto_pasta = os.path.join(pasta_saida, f"{next_num:03d}")
-    os.makedirs(projeto_pasta, exist_ok=True)
+    projeto_pasta = alocar_pasta_projeto(pasta_saida)
     os.makedirs(os.path.join(projeto_pasta, "imagens"), exist_ok=True)
 
     # Iniciar documentacao do projeto
@@ -165,12 +1337,12 @@ def generate_content(params):
         "respostas": {}
     }
 
-    update_progress(progress_file, 5, "Iniciando...", f"Projeto: {projeto_pasta}", projeto_pasta)
+    progresso.update(5, "Iniciando...", f"Projeto: {projeto_pasta}", projeto_pasta)
 
     # ========== PASSO 1: GERAR/USAR ROTEIRO ==========
     if modo_roteiro and roteiro_chunks:
         # Modo roteiro manual - usar chunks fornecidos pelo usuario
-        update_progress(progress_file, 10, "Usando roteiro fornecido...", project_path=projeto_pasta)
+        progresso.update(10, "Usando roteiro fornecido...", project_path=projeto_pasta)
 
         roteiro_partes = roteiro_chunks
         roteiro = " ".join(roteiro_partes)
@@ -195,11 +1367,11 @@ def generate_content(params):
             with open(parte_path, 'w', encoding='utf-8') as f:
                 f.write(parte)
 
-        update_progress(progress_file, 15, f"Roteiro: {len(roteiro_partes)} partes ({len(roteiro)} chars)", project_path=projeto_pasta)
+        progresso.update(15, f"Roteiro: {len(roteiro_partes)} partes ({len(roteiro)} chars)", project_path=projeto_pasta)
 
     else:
         # Modo normal - IA gera roteiro
-        update_progress(progress_file, 10, "Gerando roteiro...", project_path=projeto_pasta)
+        progresso.update(10, "Gerando roteiro...", project_path=projeto_pasta)
 
         CHUNK_SIZE = 5000
         num_partes = max(1, (tamanho_roteiro + CHUNK_SIZE - 1) // CHUNK_SIZE)
@@ -208,31 +1380,56 @@ def generate_content(params):
         roteiro_partes = []
         prompts_roteiro = []
 
-        for parte_num in range(num_partes):
-            is_primeira = parte_num == 0
-            is_ultima = parte_num == num_partes - 1
-
+        # Modo paralelo: pede um esboco (um ponto por parte) e gera todas as partes ao mesmo tempo
+        outline = None
+        if roteiro_paralelo and num_partes > 1:
+            progresso.update(11, f"Roteiro: esboco de {num_partes} partes...", project_path=projeto_pasta)
+            prompt_outline = montar_prompt_outline(tema, instrucoes, idioma, num_partes)
+            response = chamar(MODELO_TEXTO, prompt_outline)
+            metricas.adicionar_bytes(MODELO_TEXTO, len(response.text.encode('utf-8')))
+            outline = parse_outline(response.text, num_partes)
+            projeto_doc["prompts_enviados"]["roteiro_outline"] = prompt_outline
+            projeto_doc["respostas"]["roteiro_outline"] = outline or response.text.strip()
+            if not outline:
+                print("[SCRIPT-WARN] Esboco invalido, gerando partes em sequencia", file=sys.stderr)
+
+        if outline:
+            def gerar_parte(parte_num):
+                prompt = montar_prompt_parte_outline(tema, instrucoes, idioma, outline, parte_num, chars_por_parte)
+                inicio = time.perf_counter()
+                response = chamar_modelo(client, metricas, MODELO_TEXTO, prompt, max_retries=max_retries)
+                return parte_num, prompt, response.text.strip(), time.perf_counter() - inicio
+
+            roteiro_partes = [""] * num_partes
+            prompts_roteiro = [None] * num_partes
+            concluidas = 0
+            futures = [pools.submit(MODELO_TEXTO, gerar_parte, n) for n in range(num_partes)]
+            for future in as_completed(futures):
+                parte_num, prompt, texto, latencia = future.result()
+                metricas.adicionar_bytes(MODELO_TEXTO, len(texto.encode('utf-8')))
+                progresso.evento("roteiro", parte_num + 1, latencia, len(texto.encode('utf-8')))
+                roteiro_partes[parte_num] = texto
+                prompts_roteiro[parte_num] = {
+                    "parte": parte_num + 1,
+                    "beat": outline[parte_num],
+                    "prompt": prompt,
+                    "resposta": texto
+                }
+                concluidas += 1
+                progresso.update(10 + (10 * concluidas / num_partes),
+                                 f"Roteiro: {concluidas}/{num_partes} partes", project_path=projeto_pasta)
+
+            # Costura local (sem chamadas extras): remove frases repetidas nas emendas
+            roteiro_partes, emendas_corrigidas = costurar_partes(roteiro_partes, IDIOMAS.get(idioma, "pt-BR"))
+            projeto_doc["continuidade"] = {"emendas_corrigidas": emendas_corrigidas}
+
+        for parte_num in range(0 if outline else num_partes):
             contexto_anterior = ""
             if roteiro_partes:
                 contexto_anterior = " ".join(roteiro_partes)[-500:]
 
             # Instrucoes por posicao
-            if is_primeira and is_ultima:
-                pos_pt = "Comece de forma impactante e termine com call-to-action"
-                pos_en = "Start with an impactful hook and end with a call-to-action"
-                pos_es = "Comienza de forma impactante y termina con call-to-action"
-            elif is_primeira:
-                pos_pt = "Comece de forma impactante. NAO conclua ainda."
-                pos_en = "Start with an impactful hook. DO NOT conclude yet."
-                pos_es = "Comienza de forma impactante. NO concluyas aun."
-            elif is_ultima:
-                pos_pt = "Continue e termine com call-to-action forte"
-                pos_en = "Continue and end with a strong call-to-action"
-                pos_es = "Continua y termina con un call-to-action fuerte"
-            else:
-                pos_pt = "Continue desenvolvendo. NAO conclua ainda."
-                pos_en = "Continue developing. DO NOT conclude yet."
-                pos_es = "Continua desarrollando. NO concluyas aun."
+            pos_pt, pos_en, pos_es = instrucoes_posicao(parte_num, num_partes)
 
             if idioma == "Ingles":
                 prompt = f"""Write a narration script for a video about: {tema}
@@ -262,16 +1459,19 @@ Retorne APENAS narracao em portugues."""
                 "prompt": prompt
             })
 
-            response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-            api_usage["texto"] += 1
+            inicio = time.perf_counter()
+            response = chamar(MODELO_TEXTO, prompt)
             roteiro_partes.append(response.text.strip())
+            metricas.adicionar_bytes(MODELO_TEXTO, len(roteiro_partes[-1].encode('utf-8')))
+            progresso.evento("roteiro", parte_num + 1, time.perf_counter() - inicio,
+                             len(roteiro_partes[-1].encode('utf-8')))
 
             # Salvar resposta na documentacao
             prompts_roteiro[-1]["resposta"] = response.text.strip()
 
             if num_partes > 1:
-                update_progress(progress_file, 10 + (10 * (parte_num + 1) / num_partes),
-                              f"Roteiro: parte {parte_num + 1}/{num_partes}", project_path=projeto_pasta)
+                progresso.update(10 + (10 * (parte_num + 1) / num_partes),
+                                 f"Roteiro: parte {parte_num + 1}/{num_partes}", project_path=projeto_pasta)
 
         roteiro = " ".join(roteiro_partes)
 
@@ -280,7 +1480,7 @@ Retorne APENAS narracao em portugues."""
             f.write(roteiro)
 
         # Atualizar documentacao
-        projeto_doc["modo"] = "ia_gera_roteiro"
+        projeto_doc["modo"] = "ia_gera_roteiro_paralelo" if outline else "ia_gera_roteiro"
         projeto_doc["prompts_enviados"]["roteiro"] = prompts_roteiro
         projeto_doc["respostas"]["roteiro"] = {
             "texto_final": roteiro,
@@ -288,13 +1488,13 @@ Retorne APENAS narracao em portugues."""
             "partes": len(roteiro_partes)
         }
 
-    update_progress(progress_file, 20, f"Roteiro pronto: {len(roteiro)} chars", project_path=projeto_pasta)
+    progresso.update(20, f"Roteiro pronto: {len(roteiro)} chars", project_path=projeto_pasta)
 
     # ========== PASSO 2: GERAR PROMPTS DE IMAGENS ==========
     if gerar_imagens:
-        update_progress(progress_file, 25, f"Gerando {qtd_imagens} imagens...", project_path=projeto_pasta)
+        progresso.update(25, f"Gerando {qtd_imagens} imagens...", project_path=projeto_pasta)
     else:
-        update_progress(progress_file, 25, f"Gerando prompts para {qtd_imagens} imagens...", project_path=projeto_pasta)
+        progresso.update(25, f"Gerando prompts para {qtd_imagens} imagens...", project_path=projeto_pasta)
 
     estilo_config = ESTILOS_IMAGEM.get(estilo, ESTILOS_IMAGEM["Fotografia Profissional"])
     style_prefix = estilo_config["prefix"]
@@ -308,8 +1508,8 @@ Return ONLY prompts, one per line."""
     # Documentar prompt de geracao de prompts
     projeto_doc["prompts_enviados"]["imagens_meta"] = prompt_prompts
 
-    response = client.models.generate_content(model="gemini-2.0-flash", contents=prompt_prompts)
-    api_usage["texto"] += 1
+    response = chamar(MODELO_TEXTO, prompt_prompts)
+    metricas.adicionar_bytes(MODELO_TEXTO, len(response.text.encode('utf-8')))
     prompts_lista = [p.strip().strip('"').strip("'") for p in response.text.strip().split('\n')
                     if p.strip() and len(p.strip()) > 10][:qtd_imagens]
 
@@ -364,51 +1564,86 @@ Return ONLY prompts, one per line."""
     # So gera imagens se gerar_imagens for True
     if gerar_imagens:
         def gerar_imagem(prompt_info):
-            nonlocal imagens_geradas
+            inicio = time.perf_counter()
             try:
                 full_prompt = prompt_info["prompt_completo"]
                 nome_arquivo = prompt_info["nome_arquivo"]
 
                 # Usar Gemini 2.5 Flash Image (modelo correto para geracao de imagens)
-                img_response = client.models.generate_content(
-                    model="gemini-2.5-flash-image",
-                    contents=f"Generate an image: {full_prompt}",
+                img_response = chamar_modelo(
+                    client, metricas, MODELO_IMAGEM,
+                    f"Generate an image: {full_prompt}",
                     config=types.GenerateContentConfig(
                         response_modalities=["TEXT", "IMAGE"],
                         image_config=types.ImageConfig(aspect_ratio=aspecto)
-                    )
+                    ),
+                    max_retries=max_retries
                 )
-                api_usage["imagens"] += 1
                 for part in img_response.candidates[0].content.parts:
                     if hasattr(part, 'inline_data') and part.inline_data:
                         img_data = part.inline_data.data
                         if isinstance(img_data, str):
                             img_data = base64.b64decode(img_data)
+                        metricas.adicionar_bytes(MODELO_IMAGEM, len(img_data))
                         img_path = os.path.join(projeto_pasta, "imagens", nome_arquivo)
                         with open(img_path, 'wb') as f:
                             f.write(img_data)
+                        progresso.evento("imagem", prompt_info["index"], time.perf_counter() - inicio,
+                                         len(img_data), path=img_path, ok=True)
                         return True
                 print(f"[IMG-ERROR] {nome_arquivo}: No image data in response", file=sys.stderr)
+                progresso.evento("imagem", prompt_info["index"], time.perf_counter() - inicio, 0,
+                                 ok=False, error="No image data in response")
                 return False
             except Exception as e:
                 print(f"[IMG-ERROR] {nome_arquivo}: {str(e)}", file=sys.stderr)
+                progresso.evento("imagem", prompt_info["index"], time.perf_counter() - inicio, 0,
+                                 ok=False, error=str(e))
                 return False
 
-        # Processar em lotes de 5
-        for i in range(0, len(prompts_salvos), 5):
-            lote = prompts_salvos[i:i+5]
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                futures = {executor.submit(gerar_imagem, p): j for j, p in enumerate(lote)}
-                for future in as_completed(futures):
-                    if future.result():
-                        imagens_geradas += 1
-            prog = 25 + (45 * min(i + 5, qtd_imagens) / qtd_imagens)
-            update_progress(progress_file, prog, f"Imagens: {imagens_geradas}/{qtd_imagens}", project_path=projeto_pasta)
+        # Todas as imagens vao para o pool do modelo de imagem (o limite de concorrencia fica no pool)
+        futures = [pools.submit(MODELO_IMAGEM, gerar_imagem, p) for p in prompts_salvos]
+        for concluidas, future in enumerate(as_completed(futures), 1):
+            if future.result():
+                imagens_geradas += 1
+            prog = 25 + (45 * concluidas / len(futures))
+            progresso.update(prog, f"Imagens: {imagens_geradas}/{qtd_imagens}", project_path=projeto_pasta)
     else:
         # Pular geracao de imagens
-        update_progress(progress_file, 70, f"Prompts salvos: {len(prompts_salvos)} (imagens nao geradas)", project_path=projeto_pasta)
-
-    update_progress(progress_file, 70, "Gerando audio...", project_path=projeto_pasta)
+        progresso.update(70, f"Prompts salvos: {len(prompts_salvos)} (imagens nao geradas)", project_path=projeto_pasta)
+
+    # Pos-processamento: imagens no tamanho do aspecto, em JPEG/WebP (dimensoes reais em imagens.json)
+    imagens_otimizadas = False
+    if gerar_imagens and imagens_geradas and otimizar_imagens:
+        progresso.update(70, "Otimizando imagens...", project_path=projeto_pasta)
+        imagens_pasta = os.path.join(projeto_pasta, "imagens")
+        pendentes = [(p["index"], os.path.join(imagens_pasta, p["nome_arquivo"])) for p in prompts_salvos
+                     if os.path.exists(os.path.join(imagens_pasta, p["nome_arquivo"]))]
+
+        def ao_otimizar(r):
+            if "erro" in r:
+                print(f"[IMG-WARN] {r['arquivo']}: {r['erro']}", file=sys.stderr)
+                progresso.evento("imagem_processada", r["index"], ok=False, error=r["erro"])
+            else:
+                progresso.evento("imagem_processada", r["index"], nbytes=r["bytes"], ok=True,
+                                 path=os.path.join(imagens_pasta, r["arquivo"]), width=r["largura"], height=r["altura"])
+
+        imagens_info = processar_imagens(pendentes, aspecto, formato_imagem, qualidade_imagem,
+                                         manter_originais, ao_otimizar, pool=pools.processos())
+        if imagens_info is not None:
+            imagens_otimizadas = True
+            with open(os.path.join(projeto_pasta, "imagens.json"), 'w', encoding='utf-8') as f:
+                json.dump(imagens_info, f, ensure_ascii=False, indent=2)
+            ok = [r for r in imagens_info if "erro" not in r]
+            projeto_doc["imagens_otimizadas"] = {
+                "formato": formato_imagem,
+                "resolucao": list(RESOLUCOES_ASPECTO.get(aspecto, RESOLUCOES_ASPECTO["9:16"])),
+                "bytes_originais": sum(r["bytes_original"] for r in ok),
+                "bytes": sum(r["bytes"] for r in ok),
+                "erros": len(imagens_info) - len(ok)
+            }
+
+    progresso.update(70, "Gerando audio...", project_path=projeto_pasta)
 
     # ========== PASSO 3: GERAR AUDIO ==========
     voz_id = VOZES_GEMINI.get(voz, "Kore")
@@ -418,25 +1653,14 @@ Return ONLY prompts, one per line."""
     os.makedirs(audios_pasta, exist_ok=True)
 
     # No modo roteiro manual, usar as partes fornecidas diretamente
-    # No modo IA, dividir em chunks de 2000 chars respeitando pontuacao
+    # No modo IA, dividir em chunks de ~TTS_CHUNK_ALVO chars respeitando paragrafos/frases
     if modo_roteiro and roteiro_chunks:
         # Usar as partes do roteiro manual diretamente para o TTS
         chunks = roteiro_partes
     else:
         # Modo IA - dividir o roteiro gerado em chunks para TTS
-        chunks = []
-        texto_restante = roteiro
-        while texto_restante:
-            if len(texto_restante) <= 2000:
-                chunks.append(texto_restante)
-                break
-            ponto_corte = 2000
-            for i in range(2000, max(1500, 0), -1):
-                if texto_restante[i] in '.!?\n':
-                    ponto_corte = i + 1
-                    break
-            chunks.append(texto_restante[:ponto_corte])
-            texto_restante = texto_restante[ponto_corte:].strip()
+        trechos = segmentar_texto(roteiro, tts_chunk_alvo, tts_chunk_max, IDIOMAS.get(idioma, "pt-BR"))
+        chunks = [roteiro[ini:fim] for ini, fim in trechos]
 
     # Salvar os textos de cada chunk para referencia
     chunks_info = []
@@ -454,125 +1678,135 @@ Return ONLY prompts, one per line."""
         json.dump(chunks_info, f, ensure_ascii=False, indent=2)
 
     def gerar_audio_chunk(texto, index):
-        try:
-            tts_response = client.models.generate_content(
-                model="gemini-2.5-flash-preview-tts",
-                contents=texto,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voz_id)
-                        )
-                    )
+        """Gera o audio de um chunk e grava direto em audios/parte_XX.wav (retorna frames gravados)"""
+        inicio = time.perf_counter()
+        tts_config = types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voz_id)
                 )
             )
-            api_usage["tts"] += 1
+        )
+        parte_path = os.path.join(audios_pasta, f"parte_{index+1:02d}.wav")
+        try:
+            if tts_streaming:
+                def ao_primeiro_audio(segundos):
+                    # A parte ja pode ser tocada enquanto o resto chega
+                    progresso.evento("tts_inicio", index + 1, segundos, path=parte_path)
+
+                frames, nbytes, primeiro_audio = gravar_tts_stream(
+                    client, metricas, texto, tts_config, parte_path, ao_primeiro_audio, max_retries
+                )
+                if not frames:
+                    return (index, 0, "Sem dados de audio na resposta", time.perf_counter() - inicio, 0, None)
+                return (index, frames, None, time.perf_counter() - inicio, nbytes, primeiro_audio)
+
+            tts_response = chamar_modelo(client, metricas, MODELO_TTS, texto, config=tts_config,
+                                         max_retries=max_retries)
             for part in tts_response.candidates[0].content.parts:
                 if hasattr(part, 'inline_data') and part.inline_data:
                     raw_data = part.inline_data.data
-                    if isinstance(raw_data, bytes):
-                        return (index, raw_data, None)
-                    return (index, base64.b64decode(raw_data), None)
-            return (index, None, "Sem dados de audio na resposta")
+                    if not isinstance(raw_data, bytes):
+                        raw_data = base64.b64decode(raw_data)
+                    metricas.adicionar_bytes(MODELO_TTS, len(raw_data))
+
+                    # Salvar a parte no proprio worker para nao reter o PCM na thread principal
+                    with abrir_wav_tts(parte_path) as wav:
+                        wav.writeframes(raw_data)
+                    return (index, len(raw_data) // (TTS_SAMPLE_WIDTH * TTS_CHANNELS), None,
+                            time.perf_counter() - inicio, len(raw_data), None)
+            return (index, 0, "Sem dados de audio na resposta", time.perf_counter() - inicio, 0, None)
         except Exception as e:
-            return (index, None, str(e))
+            return (index, 0, str(e), time.perf_counter() - inicio, 0, None)
 
-    audio_chunks = [None] * len(chunks)
+    # O PCM fica so no disco: cada parte e anexada (e emendada) ao audio completo em ordem
     audio_errors = {}
+    audio_path = os.path.join(projeto_pasta, "audio_completo.wav")
+    concatenador = ConcatenadorWav(audio_path, len(chunks),
+                                   emenda=(pausa_entre_partes, crossfade_ms) if emenda_suave else None)
+    chunks_json_path = os.path.join(projeto_pasta, "audio_chunks.json")
+    ultima_gravacao_chunks = 0.0
+    partes_ok = partes_erro = 0
+
+    futures = {pools.submit(MODELO_TTS, gerar_audio_chunk, c, i): i for i, c in enumerate(chunks)}
+    for future in as_completed(futures):
+        idx, frames, error, latencia, nbytes, primeiro_audio = future.result()
+
+        if frames:
+            chunks_info[idx]["status"] = "ok"
+            partes_ok += 1
+            parte_path = os.path.join(audios_pasta, f"parte_{idx+1:02d}.wav")
+            extra = {}
+            if primeiro_audio is not None:
+                chunks_info[idx]["ttfa_ms"] = round(primeiro_audio * 1000)
+                extra["ttfa_ms"] = chunks_info[idx]["ttfa_ms"]
+            progresso.evento("tts", idx + 1, latencia, nbytes, path=parte_path,
+                             duration=frames / TTS_SAMPLE_RATE, ok=True, **extra)
+            # Anexa ao audio completo assim que as partes anteriores estiverem prontas
+            concatenador.parte_pronta(idx, parte_path)
+        else:
+            chunks_info[idx]["status"] = "error"
+            chunks_info[idx]["error"] = error or "Erro desconhecido"
+            audio_errors[idx + 1] = error or "Erro desconhecido"
+            partes_erro += 1
+            progresso.evento("tts", idx + 1, latencia, 0, ok=False, error=chunks_info[idx]["error"])
+            concatenador.parte_falhou(idx)
+
+        # Atualizar arquivo de chunks (no maximo 1x por segundo; o estado final e gravado no fim)
+        if time.monotonic() - ultima_gravacao_chunks >= 1.0:
+            with open(chunks_json_path, 'w', encoding='utf-8') as f:
+                json.dump(chunks_info, f, ensure_ascii=False, indent=2)
+            ultima_gravacao_chunks = time.monotonic()
 
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = {executor.submit(gerar_audio_chunk, c, i): i for i, c in enumerate(chunks)}
-        for future in as_completed(futures):
-            idx, data, error = future.result()
-
-            if data:
-                audio_chunks[idx] = data
-                chunks_info[idx]["status"] = "ok"
-
-                # Salvar cada parte separadamente
-                parte_path = os.path.join(audios_pasta, f"parte_{idx+1:02d}.wav")
-                with wave.open(parte_path, 'wb') as wav:
-                    wav.setnchannels(1)
-                    wav.setsampwidth(2)
-                    wav.setframerate(24000)
-                    wav.writeframes(data)
-            else:
-                chunks_info[idx]["status"] = "error"
-                chunks_info[idx]["error"] = error or "Erro desconhecido"
-                audio_errors[idx + 1] = error or "Erro desconhecido"
+        status_msg = f"Audio: {partes_ok}/{len(chunks)}"
+        if partes_erro > 0:
+            status_msg += f" ({partes_erro} erro{'s' if partes_erro > 1 else ''})"
 
-            # Atualizar arquivo de chunks
-            with open(os.path.join(projeto_pasta, "audio_chunks.json"), 'w', encoding='utf-8') as f:
-                json.dump(chunks_info, f, ensure_ascii=False, indent=2)
+        prog = 70 + (25 * (partes_ok + partes_erro) / len(chunks))
+        progresso.update(prog, status_msg, project_path=projeto_pasta)
 
-            partes_ok = sum(1 for c in chunks_info if c["status"] == "ok")
-            partes_erro = sum(1 for c in chunks_info if c["status"] == "error")
-            status_msg = f"Audio: {partes_ok}/{len(chunks)}"
-            if partes_erro > 0:
-                status_msg += f" ({partes_erro} erro{'s' if partes_erro > 1 else ''})"
-
-            prog = 70 + (25 * (partes_ok + partes_erro) / len(chunks))
-            update_progress(progress_file, prog, status_msg, project_path=projeto_pasta)
-
-    # Juntar apenas as partes que deram certo para o audio completo
-    audios_validos = [a for a in audio_chunks if a]
-    audio_ok = False
-    audio_durations = []  # Duracao de cada parte em segundos
-
-    if audios_validos:
-        audio_final = b''.join(audios_validos)
-        audio_path = os.path.join(projeto_pasta, "audio_completo.wav")
-        with wave.open(audio_path, 'wb') as wav:
-            wav.setnchannels(1)
-            wav.setsampwidth(2)
-            wav.setframerate(24000)
-            wav.writeframes(audio_final)
-        audio_ok = True
-
-        # Calcular duracao de cada parte de audio
-        for i, audio_data in enumerate(audio_chunks):
-            if audio_data:
-                # Calcular duracao: bytes / (sample_rate * sample_width * channels)
-                # sample_rate=24000, sample_width=2, channels=1
-                duracao = len(audio_data) / (24000 * 2 * 1)
-                audio_durations.append(duracao)
-            else:
-                audio_durations.append(0)
+    concatenador.fechar()
+    with open(chunks_json_path, 'w', encoding='utf-8') as f:
+        json.dump(chunks_info, f, ensure_ascii=False, indent=2)
+
+    # audio_completo.wav so existe se pelo menos uma parte deu certo
+    audio_ok = partes_ok > 0
+    audio_durations = []  # Duracao de cada parte em segundos (ja com a emenda)
+    audio_partes = []  # Posicao/corte de cada parte no audio completo (duracoes.json)
+
+    if audio_ok:
+        # A emenda (cortes de silencio + crossfade) ja foi feita pelo concatenador, na mesma passada
+        emendado = concatenador.emendado
+        audio_partes = concatenador.info
+        audio_durations = [p["duracao"] for p in audio_partes]
+
+        # Duracoes por parte para o insert_creator_content e o SRT (sem reler os headers dos WAVs)
+        with open(os.path.join(projeto_pasta, "duracoes.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                "sample_rate": TTS_SAMPLE_RATE,
+                "emendado": emendado,
+                "pausa_ms": pausa_entre_partes if emendado else None,
+                "crossfade_ms": crossfade_ms if emendado else None,
+                "total": sum(audio_durations),
+                "partes": audio_partes
+            }, f, ensure_ascii=False, indent=2)
+        projeto_doc["audio_emenda"] = {"emendado": emendado, "duracao_total": sum(audio_durations)}
+        progresso.evento("audio_completo", path=audio_path, duration=sum(audio_durations))
 
     # ========== PASSO 4: GERAR SRT (se solicitado) ==========
     srt_generated = False
     if gerar_srt and audio_ok and audio_durations:
-        update_progress(progress_file, 98, "Gerando arquivo SRT...", project_path=projeto_pasta)
-
-        def format_srt_time(seconds):
-            """Converte segundos para formato SRT: HH:MM:SS,mmm"""
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            secs = int(seconds % 60)
-            millis = int((seconds % 1) * 1000)
-            return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-
-        srt_content = []
-        current_time = 0.0
+        progresso.update(98, "Gerando arquivo SRT...", project_path=projeto_pasta)
 
-        for i, chunk_text in enumerate(chunks):
-            if i < len(audio_durations) and audio_durations[i] > 0:
-                start_time = current_time
-                end_time = current_time + audio_durations[i]
-
-                # Adicionar entrada SRT
-                srt_content.append(f"{i + 1}")
-                srt_content.append(f"{format_srt_time(start_time)} --> {format_srt_time(end_time)}")
-                srt_content.append(chunk_text.strip())
-                srt_content.append("")  # Linha em branco
-
-                current_time = end_time
+        partes_srt = [(os.path.join(audios_pasta, f"parte_{i+1:02d}.wav"), p["duracao"], p["corte_inicio"])
+                      for i, p in enumerate(audio_partes)]
+        srt_texto, total_legendas, alinhamento = montar_srt(chunks, partes_srt, IDIOMAS.get(idioma, "pt-BR"))
 
         # Salvar arquivo SRT
         srt_path = os.path.join(projeto_pasta, "legendas.srt")
         with open(srt_path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(srt_content))
+            f.write(srt_texto)
 
         srt_generated = True
 
@@ -580,20 +1814,19 @@ Return ONLY prompts, one per line."""
         projeto_doc["srt"] = {
             "gerado": True,
             "arquivo": srt_path,
-            "total_legendas": len(chunks),
-            "duracao_total": current_time
+            "total_legendas": total_legendas,
+            "alinhamento": alinhamento,
+            "duracao_total": sum(audio_durations)
         }
 
     # Status final
-    partes_ok = len(audios_validos)
-    partes_erro = len(chunks) - partes_ok
 
     if partes_erro > 0:
         status_final = f"Concluido com {partes_erro} erro{'s' if partes_erro > 1 else ''} de audio"
     else:
         status_final = "Concluido!"
 
-    update_progress(progress_file, 100, status_final, project_path=projeto_pasta)
+    progresso.update(100, status_final, project_path=projeto_pasta)
 
     # Finalizar documentacao
     projeto_doc["respostas"]["imagens"] = {
@@ -605,9 +1838,24 @@ Return ONLY prompts, one per line."""
         "partes_total": len(chunks),
         "partes_ok": partes_ok,
         "partes_erro": partes_erro,
-        "erros": audio_errors
+        "erros": audio_errors,
+        "streaming": bool(tts_streaming)
     }
+    tempos_primeiro_audio = [c["ttfa_ms"] for c in chunks_info if "ttfa_ms" in c]
+    if tempos_primeiro_audio:
+        projeto_doc["respostas"]["audio"]["ttfa_ms"] = {
+            "min": min(tempos_primeiro_audio),
+            "media": round(sum(tempos_primeiro_audio) / len(tempos_primeiro_audio)),
+            "max": max(tempos_primeiro_audio)
+        }
     projeto_doc["finalizado_em"] = datetime.now().isoformat()
+    projeto_doc["metricas"] = metricas.resumo()
+    api_usage = metricas.uso_api()
+
+    # Metricas no formato Prometheus: uma copia no projeto e, opcionalmente, no arquivo raspado localmente
+    metricas.salvar_prometheus(os.path.join(projeto_pasta, "metricas.prom"))
+    if params.get('metricsFile'):
+        metricas.salvar_prometheus(params['metricsFile'])
 
     # Salvar arquivo de documentacao completa
     with open(os.path.join(projeto_pasta, "projeto_info.json"), 'w', encoding='utf-8') as f:
@@ -622,6 +1870,7 @@ Return ONLY prompts, one per line."""
         "imagesGenerated": imagens_geradas,
         "imagesRequested": qtd_imagens,
         "imagesSkipped": not gerar_imagens,
+        "imagesOptimized": imagens_otimizadas,
         "promptsSaved": len(prompts_salvos),
         "audioGenerated": audio_ok,
         "audioPartsOk": partes_ok,
@@ -633,6 +1882,81 @@ Return ONLY prompts, one per line."""
     }
 
 
+def _arquivo_do_job(path, n):
+    """progress.json -> progress_job03.json (arquivo de progresso/eventos de cada job do lote)"""
+    if not path:
+        return None
+    raiz, ext = os.path.splitext(path)
+    return f"{raiz}_job{n:02d}{ext}"
+
+
+def generate_batch(params):
+    """
+    Gera varios projetos (um por job) dividindo os mesmos pools por modelo.
+    Parametros do nivel de cima (apiKey, pastaSaida, voz...) valem para todos os jobs;
+    cada job pode sobrescrever qualquer um deles. Retorna o resultado de cada job e um resumo.
+    """
+    jobs = params.get('jobs') or []
+    if not jobs:
+        return {"success": False, "error": "No jobs provided"}
+    if not params.get('pastaSaida') and not all(j.get('pastaSaida') for j in jobs):
+        return {"success": False, "error": "Output folder not provided"}
+
+    limites = {}
+    for modelo, chave in ((MODELO_TEXTO, 'limiteTexto'), (MODELO_IMAGEM, 'limiteImagens'), (MODELO_TTS, 'limiteTts')):
+        if params.get(chave):
+            limites[modelo] = int(params[chave])
+    # Jobs em andamento ao mesmo tempo: o suficiente para manter os pools cheios entre as etapas
+    max_jobs = int(params.get('maxJobs', 4))
+
+    comuns = {k: v for k, v in params.items()
+              if k not in ('action', 'jobs', 'progressFile', 'eventsFile', 'metricsFile', 'maxJobs')}
+    progresso = CanalProgresso(params.get('progressFile'), None, int(params.get('progressMaxHz', 4)))
+    metricas_lote = MetricasGeracao()
+    pools = PoolsModelos(limites)
+    inicio = time.perf_counter()
+
+    def rodar_job(n, job):
+        job_params = dict(comuns, **job)
+        job_params.setdefault('progressFile', _arquivo_do_job(params.get('progressFile'), n))
+        job_params.setdefault('eventsFile', _arquivo_do_job(params.get('eventsFile'), n))
+        try:
+            return generate_content(job_params, pools, metricas_lote)
+        except Exception as e:
+            print(f"[BATCH-ERROR] Job {n}: {str(e)}", file=sys.stderr)
+            return {"success": False, "error": str(e)}
+
+    resultados = [None] * len(jobs)
+    progresso.update(0, f"Lote: 0/{len(jobs)}")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_jobs, len(jobs)))) as executor:
+            futures = {executor.submit(rodar_job, n, job): n for n, job in enumerate(jobs, 1)}
+            for concluidos, future in enumerate(as_completed(futures), 1):
+                n = futures[future]
+                resultados[n - 1] = dict(future.result(), job=n, tema=jobs[n - 1].get('tema', params.get('tema')))
+                progresso.update(100 * concluidos / len(jobs), f"Lote: {concluidos}/{len(jobs)}",
+                                 f"Job {n}: {'ok' if resultados[n - 1].get('success') else 'erro'}",
+                                 resultados[n - 1].get('projectPath'))
+    finally:
+        pools.fechar()
+        progresso.fechar()
+
+    if params.get('metricsFile'):
+        metricas_lote.salvar_prometheus(params['metricsFile'])
+
+    ok = sum(1 for r in resultados if r.get('success'))
+    return {
+        "success": ok == len(jobs),
+        "jobsTotal": len(jobs),
+        "jobsOk": ok,
+        "jobsFailed": len(jobs) - ok,
+        "elapsedSeconds": round(time.perf_counter() - inicio, 1),
+        "apiUsage": metricas_lote.uso_api(),
+        "metricas": metricas_lote.resumo(),
+        "results": resultados
+    }
+
+
 def main():
     if len(sys.argv) < 2:
         print(json.dumps({"success": False, "error": "No command provided"}))
@@ -652,6 +1976,17 @@ def main():
 
         if action == 'generate':
             result = generate_content(command)
+        elif action == 'generate_batch':
+            result = generate_batch(command)
+        elif action == 'segment':
+            texto = command.get('texto', '')
+            trechos = segmentar_texto(
+                texto,
+                command.get('alvo', TTS_CHUNK_ALVO),
+                command.get('maximo', TTS_CHUNK_MAX),
+                IDIOMAS.get(command.get('idioma', 'Portugues'), "pt-BR")
+            )
+            result = {"success": True, "offsets": trechos}
         else:
             result = {"success": False, "error": f"Unknown action: {action}"}
 
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Draft Catalog - Catalogo SQLite dos projetos da pasta de drafts do CapCut
+- Resume cada projeto (nome, duracao, tracks, segmentos, midias referenciadas e faltando)
+- Os JSONs so sao relidos quando o mtime ou o tamanho de draft_content.json,
+  draft_info.json ou draft_meta_info.json mudam; os resumos ficam num banco SQLite
+- Os projetos alterados sao lidos em paralelo (pool de processos)
+"""
+
+import json
+import sys
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+ARQUIVOS_DRAFT = ("draft_content.json", "draft_info.json", "draft_meta_info.json")
+NOME_BANCO = "draft_catalog.sqlite"
+MIN_PARA_POOL = 8  # Abaixo disso, ler no proprio processo compensa mais que subir o pool
+RE_PLACEHOLDER = re.compile(r'##_draftpath_placeholder_[A-Fa-f0-9-]+_##')
+VERSAO_RESUMO = "2"  # Entra na assinatura: mudar o formato do resumo forca reler os projetos ja catalogados
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    path TEXT PRIMARY KEY,
+    name TEXT,
+    draft_id TEXT,
+    assinatura TEXT,
+    modified_ns INTEGER,
+    duration INTEGER,
+    tracks INTEGER,
+    segments INTEGER,
+    track_types TEXT,
+    media_count INTEGER,
+    missing_count INTEGER,
+    media TEXT,
+    missing TEXT,
+    error TEXT,
+    scanned_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_drafts_modified ON drafts(modified_ns DESC);
+"""
+
+
+def assinatura_projeto(project_path):
+    """
+    (mtime_ns, tamanho) dos JSONs do projeto, ou None se nao houver draft_content.json.
+    Retorna (assinatura em texto, mtime do draft_content.json)
+    """
+    partes = [VERSAO_RESUMO]
+    modified_ns = None
+    for nome in ARQUIVOS_DRAFT:
+        try:
+            st = os.stat(os.path.join(project_path, nome))
+        except OSError:
+            if nome == "draft_content.json":
+                return None
+            partes.append("-")
+            continue
+        if nome == "draft_content.json":
+            modified_ns = st.st_mtime_ns
+        partes.append(f"{st.st_mtime_ns}:{st.st_size}")
+    return "|".join(partes), modified_ns
+
+
+def caminho_midia(path, project_path):
+    """Caminho real de uma midia: o placeholder do CapCut aponta para a pasta do proprio projeto"""
+    if RE_PLACEHOLDER.match(path):
+        resto = RE_PLACEHOLDER.sub('', path, count=1).replace('\\', '/').strip('/')
+        return os.path.normpath(os.path.join(project_path, *resto.split('/')))
+    return path
+
+
+def resumir_projeto(project_path):
+    """Roda num processo do pool: le os JSONs e monta o resumo do projeto"""
+    resumo = {"path": project_path, "name": os.path.basename(project_path), "draft_id": "",
+              "duration": 0, "tracks": 0, "segments": 0, "track_types": {},
+              "media": [], "missing": [], "error": None}
+    try:
+        with open(os.path.join(project_path, "draft_content.json"), 'r', encoding='utf-8') as f:
+            draft = json.load(f)
+
+        meta_path = os.path.join(project_path, "draft_meta_info.json")
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                resumo["draft_id"] = meta.get("draft_id", "")
+            except (OSError, ValueError):
+                pass
+        resumo["draft_id"] = draft.get("id") or resumo["draft_id"]
+
+        fim = 0
+        for track in draft.get("tracks", []):
+            tipo = track.get("type", "?")
+            resumo["track_types"][tipo] = resumo["track_types"].get(tipo, 0) + 1
+            segmentos = track.get("segments", [])
+            resumo["segments"] += len(segmentos)
+            for seg in segmentos:
+                tr = seg.get("target_timerange") or {}
+                fim = max(fim, tr.get("start", 0) + tr.get("duration", 0))
+        resumo["tracks"] = len(draft.get("tracks", []))
+        resumo["duration"] = draft.get("duration") or fim
+
+        materials = draft.get("materials", {})
+        vistos = set()
+        for tipo in ("videos", "audios", "images"):
+            for material in materials.get(tipo, []):
+                path = caminho_midia(material.get("path", ""), project_path)
+                if path and path not in vistos:
+                    vistos.add(path)
+                    resumo["media"].append(path)
+                    if not os.path.exists(path):
+                        resumo["missing"].append(path)
+    except Exception as e:
+        resumo["error"] = str(e)
+    return resumo
+
+
+def abrir_banco(db_path):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(ESQUEMA)
+    return conn
+
+
+def atualizar_catalogo(drafts_root, db_path, workers=None):
+    """
+    Sincroniza o banco com a pasta: rele so os projetos novos/alterados e apaga os que sumiram.
+    Retorna estatisticas {total, lidos, removidos, ms}
+    """
+    inicio = time.perf_counter()
+    conn = abrir_banco(db_path)
+    try:
+        conhecidos = dict(conn.execute("SELECT path, assinatura FROM drafts"))
+
+        atuais = {}
+        with os.scandir(drafts_root) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                assinatura = assinatura_projeto(entry.path)
+                if assinatura is not None:
+                    atuais[entry.path] = assinatura
+
+        alterados = [path for path, (assinatura, _) in atuais.items() if conhecidos.get(path) != assinatura]
+        removidos = [path for path in conhecidos if path not in atuais]
+
+        if len(alterados) >= MIN_PARA_POOL:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+                resumos = list(pool.map(resumir_projeto, alterados, chunksize=8))
+        else:
+            resumos = [resumir_projeto(path) for path in alterados]
+
+        with conn:
+            conn.executemany("DELETE FROM drafts WHERE path = ?", [(path,) for path in removidos])
+            conn.executemany(
+                "INSERT OR REPLACE INTO drafts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["path"], r["name"], r["draft_id"], atuais[r["path"]][0], atuais[r["path"]][1],
+                  r["duration"], r["tracks"], r["segments"], json.dumps(r["track_types"]),
+                  len(r["media"]), len(r["missing"]), json.dumps(r["media"], ensure_ascii=False),
+                  json.dumps(r["missing"], ensure_ascii=False), r["error"], time.time())
+                 for r in resumos])
+    finally:
+        conn.close()
+
+    return {"total": len(atuais), "lidos": len(alterados), "removidos": len(removidos),
+            "ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+
+def _linha_para_projeto(linha, detalhes=False):
+    """
+    missingCount e o retrato do ultimo scan (scannedAt): a midia pode sumir ou voltar sem
+    os JSONs do projeto mudarem. Com detalhes, a lista "missing" e conferida de novo no disco.
+    """
+    (path, name, draft_id, modified_ns, duration, tracks, segments, track_types,
+     media_count, missing_count, media, missing, error, scanned_at) = linha
+    projeto = {
+        "name": name,
+        "path": path,
+        "draftPath": os.path.join(path, "draft_content.json"),
+        "draftId": draft_id,
+        "modifiedAt": datetime.fromtimestamp(modified_ns / 1e9, timezone.utc).isoformat().replace("+00:00", "Z"),
+        "duration": duration,
+        "tracks": tracks,
+        "segments": segments,
+        "trackTypes": json.loads(track_types),
+        "mediaCount": media_count,
+        "missingCount": missing_count,
+        "scannedAt": datetime.fromtimestamp(scanned_at, timezone.utc).isoformat().replace("+00:00", "Z"),
+        "error": error
+    }
+    if detalhes:
+        projeto["media"] = json.loads(media)
+        projeto["missing"] = [p for p in projeto["media"] if not os.path.exists(p)]
+        projeto["missingCount"] = len(projeto["missing"])
+    return projeto
+
+
+def listar_projetos(db_path, project_path=None, detalhes=False):
+    """Projetos do catalogo, mais recentes primeiro (ou so um, com as listas de midias)"""
+    conn = abrir_banco(db_path)
+    try:
+        sql = ("SELECT path, name, draft_id, modified_ns, duration, tracks, segments, track_types, "
+               "media_count, missing_count, media, missing, error, scanned_at FROM drafts")
+        if project_path:
+            linhas = conn.execute(sql + " WHERE path = ?", (project_path,)).fetchall()
+        else:
+            linhas = conn.execute(sql + " ORDER BY modified_ns DESC").fetchall()
+    finally:
+        conn.close()
+    return [_linha_para_projeto(linha, detalhes) for linha in linhas]
+
+
+def catalog(params):
+    """
+    Atualiza (se refresh) e lista o catalogo
+    - draftsRoot: pasta de drafts do CapCut
+    - dbPath: banco SQLite (padrao: draft_catalog.sqlite dentro de draftsRoot)
+    - projectPath: so um projeto, com as listas de midias e midias faltando
+    """
+    drafts_root = params.get("draftsRoot")
+    if not drafts_root or not os.path.isdir(drafts_root):
+        return {"success": False, "error": "Pasta de projetos nao encontrada"}
+    db_path = params.get("dbPath") or os.path.join(drafts_root, NOME_BANCO)
+
+    try:
+        estatisticas = None
+        if params.get("refresh", True):
+            estatisticas = atualizar_catalogo(drafts_root, db_path, params.get("workers"))
+        project_path = params.get("projectPath")
+        projetos = listar_projetos(db_path, project_path, detalhes=bool(project_path))
+        return {
+            "success": True,
+            "capCutPath": drafts_root,
+            "projects": projetos,
+            "count": len(projetos),
+            "scan": estatisticas
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(json.dumps({"success": False, "error": "No command provided"}))
+        return
+
+    try:
+        # Pode receber JSON direto ou via arquivo
+        arg = sys.argv[1]
+        if arg.startswith('--file'):
+            file_path = sys.argv[2] if len(sys.argv) > 2 else arg.split('=')[1]
+            with open(file_path, 'r', encoding='utf-8') as f:
+                command = json.load(f)
+        else:
+            command = json.loads(arg)
+
+        action = command.get('action')
+
+        if action == 'catalog':
+            result = catalog(command)
+        else:
+            result = {"success": False, "error": f"Unknown action: {action}"}
+
+        print(json.dumps(result, ensure_ascii=False))
+
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,61 @@ Project Manager - Importar e Exportar projetos CapCut
 Gerencia a exportacao com copia de midias e importacao de projetos zipados
 """
 
+import io
 import json
 import sys
+import re
 import os
+import time
 import shutil
+import stat
+import threading
+import zlib
+import struct
+import hashlib
 import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import uuid
 
+from root_meta import RegistroRootMeta
+
+
+# Midias que ja sao comprimidas: vao para o ZIP sem compressao (ZIP_STORED)
+EXTENSOES_COMPRIMIDAS = {
+    ".mp4", ".mov", ".m4v", ".mkv", ".webm", ".avi",
+    ".jpg", ".jpeg", ".png", ".webp", ".gif", ".heic",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".wav",
+    ".zip", ".7z", ".gz",
+}
+# Arquivos de texto (JSON do CapCut, legendas, configs): comprimidos com deflate
+EXTENSOES_TEXTO = {
+    ".json", ".txt", ".srt", ".vtt", ".ass", ".lrc", ".xml", ".ini", ".csv", ".log", ".md", ".bak", "",
+}
+NIVEL_COMPRESSAO = 6
+JANELA_DEFLATE = 16  # Membros comprimidos em paralelo a frente do que esta sendo gravado
+LIMITE_DEFLATE_MEMORIA = 64 * 1024 * 1024  # Acima disso o deflate e feito em streaming, sem o pool
+LIMITE_DEFLATE_EM_VOO = 256 * 1024 * 1024  # Bytes de origem na janela do deflate (lidos/comprimidos e ainda nao gravados)
+HASH_BLOCO = 1024 * 1024  # Leitura em blocos para o hash das midias (e na copia de membros)
+# Indice (na raiz do projeto importado) das midias que vieram do store compartilhado
+INDICE_STORE = ".media_store.json"
+# Sufixo de hash no nome das midias exportadas (_<12 hex> completo, _p<11 hex> parcial)
+RE_SUFIXO_HASH = re.compile(r'_(?:[0-9a-f]{12}|p[0-9a-f]{11})$')
+FICLONE = 0x40049409  # ioctl de reflink (Linux: btrfs, xfs, ...)
+# Tokens de string JSON do draft serializado (o esqueleto do template e cortado neles)
+RE_STRING_JSON = re.compile(r'"(?:[^"\\]|\\.)*"')
+RE_PLACEHOLDER = re.compile(r'##_draftpath_placeholder_[A-Fa-f0-9-]+_##')
+SLOT_DRAFT_ID = "@@stamp_draft_id@@"
+SLOT_NOME = "@@stamp_nome@@"
+SLOT_TEMPO = "@@stamp_tempo@@"
+BLOCO_COPIA = 64 * 1024 * 1024  # Bloco das copias retomaveis: cada bloco gravado vira um ponto de retomada
+DIARIO_COPIA = ".copy_journal.ndjson"  # Diario da copia retomavel, na pasta de destino
+# Arquivos da copia local que o main.js regrava depois da copia: nunca sao removidos como sobra
+ARQUIVOS_LOCAIS_COPIA = {"draft_info.json", "draft_meta_info.json", DIARIO_COPIA}
+TOLERANCIA_MTIME_NS = 2 * 10 ** 9  # FAT/exFAT e algumas pastas sincronizadas guardam o mtime em 2 s
+
 
 def get_all_media_paths(draft_content):
     """Extrai todos os caminhos de midia do draft_content.json"""
@@ -77,15 +124,302 @@ def update_media_paths(draft_content, path_mapping):
     return draft_content
 
 
+def hash_midia(path, parcial=False):
+    """
+    BLAKE2b (128 bits) do conteudo do arquivo, lido em blocos.
+    parcial=True: so tamanho + primeiro e ultimo bloco (para midias de tamanho unico,
+    que nao tem com quem ser duplicadas, mas precisam de um nome estavel). O hash parcial
+    NAO identifica o conteudo: dois arquivos com o meio diferente tem o mesmo hash parcial
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if parcial:
+            tamanho = os.fstat(f.fileno()).st_size
+            h.update(f"parcial:{tamanho}:".encode())
+            h.update(f.read(HASH_BLOCO))
+            if tamanho > 2 * HASH_BLOCO:
+                f.seek(-HASH_BLOCO, os.SEEK_END)
+            h.update(f.read(HASH_BLOCO))
+        else:
+            for bloco in iter(lambda: f.read(HASH_BLOCO), b''):
+                h.update(bloco)
+    return h.hexdigest()
+
+
+def identificar_midias(paths, workers=None, cache=None, conhecidos=None):
+    """
+    Identifica o conteudo de cada midia: {path: (hash, parcial)}.
+    Pre-filtro por tamanho: so arquivos com o mesmo tamanho podem ser iguais, entao so
+    esses recebem o hash completo; os demais recebem o hash parcial. Os hashes rodam em
+    threads (o hashlib libera o GIL em blocos grandes).
+    cache: {path: entrada do manifesto anterior}; se tamanho, mtime e tipo de hash
+    baterem, o hash anterior e reaproveitado sem ler o arquivo.
+    conhecidos: {path: hash completo} ja sabidos (midias do store compartilhado).
+    """
+    cache = cache or {}
+    conhecidos = conhecidos or {}
+    stats = {path: os.stat(path) for path in paths}
+    por_tamanho = {}
+    for path in paths:
+        por_tamanho.setdefault(stats[path].st_size, []).append(path)
+
+    resultado = {}
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futuros = {}
+        for grupo in por_tamanho.values():
+            parcial = len(grupo) == 1
+            for path in grupo:
+                anterior = cache.get(path)
+                if path in conhecidos:
+                    resultado[path] = (conhecidos[path], False)
+                elif (anterior and anterior.get("hash") and anterior.get("partial", False) == parcial
+                        and anterior.get("size") == stats[path].st_size
+                        and anterior.get("mtime") == stats[path].st_mtime_ns):
+                    resultado[path] = (anterior["hash"], parcial)
+                else:
+                    futuros[path] = (pool.submit(hash_midia, path, parcial), parcial)
+        for path, (futuro, parcial) in futuros.items():
+            resultado[path] = (futuro.result(), parcial)
+    return resultado
+
+
+def ler_export_anterior(zip_path):
+    """
+    Le o manifesto de um ZIP exportado antes (export_info.json).
+    Retorna (manifesto por arcname, {arcname: ZipInfo}, compressao usada) ou None se nao der para usar.
+    """
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            info = json.loads(zipf.read("export_info.json"))
+            membros = {zinfo.filename: zinfo for zinfo in zipf.infolist()}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    manifesto = {entrada["arcname"]: entrada for entrada in info.get("manifest", [])}
+    return manifesto, membros, info.get("compression")
+
+
+def politica_compressao(arcname, politica="auto"):
+    """
+    Define o metodo de compressao de um membro do ZIP
+    - auto: ZIP_STORED para midias ja comprimidas, ZIP_DEFLATED para texto
+    - deflate / store: o mesmo metodo para todos os arquivos
+    """
+    if politica == "deflate":
+        return zipfile.ZIP_DEFLATED
+    if politica == "store":
+        return zipfile.ZIP_STORED
+    ext = os.path.splitext(arcname)[1].lower()
+    return zipfile.ZIP_DEFLATED if ext in EXTENSOES_TEXTO else zipfile.ZIP_STORED
+
+
+def _deflate_membro(origem, dados, nivel):
+    """Roda numa thread do pool (o zlib libera o GIL). Retorna (comprimido, crc, tamanho)"""
+    if dados is None:
+        with open(origem, 'rb') as f:
+            dados = f.read()
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, -15)
+    return compressor.compress(dados) + compressor.flush(), zlib.crc32(dados), len(dados)
+
+
+def _gravar_membro_pronto(zipf, zinfo, blocos):
+    """
+    Grava um membro cujo conteudo ja esta no formato final (comprimido ou nao), com CRC e
+    tamanhos ja preenchidos no zinfo - mesmo fluxo do ZipFile._open_to_write, mas o header
+    sai certo de primeira. blocos: iteravel com os bytes do membro.
+    Usa atributos internos do ZipFile (fp, start_dir, _writecheck, _didModify): so chamar
+    se escrita_crua_suportada() confirmar que eles funcionam nesta versao do Python.
+    """
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+
+    zipf.fp.seek(zipf.start_dir)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    for bloco in blocos:
+        zipf.fp.write(bloco)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
+
+@lru_cache(maxsize=None)
+def escrita_crua_suportada():
+    """
+    Confere uma vez por processo, num ZIP em memoria, se _gravar_membro_pronto produz um ZIP
+    valido nesta versao do Python (os internos do ZipFile usados la sao os mesmos do 3.8 ao 3.13).
+    Se nao, gravar_membros_zip usa so a API publica: recomprime em serie e nao copia membros crus.
+    """
+    try:
+        dados = b"capcut " * 512
+        compressor = zlib.compressobj(NIVEL_COMPRESSAO, zlib.DEFLATED, -15)
+        comprimido = compressor.compress(dados) + compressor.flush()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zipf:
+            zipf.writestr("antes.txt", b"a")
+            zinfo = zipfile.ZipInfo("cru.txt", date_time=(2020, 1, 1, 0, 0, 0))
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.CRC = zlib.crc32(dados)
+            zinfo.file_size = len(dados)
+            zinfo.compress_size = len(comprimido)
+            _gravar_membro_pronto(zipf, zinfo, [comprimido])
+            zipf.writestr("depois.txt", b"d")
+        with zipfile.ZipFile(buffer) as zipf:
+            return (zipf.namelist() == ["antes.txt", "cru.txt", "depois.txt"]
+                    and zipf.testzip() is None and zipf.read("cru.txt") == dados)
+    except Exception:
+        return False
+
+
+def _blocos_brutos(arquivo, antigo):
+    """Le os bytes comprimidos de um membro de outro ZIP (depois do header local), em blocos"""
+    arquivo.seek(antigo.header_offset)
+    header = arquivo.read(30)
+    if header[:4] != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Header local invalido em {antigo.filename}")
+    tamanho_nome, tamanho_extra = struct.unpack('<HH', header[26:30])
+    arquivo.seek(antigo.header_offset + 30 + tamanho_nome + tamanho_extra)
+    restante = antigo.compress_size
+    while restante > 0:
+        bloco = arquivo.read(min(HASH_BLOCO, restante))
+        if not bloco:
+            raise zipfile.BadZipFile(f"Membro truncado: {antigo.filename}")
+        restante -= len(bloco)
+        yield bloco
+
+
+def gravar_membros_zip(zipf, membros, politica="auto", nivel=NIVEL_COMPRESSAO, workers=None,
+                       reaproveitar=None, zip_anterior=None):
+    """
+    Grava os membros no ZIP, na ordem recebida.
+    membros: lista de (arcname, caminho_origem, dados_em_memoria) - um dos dois e None.
+    Membros ZIP_STORED sao copiados direto do arquivo; os ZIP_DEFLATED sao comprimidos
+    em paralelo (ate JANELA_DEFLATE a frente) e gravados quando chegar a vez deles;
+    arquivos maiores que LIMITE_DEFLATE_MEMORIA sao comprimidos em streaming na gravacao.
+    reaproveitar: {arcname: ZipInfo} de membros que nao mudaram; os bytes ja comprimidos
+    sao copiados crus de zip_anterior (arquivo aberto em 'rb'), sem recomprimir.
+    A janela do deflate tambem e limitada em bytes (LIMITE_DEFLATE_EM_VOO), nao so em membros.
+    Retorna as estatisticas por tipo: {ext: {"files", "bytes", "compressedBytes", "ratio"}}
+    """
+    reaproveitar = reaproveitar or {}
+    estatisticas = {}
+    crua = escrita_crua_suportada()
+    zip_antigo = zipfile.ZipFile(zip_anterior) if reaproveitar and not crua else None
+
+    def registrar(arcname, tamanho, comprimido):
+        ext = os.path.splitext(arcname)[1].lower() or "(sem extensao)"
+        item = estatisticas.setdefault(ext, {"files": 0, "bytes": 0, "compressedBytes": 0})
+        item["files"] += 1
+        item["bytes"] += tamanho
+        item["compressedBytes"] += comprimido
+
+    def gravar(membro, futuro):
+        arcname, origem, dados = membro
+        antigo = reaproveitar.get(arcname)
+        if antigo is not None:
+            zinfo = zipfile.ZipInfo(arcname, date_time=antigo.date_time)
+            zinfo.compress_type = antigo.compress_type
+            zinfo.flag_bits = antigo.flag_bits & ~0x08  # Tamanhos vao no header, sem data descriptor
+            zinfo.external_attr = antigo.external_attr
+            zinfo.CRC = antigo.CRC
+            zinfo.file_size = antigo.file_size
+            zinfo.compress_size = antigo.compress_size
+            if crua:
+                _gravar_membro_pronto(zipf, zinfo, _blocos_brutos(zip_anterior, antigo))
+            else:
+                with zip_antigo.open(antigo) as src, \
+                        zipf.open(zinfo, 'w', force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as dst:
+                    shutil.copyfileobj(src, dst, HASH_BLOCO)
+            zinfo = zipf.NameToInfo[arcname]
+            registrar(arcname, zinfo.file_size, zinfo.compress_size)
+            return
+        comprimido = None
+        if futuro:
+            comprimido, crc, tamanho = futuro.result()
+            if len(comprimido) >= tamanho:
+                comprimido = None  # Nao compensou (arquivos minusculos): grava sem compressao
+        if futuro is False:
+            if origem is not None:
+                zipf.write(origem, arcname, compress_type=zipfile.ZIP_DEFLATED, compresslevel=nivel)
+            else:
+                zipf.writestr(arcname, dados, compress_type=zipfile.ZIP_DEFLATED, compresslevel=nivel)
+        elif comprimido is not None:
+            if origem is not None:
+                zinfo = zipfile.ZipInfo.from_file(origem, arcname)
+            else:
+                zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo.CRC = crc
+            zinfo.file_size = tamanho
+            zinfo.compress_size = len(comprimido)
+            _gravar_membro_pronto(zipf, zinfo, [comprimido])
+        elif origem is not None:
+            zipf.write(origem, arcname, compress_type=zipfile.ZIP_STORED)
+        else:
+            zipf.writestr(arcname, dados, compress_type=zipfile.ZIP_STORED)
+        zinfo = zipf.NameToInfo[arcname]
+        registrar(arcname, zinfo.file_size, zinfo.compress_size)
+
+    em_voo = 0  # Bytes de origem dos membros enviados ao pool e ainda nao gravados
+
+    def gravar_proximo():
+        nonlocal em_voo
+        membro, futuro, tamanho = pendentes.popleft()
+        gravar(membro, futuro)
+        em_voo -= tamanho
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        pendentes = deque()
+        for membro in membros:
+            arcname, origem, dados = membro
+            futuro = None
+            tamanho = 0
+            if arcname in reaproveitar:
+                pass
+            elif politica_compressao(arcname, politica) == zipfile.ZIP_DEFLATED:
+                tamanho = os.path.getsize(origem) if origem is not None else len(dados)
+                if not crua or tamanho > LIMITE_DEFLATE_MEMORIA:
+                    futuro = False  # Grande demais para ler inteiro na memoria (ou sem escrita crua)
+                    tamanho = 0
+                else:
+                    # Abre espaco na janela antes de ler mais um arquivo para a memoria
+                    while pendentes and em_voo + tamanho > LIMITE_DEFLATE_EM_VOO:
+                        gravar_proximo()
+                    futuro = pool.submit(_deflate_membro, origem, dados, nivel)
+                    em_voo += tamanho
+            pendentes.append((membro, futuro, tamanho))
+            # Grava o que ja esta pronto (ou sem compressao); espera so quando a janela enche
+            while pendentes and (not pendentes[0][1] or pendentes[0][1].done()
+                                 or len(pendentes) > JANELA_DEFLATE):
+                gravar_proximo()
+        while pendentes:
+            gravar_proximo()
+
+    for item in estatisticas.values():
+        item["ratio"] = round(item["compressedBytes"] / item["bytes"], 3) if item["bytes"] else 1.0
+    return estatisticas
+
+
 def export_project(params):
     """
     Exporta um projeto CapCut para um arquivo ZIP
-    - Copia todas as midias para dentro do projeto
-    - Atualiza os caminhos no draft_content.json
-    - Cria arquivo ZIP com tudo
+    - Grava as midias direto no ZIP (em medias/), lendo dos arquivos originais
+    - Midias com o mesmo conteudo (BLAKE2) entram uma vez so, com nome estavel
+    - Atualiza os caminhos no draft_content.json (gerado em memoria)
+    - Inclui os demais arquivos do projeto sem passar por pasta temporaria
+    - Midias ja comprimidas vao sem compressao; texto e comprimido em paralelo
+    - Grava um manifesto (arcname, tamanho, mtime, hash) no export_info.json; no modo
+      incremental, membros que nao mudaram desde o ZIP anterior sao copiados crus dele
     """
     draft_path = params.get("draftPath")
     output_path = params.get("outputPath")  # Caminho do arquivo ZIP de saida
+    politica = params.get("compressionPolicy", "auto")  # auto, deflate ou store
+    nivel = int(params.get("compressionLevel", NIVEL_COMPRESSAO))
+    workers = params.get("workers")
+    incremental = params.get("incremental", False)
+    previous_path = params.get("previousPath")  # ZIP anterior (padrao: o proprio outputPath)
 
     if not draft_path or not os.path.exists(draft_path):
         return {"success": False, "error": "Projeto nao encontrado"}
@@ -93,6 +427,15 @@ def export_project(params):
     if not output_path:
         return {"success": False, "error": "Caminho de saida nao especificado"}
 
+    if politica not in ("auto", "deflate", "store"):
+        return {"success": False, "error": f"Politica de compressao invalida: {politica}"}
+
+    if not output_path.endswith('.zip'):
+        output_path += '.zip'
+    # ZIP parcial com outro nome; so substitui o destino quando estiver completo
+    partial_path = f"{output_path}.part"
+    zip_anterior = None
+
     try:
         # Ler draft_content.json
         draft_content_path = os.path.join(draft_path, "draft_content.json")
@@ -102,86 +445,130 @@ def export_project(params):
         with open(draft_content_path, 'r', encoding='utf-8') as f:
             draft_content = json.load(f)
 
-        # Criar pasta temporaria para o projeto exportado
-        temp_dir = os.path.join(os.path.dirname(output_path), f"temp_export_{uuid.uuid4().hex[:8]}")
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Criar pasta de midias dentro do projeto
-        media_dir = os.path.join(temp_dir, "medias")
-        os.makedirs(media_dir, exist_ok=True)
-
         # Extrair todos os caminhos de midia
         media_paths = get_all_media_paths(draft_content)
 
-        # Copiar midias e criar mapeamento de caminhos
+        # Midias legiveis, sem repetir caminho (se nao conseguir ler, manter o caminho original)
+        originais = [original_path for original_path in dict.fromkeys(m["original_path"] for m in media_paths)
+                     if os.path.isfile(original_path) and os.access(original_path, os.R_OK)]
+
+        # Export anterior (modo incremental): manifesto e membros reaproveitaveis, desde que
+        # a politica de compressao seja a mesma
+        anterior = None
+        if incremental:
+            anterior = ler_export_anterior(previous_path or output_path)
+        manifesto_anterior, membros_anteriores, compressao_anterior = anterior or ({}, {}, None)
+        if compressao_anterior != {"policy": politica, "level": nivel}:
+            manifesto_anterior, membros_anteriores = {}, {}
+        cache_hashes = {e["source"]: e for e in manifesto_anterior.values() if e.get("hash")}
+
+        # Midias vindas do store compartilhado: o hash completo do indice do projeto so vale se
+        # o arquivo continua o mesmo (tamanho, mtime e inode); senao a midia e hasheada de novo
+        conhecidos = {}
+        indice_path = os.path.join(draft_path, INDICE_STORE)
+        if os.path.exists(indice_path):
+            with open(indice_path, 'r', encoding='utf-8') as f:
+                indice = json.load(f).get("files", {})
+            for original_path in originais:
+                rel = os.path.relpath(os.path.abspath(original_path), os.path.abspath(draft_path)).replace(os.sep, "/")
+                entrada = indice.get(rel)
+                st = os.stat(original_path)
+                if (entrada and entrada.get("size") == st.st_size and entrada.get("mtime") == st.st_mtime_ns
+                        and entrada.get("inode") == st.st_ino):
+                    conhecidos[original_path] = entrada["hash"]
+
+        # Mapear midias para medias/ no ZIP, uma vez por conteudo (nome derivado do hash)
+        hashes = identificar_midias(originais, workers, cache_hashes, conhecidos)
         path_mapping = {}
+        por_hash = {}
         copied_files = []
-
-        for media in media_paths:
-            original_path = media["original_path"]
-            if original_path in path_mapping:
-                continue  # Ja foi copiado
-
-            # Nome unico para evitar conflitos
-            filename = os.path.basename(original_path)
-            base, ext = os.path.splitext(filename)
-            new_filename = f"{base}_{uuid.uuid4().hex[:6]}{ext}"
-            new_path = os.path.join(media_dir, new_filename)
-
-            # Copiar arquivo
-            try:
-                shutil.copy2(original_path, new_path)
-                # Usar caminho relativo no JSON
-                relative_path = os.path.join("medias", new_filename)
-                path_mapping[original_path] = relative_path
+        membros = []
+        manifesto = []
+        reaproveitar = {}
+
+        for original_path in originais:
+            digest, parcial = hashes[original_path]
+            if digest not in por_hash:
+                filename = os.path.basename(original_path)
+                base, ext = os.path.splitext(filename)
+                base = RE_SUFIXO_HASH.sub('', base)  # Sufixo de um export/import anterior
+                # Hash completo: o nome identifica o conteudo. Hash parcial (prefixo "p"): so um
+                # nome estavel, que nao garante que o conteudo e o mesmo
+                new_filename = f"{base}_p{digest[:11]}{ext}" if parcial else f"{base}_{digest[:12]}{ext}"
+                arcname = f"medias/{new_filename}"
+                por_hash[digest] = arcname
                 copied_files.append(new_filename)
-            except Exception as e:
-                # Se nao conseguir copiar, manter o caminho original
-                pass
-
-        # Atualizar caminhos no draft_content
+                membros.append((arcname, original_path, None))
+
+                stat = os.stat(original_path)
+                manifesto.append({"arcname": arcname, "source": original_path, "size": stat.st_size,
+                                  "mtime": stat.st_mtime_ns, "hash": digest, "partial": parcial})
+                # Com hash completo, mesmo nome = mesmo conteudo. O nome de hash parcial nao garante
+                # isso (o meio do arquivo pode ter mudado): so reaproveita se origem, tamanho e
+                # mtime forem os do manifesto anterior, como nos outros membros
+                antigo = membros_anteriores.get(arcname)
+                entrada = manifesto_anterior.get(arcname)
+                mesma_origem = (entrada is not None and entrada.get("source") == original_path
+                                and entrada.get("size") == stat.st_size and entrada.get("mtime") == stat.st_mtime_ns)
+                if antigo is not None and antigo.file_size == stat.st_size and (not parcial or mesma_origem):
+                    reaproveitar[arcname] = antigo
+
+            # Usar caminho relativo no JSON (todas as referencias ao mesmo conteudo)
+            path_mapping[original_path] = por_hash[digest]
+
+        # Outros arquivos do projeto original (draft_content/export_info vem da memoria)
+        midias_abs = {os.path.abspath(path) for path in path_mapping}
+        for root, dirs, files in os.walk(draft_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, draft_path).replace(os.sep, "/")
+                if arcname in ("draft_content.json", "export_info.json", INDICE_STORE):
+                    continue
+                if os.path.abspath(file_path) in (os.path.abspath(partial_path), os.path.abspath(output_path)):
+                    continue  # O proprio ZIP, se for gravado dentro do projeto
+                if file_path in path_mapping or os.path.abspath(file_path) in midias_abs:
+                    continue  # Midia do projeto (ex.: medias/ de um import), ja gravada acima
+                membros.append((arcname, file_path, None))
+
+                stat = os.stat(file_path)
+                manifesto.append({"arcname": arcname, "source": file_path, "size": stat.st_size,
+                                  "mtime": stat.st_mtime_ns, "hash": None})
+                entrada = manifesto_anterior.get(arcname)
+                antigo = membros_anteriores.get(arcname)
+                if (entrada and antigo is not None and entrada.get("source") == file_path
+                        and entrada.get("size") == stat.st_size and entrada.get("mtime") == stat.st_mtime_ns):
+                    reaproveitar[arcname] = antigo
+
+        # draft_content.json com os caminhos atualizados
         updated_draft = update_media_paths(draft_content, path_mapping)
+        membros.append(("draft_content.json", None,
+                        json.dumps(updated_draft, ensure_ascii=False, indent=2).encode('utf-8')))
+        draft_stat = os.stat(draft_content_path)
+        manifesto.append({"arcname": "draft_content.json", "source": draft_content_path,
+                          "size": draft_stat.st_size, "mtime": draft_stat.st_mtime_ns, "hash": None})
 
-        # Salvar draft_content.json atualizado
-        updated_draft_path = os.path.join(temp_dir, "draft_content.json")
-        with open(updated_draft_path, 'w', encoding='utf-8') as f:
-            json.dump(updated_draft, f, ensure_ascii=False, indent=2)
-
-        # Copiar outros arquivos do projeto original (exceto draft_content.json)
-        for item in os.listdir(draft_path):
-            if item == "draft_content.json":
-                continue
-            src = os.path.join(draft_path, item)
-            dst = os.path.join(temp_dir, item)
-            if os.path.isfile(src):
-                shutil.copy2(src, dst)
-            elif os.path.isdir(src):
-                shutil.copytree(src, dst)
-
-        # Adicionar arquivo de metadados
+        # Arquivo de metadados
         metadata = {
             "exported_at": datetime.now().isoformat(),
             "original_path": draft_path,
             "medias_count": len(copied_files),
             "medias": copied_files,
-            "version": "1.0"
+            "compression": {"policy": politica, "level": nivel},
+            "manifest": manifesto,
+            "version": "1.1"
         }
-        with open(os.path.join(temp_dir, "export_info.json"), 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
-
-        # Criar arquivo ZIP
-        if not output_path.endswith('.zip'):
-            output_path += '.zip'
+        membros.append(("export_info.json", None,
+                        json.dumps(metadata, ensure_ascii=False, indent=2).encode('utf-8')))
 
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zipf.write(file_path, arcname)
+        if reaproveitar:
+            zip_anterior = open(previous_path or output_path, 'rb')
+        with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            compressao = gravar_membros_zip(zipf, membros, politica, nivel, workers,
+                                            reaproveitar, zip_anterior)
+        if zip_anterior:
+            zip_anterior.close()
 
-        # Limpar pasta temporaria
-        shutil.rmtree(temp_dir)
+        os.replace(partial_path, output_path)
 
         # Calcular tamanho do arquivo
         file_size = os.path.getsize(output_path)
@@ -191,13 +578,18 @@ def export_project(params):
             "success": True,
             "outputPath": output_path,
             "mediasCount": len(copied_files),
-            "fileSizeMB": file_size_mb
+            "mediasDeduplicated": len(originais) - len(copied_files),
+            "reusedMembers": len(reaproveitar),
+            "fileSizeMB": file_size_mb,
+            "compression": compressao
         }
 
     except Exception as e:
-        # Limpar pasta temporaria em caso de erro
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        # Remover ZIP incompleto em caso de erro
+        if zip_anterior:
+            zip_anterior.close()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
         return {"success": False, "error": str(e)}
 
 
@@ -297,24 +689,14 @@ def create_draft_meta_info(project_dir, draft_id, project_name, root_path):
     return draft_meta_info
 
 
-def register_in_root_meta(root_meta_path, project_dir, draft_id, project_name, root_path):
-    """Registra o projeto no root_meta_info.json"""
+def register_in_root_meta(root_meta_path, project_dir, draft_id, project_name, root_path, registro=None):
+    """
+    Registra o projeto no root_meta_info.json
+    Com registro (RegistroRootMeta de um lote), a entrada so entra na fila e o arquivo
+    e gravado uma vez quando o lote terminar
+    """
     micro_ts = get_micro_timestamp()
 
-    # Ler ou criar root_meta_info
-    root_meta = {
-        "all_draft_store": [],
-        "draft_ids": 0,
-        "root_path": root_path.replace("\\", "/")
-    }
-
-    if os.path.exists(root_meta_path):
-        try:
-            with open(root_meta_path, 'r', encoding='utf-8') as f:
-                root_meta = json.load(f)
-        except:
-            pass
-
     # Criar entrada para o novo projeto
     new_entry = {
         "cloud_draft_cover": True,
@@ -351,31 +733,178 @@ def register_in_root_meta(root_meta_path, project_dir, draft_id, project_name, r
         "tm_duration": 0
     }
 
-    # Adicionar ao inicio da lista
-    if "all_draft_store" not in root_meta:
-        root_meta["all_draft_store"] = []
+    # Adicionar ao inicio da lista (sob lock, gravacao atomica)
+    if registro is not None:
+        registro.adicionar(new_entry)
+    else:
+        with RegistroRootMeta(root_meta_path, root_path) as registro:
+            registro.adicionar(new_entry)
 
-    root_meta["all_draft_store"].insert(0, new_entry)
+    return new_entry
 
-    # Salvar
-    with open(root_meta_path, 'w', encoding='utf-8') as f:
-        json.dump(root_meta, f, ensure_ascii=False)
 
-    return new_entry
+def _destino_seguro(project_dir, arcname):
+    """
+    Caminho de extracao de um membro, ou None se ele tentar sair da pasta do projeto
+    (caminho absoluto, letra de drive ou componentes '..')
+    """
+    partes = arcname.replace("\\", "/").split("/")
+    if arcname.startswith(("/", "\\")) or ":" in partes[0] or ".." in partes:
+        return None
+    destino = os.path.normpath(os.path.join(project_dir, *[p for p in partes if p]))
+    raiz = os.path.normpath(project_dir)
+    if os.path.commonpath([raiz, destino]) != raiz:
+        return None
+    return destino
+
+
+def _vincular_do_store(origem, destino):
+    """
+    Coloca um arquivo do store no projeto sem duplicar os dados, se o sistema de arquivos
+    deixar: reflink (FICLONE, copia independente que divide os blocos), hardlink (so se o
+    arquivo do store for somente leitura: uma escrita no projeto mudaria o blob de todos),
+    copy_file_range (que o kernel pode resolver como reflink/copia no servidor) ou, por
+    ultimo, copia normal. Retorna o modo usado.
+    """
+    with open(origem, 'rb') as src:
+        with open(destino, 'wb') as dst:
+            try:
+                import fcntl
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return "reflink"
+            except (ImportError, OSError):
+                pass
+        if not os.fstat(src.fileno()).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+            try:
+                os.remove(destino)
+                os.link(origem, destino)
+                return "hardlink"
+            except OSError:
+                pass
+
+    with open(origem, 'rb') as src, open(destino, 'wb') as dst:
+
+        if hasattr(os, "copy_file_range"):
+            try:
+                restante = os.fstat(src.fileno()).st_size
+                while restante > 0:
+                    copiado = os.copy_file_range(src.fileno(), dst.fileno(), restante)
+                    if copiado == 0:
+                        break
+                    restante -= copiado
+                if restante == 0:
+                    return "copy_file_range"
+            except OSError:
+                pass
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+
+        shutil.copyfileobj(src, dst, HASH_BLOCO)
+        return "copy"
+
+
+def _extrair_para_store(origem, media_store, ext):
+    """
+    Copia um membro para o store enquanto calcula o BLAKE2b. O arquivo fica em
+    <store>/<2 primeiros do hash>/<hash><ext>, somente leitura (o nome e o conteudo nao podem
+    divergir); se o conteudo ja existir, o temporario e descartado.
+    Retorna (caminho no store, hash, ja_existia).
+    """
+    pasta_tmp = os.path.join(media_store, "tmp")
+    os.makedirs(pasta_tmp, exist_ok=True)
+    temp_path = os.path.join(pasta_tmp, uuid.uuid4().hex)
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(temp_path, 'wb') as saida:
+            for bloco in iter(lambda: origem.read(HASH_BLOCO), b''):
+                h.update(bloco)
+                saida.write(bloco)
+        digest = h.hexdigest()
+        final = os.path.join(media_store, digest[:2], f"{digest}{ext.lower()}")
+        if os.path.exists(final):
+            os.remove(temp_path)
+            try:
+                os.chmod(final, stat.S_IREAD)  # Blobs de stores antigos podiam ter ficado gravaveis
+            except OSError:
+                pass  # Sem permissao: o blob so nao sera usado como hardlink
+            return final, digest, True
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.chmod(temp_path, stat.S_IREAD)
+        os.replace(temp_path, final)
+        return final, digest, False
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _extrair_membros(zip_path, membros, workers=None, media_store=None, hashes_esperados=None):
+    """
+    Extrai os membros [(ZipInfo, destino)] em paralelo. Cada thread usa o proprio ZipFile;
+    o ZipExtFile confere o CRC no fim de cada membro (BadZipFile se nao bater).
+    Com media_store, os membros de medias/ vao para o store (uma vez por conteudo) e sao
+    vinculados no projeto; se o manifesto trouxer o hash completo, ele tambem e conferido.
+    Retorna (bytes extraidos, {modo: quantidade}, {arcname: hash} das midias do store).
+    """
+    hashes_esperados = hashes_esperados or {}
+    local = threading.local()
+    abertos = []
+    trava = threading.Lock()
+    modos = {}
+    hashes = {}
+
+    def extrair(item):
+        zinfo, destino = item
+        if not hasattr(local, "zipf"):
+            local.zipf = zipfile.ZipFile(zip_path, 'r')
+            with trava:
+                abertos.append(local.zipf)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with local.zipf.open(zinfo) as origem:
+            if media_store and zinfo.filename.startswith("medias/"):
+                no_store, digest, existia = _extrair_para_store(origem, media_store,
+                                                                os.path.splitext(zinfo.filename)[1])
+                esperado = hashes_esperados.get(zinfo.filename)
+                if esperado and esperado != digest:
+                    raise zipfile.BadZipFile(f"Hash nao confere: {zinfo.filename}")
+                modo = _vincular_do_store(no_store, destino)
+                with trava:
+                    hashes[zinfo.filename] = digest
+                    modos[modo] = modos.get(modo, 0) + 1
+                    if existia:
+                        modos["reused"] = modos.get("reused", 0) + 1
+            else:
+                with open(destino, 'wb') as saida:
+                    shutil.copyfileobj(origem, saida, HASH_BLOCO)
+        return zinfo.file_size
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            total = sum(pool.map(extrair, membros))
+        return total, modos, hashes
+    finally:
+        for zipf in abertos:
+            zipf.close()
 
 
-def import_project(params):
+def import_project(params, registro=None):
     """
     Importa um projeto de um arquivo ZIP
-    - Descompacta o arquivo
-    - Atualiza os caminhos das midias para caminhos absolutos
+    - Recusa membros com caminhos fora da pasta do projeto
+    - Descompacta as midias em paralelo, conferindo o CRC de cada membro
+    - Opcional (mediaStore): midias vao para um store compartilhado por conteudo e entram
+      no projeto como hardlink/reflink, sem uma copia por projeto importado
+    - Le o draft_content.json direto do ZIP e grava ja com os caminhos absolutos
     - Cria draft_info.json e draft_meta_info.json
     - Registra no root_meta_info.json
-    - Retorna o caminho do projeto importado
+    - Retorna o caminho do projeto importado e o tempo de cada etapa
     """
     zip_path = params.get("zipPath")
     output_dir = params.get("outputDir")  # Pasta onde extrair o projeto (capcut drafts)
     root_meta_path = params.get("rootMetaPath")  # Caminho do root_meta_info.json
+    workers = params.get("workers")
+    media_store = params.get("mediaStore")  # Pasta do store compartilhado de midias (opcional)
 
     if not zip_path or not os.path.exists(zip_path):
         return {"success": False, "error": "Arquivo ZIP nao encontrado"}
@@ -383,7 +912,16 @@ def import_project(params):
     if not output_dir:
         return {"success": False, "error": "Pasta de destino nao especificada"}
 
+    project_dir = None
+    tempos = {}
+
+    def etapa(nome, inicio):
+        tempos[nome] = round((time.perf_counter() - inicio) * 1000, 1)
+        return time.perf_counter()
+
     try:
+        inicio = time.perf_counter()
+
         # Criar pasta de destino se nao existir
         os.makedirs(output_dir, exist_ok=True)
 
@@ -402,20 +940,46 @@ def import_project(params):
             project_dir = f"{base_project_dir}_{counter}"
             counter += 1
 
-        os.makedirs(project_dir, exist_ok=True)
         project_name = os.path.basename(project_dir)
 
-        # Extrair ZIP
+        # Validar membros antes de extrair qualquer coisa
         with zipfile.ZipFile(zip_path, 'r') as zipf:
-            zipf.extractall(project_dir)
-
-        # Ler draft_content.json
-        draft_content_path = os.path.join(project_dir, "draft_content.json")
-        if not os.path.exists(draft_content_path):
-            return {"success": False, "error": "draft_content.json nao encontrado no ZIP"}
-
-        with open(draft_content_path, 'r', encoding='utf-8') as f:
-            draft_content = json.load(f)
+            membros = []
+            for zinfo in zipf.infolist():
+                destino = _destino_seguro(project_dir, zinfo.filename)
+                if destino is None:
+                    project_dir = None  # Nada foi criado ainda
+                    return {"success": False, "error": f"Caminho invalido no ZIP: {zinfo.filename}"}
+                if not zinfo.is_dir() and zinfo.filename not in ("draft_content.json", INDICE_STORE):
+                    membros.append((zinfo, destino))
+
+            if "draft_content.json" not in zipf.NameToInfo:
+                project_dir = None
+                return {"success": False, "error": "draft_content.json nao encontrado no ZIP"}
+
+            # draft_content.json e export_info.json lidos direto do ZIP (CRC conferido na leitura)
+            draft_content = json.loads(zipf.read("draft_content.json"))
+            export_info = {}
+            if "export_info.json" in zipf.NameToInfo:
+                export_info = json.loads(zipf.read("export_info.json"))
+        inicio = etapa("validate", inicio)
+
+        # Extrair midias e demais arquivos em paralelo
+        os.makedirs(project_dir, exist_ok=True)
+        # Hashes completos do manifesto (export 1.1+) para conferir as midias do store
+        hashes_esperados = {e["arcname"]: e["hash"] for e in export_info.get("manifest", [])
+                            if e.get("hash") and not e.get("partial")}
+        bytes_extraidos, modos, hashes_store = _extrair_membros(zip_path, membros, workers,
+                                                                media_store, hashes_esperados)
+        if hashes_store:
+            indice = {"store": os.path.abspath(media_store), "files": {}}
+            for arcname, digest in hashes_store.items():
+                st = os.stat(os.path.join(project_dir, arcname))
+                indice["files"][arcname] = {"hash": digest, "size": st.st_size,
+                                            "mtime": st.st_mtime_ns, "inode": st.st_ino}
+            with open(os.path.join(project_dir, INDICE_STORE), 'w', encoding='utf-8') as f:
+                json.dump(indice, f, ensure_ascii=False, indent=2)
+        inicio = etapa("extract", inicio)
 
         # Gerar novo ID para o projeto importado
         new_draft_id = generate_draft_id()
@@ -432,27 +996,17 @@ def import_project(params):
                 return os.path.join(project_dir, relative_path).replace("\\", "/")
             return relative_path
 
-        # Atualizar videos
-        for video in materials.get("videos", []):
-            path = video.get("path", "")
-            if path:
-                video["path"] = update_path_to_absolute(path)
-
-        # Atualizar audios
-        for audio in materials.get("audios", []):
-            path = audio.get("path", "")
-            if path:
-                audio["path"] = update_path_to_absolute(path)
-
-        # Atualizar images
-        for image in materials.get("images", []):
-            path = image.get("path", "")
-            if path:
-                image["path"] = update_path_to_absolute(path)
-
-        # Salvar draft_content.json atualizado
+        for tipo in ("videos", "audios", "images"):
+            for material in materials.get(tipo, []):
+                path = material.get("path", "")
+                if path:
+                    material["path"] = update_path_to_absolute(path)
+
+        # Gravar draft_content.json uma vez so, ja atualizado
+        draft_content_path = os.path.join(project_dir, "draft_content.json")
         with open(draft_content_path, 'w', encoding='utf-8') as f:
-            json.dump(draft_content, f, ensure_ascii=False, indent=2)
+            json.dump(draft_content, f, ensure_ascii=False)
+        inicio = etapa("draft", inicio)
 
         # Criar draft_info.json
         create_draft_info(project_dir, new_draft_id, project_name)
@@ -462,14 +1016,8 @@ def import_project(params):
 
         # Registrar no root_meta_info.json
         if root_meta_path:
-            register_in_root_meta(root_meta_path, project_dir, new_draft_id, project_name, output_dir)
-
-        # Ler metadados de exportacao se existirem
-        export_info = {}
-        export_info_path = os.path.join(project_dir, "export_info.json")
-        if os.path.exists(export_info_path):
-            with open(export_info_path, 'r', encoding='utf-8') as f:
-                export_info = json.load(f)
+            register_in_root_meta(root_meta_path, project_dir, new_draft_id, project_name, output_dir, registro)
+        etapa("register", inicio)
 
         return {
             "success": True,
@@ -477,13 +1025,433 @@ def import_project(params):
             "projectName": project_name,
             "draftContentPath": draft_content_path,
             "draftId": new_draft_id,
-            "exportInfo": export_info
+            "exportInfo": export_info,
+            "extractedMB": round(bytes_extraidos / (1024 * 1024), 2),
+            "mediaStore": modos,
+            "timings": tempos
         }
 
     except Exception as e:
+        # Remover projeto parcialmente extraido (ex.: CRC invalido)
+        if project_dir and os.path.isdir(project_dir):
+            shutil.rmtree(project_dir, ignore_errors=True)
         return {"success": False, "error": str(e)}
 
 
+def import_batch(params):
+    """
+    Importa varios ZIPs (zipPaths) para a mesma pasta. Os registros no root_meta_info.json
+    ficam numa fila e sao gravados de uma vez no fim, em vez de uma reescrita por projeto.
+    """
+    zip_paths = params.get("zipPaths") or []
+    root_meta_path = params.get("rootMetaPath")
+    if not zip_paths:
+        return {"success": False, "error": "Nenhum ZIP informado"}
+
+    registro = RegistroRootMeta(root_meta_path, params.get("outputDir")) if root_meta_path else None
+    results = []
+    for zip_path in zip_paths:
+        result = import_project({**params, "zipPath": zip_path}, registro)
+        result["zipPath"] = zip_path
+        results.append(result)
+
+    try:
+        if registro is not None:
+            registro.salvar()
+    except Exception as e:
+        return {"success": False, "error": str(e), "results": results}
+
+    imported = sum(1 for r in results if r.get("success"))
+    return {"success": imported > 0, "imported": imported, "failed": len(results) - imported, "results": results}
+
+
+def _coletar_ids(valor, ids):
+    if isinstance(valor, dict):
+        for chave, item in valor.items():
+            if chave == "id" and isinstance(item, str):
+                if item:
+                    ids.add(item)
+            else:
+                _coletar_ids(item, ids)
+    elif isinstance(valor, list):
+        for item in valor:
+            _coletar_ids(item, ids)
+
+
+class EsqueletoTemplate:
+    """
+    draft_content.json de um template compilado uma vez: o texto JSON fica cortado em trechos
+    fixos e slots (cada id do template, draft id, nome e horario). Carimbar um projeto e so
+    juntar os trechos com valores novos, sem reler nem copiar o JSON do template.
+    Os caminhos com placeholder (relativos a pasta do template) viram o caminho absoluto
+    do template, para as midias continuarem encontradas nos projetos novos.
+    """
+
+    def __init__(self, template_path, keep_media=False, expand_effects=False):
+        with open(os.path.join(template_path, "draft_content.json"), 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+        self.duracao = self._preparar(conteudo, keep_media, expand_effects)
+
+        conteudo["id"] = SLOT_DRAFT_ID
+        conteudo["name"] = SLOT_NOME
+        conteudo["create_time"] = conteudo["update_time"] = SLOT_TEMPO
+        ids = set()
+        _coletar_ids(conteudo, ids)
+
+        pasta = json.dumps(template_path.replace("\\", "/"), ensure_ascii=False)[1:-1]
+        texto = RE_PLACEHOLDER.sub(lambda m: pasta, json.dumps(conteudo, ensure_ascii=False))
+
+        # Slot 0..n-1: ids do template; os especiais usam as chaves de texto
+        slots_por_token = {json.dumps(i, ensure_ascii=False): n for n, i in enumerate(sorted(ids))}
+        for especial in (SLOT_DRAFT_ID, SLOT_NOME, SLOT_TEMPO):
+            slots_por_token[json.dumps(especial)] = especial
+        self.total_ids = len(ids)
+
+        self.trechos = []
+        self.slots = []
+        pos = 0
+        for m in RE_STRING_JSON.finditer(texto):
+            slot = slots_por_token.get(m.group(0))
+            if slot is not None:
+                self.trechos.append(texto[pos:m.start()])
+                self.slots.append(slot)
+                pos = m.end()
+        self.trechos.append(texto[pos:])
+
+    @staticmethod
+    def _preparar(conteudo, keep_media, expand_effects):
+        """Mesmas regras do create-from-template: sem midias ou com efeitos/filtros esticados"""
+        if not keep_media:
+            conteudo["tracks"] = [t for t in conteudo.get("tracks", []) if t.get("type") not in ("video", "audio")]
+            materials = conteudo.get("materials")
+            if materials:
+                for tipo in ("videos", "audios", "images", "audio_balances", "audio_effects", "audio_fades",
+                             "loudnesses", "sound_channel_mappings", "speeds", "vocal_separations", "video_trackings"):
+                    materials[tipo] = []
+            conteudo["duration"] = 0
+            if conteudo.get("keyframes"):
+                conteudo["keyframes"]["videos"] = []
+                conteudo["keyframes"]["audios"] = []
+            return 0
+
+        fim = 0
+        for track in conteudo.get("tracks", []):
+            for seg in track.get("segments", []):
+                tr = seg.get("target_timerange") or {}
+                fim = max(fim, tr.get("start", 0) + tr.get("duration", 0))
+        if expand_effects and fim > 0:
+            for track in conteudo.get("tracks", []):
+                if track.get("type") in ("effect", "filter"):
+                    for seg in track.get("segments", []):
+                        seg["target_timerange"] = {**(seg.get("target_timerange") or {}), "start": 0, "duration": fim}
+        return conteudo.get("duration") or fim
+
+    def carimbar(self, draft_id, project_name, timestamp):
+        """Texto do draft_content.json de um projeto novo, com ids novos em todos os slots"""
+        valores = [f'"{uuid.uuid4()}"'.upper() for _ in range(self.total_ids)]
+        especiais = {SLOT_DRAFT_ID: f'"{draft_id}"', SLOT_NOME: json.dumps(project_name, ensure_ascii=False),
+                     SLOT_TEMPO: str(timestamp)}
+        partes = [self.trechos[0]]
+        for slot, trecho in zip(self.slots, self.trechos[1:]):
+            partes.append(valores[slot] if isinstance(slot, int) else especiais[slot])
+            partes.append(trecho)
+        return "".join(partes)
+
+
+def stamp_template(params):
+    """
+    Cria varios projetos a partir de um template, numa chamada so
+    - names: nomes dos projetos (ou count + baseName: baseName_001, baseName_002, ...)
+    - O template e compilado uma vez (EsqueletoTemplate); cada projeto ganha ids novos
+    - Cria draft_info.json e draft_meta_info.json de cada projeto
+    - Os registros no root_meta_info.json sao gravados de uma vez no fim
+    """
+    template_path = params.get("templatePath")
+    output_dir = params.get("outputDir")
+    root_meta_path = params.get("rootMetaPath")
+
+    if not template_path or not os.path.exists(os.path.join(template_path, "draft_content.json")):
+        return {"success": False, "error": "Template nao contem draft_content.json"}
+    if not output_dir:
+        return {"success": False, "error": "Pasta de destino nao especificada"}
+
+    names = params.get("names")
+    if not names:
+        base_name = params.get("baseName") or os.path.basename(template_path.rstrip("/\\"))
+        names = [f"{base_name}_{i:03d}" for i in range(1, int(params.get("count") or 1) + 1)]
+
+    inicio = time.perf_counter()
+    try:
+        esqueleto = EsqueletoTemplate(template_path, params.get("keepMedia", False), params.get("expandEffects", False))
+    except Exception as e:
+        return {"success": False, "error": f"Template invalido: {e}"}
+    compilado_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+    registro = RegistroRootMeta(root_meta_path, output_dir) if root_meta_path else None
+    projects = []
+    errors = []
+    for nome in names:
+        project_dir = None
+        try:
+            nome = re.sub(r'[\\/:*?"<>|]', '', str(nome)).strip() or f"Template_{int(time.time())}"
+            project_dir = os.path.join(output_dir, nome)
+            counter = 1
+            while os.path.exists(project_dir):
+                project_dir = os.path.join(output_dir, f"{nome}_{counter}")
+                counter += 1
+            project_name = os.path.basename(project_dir)
+            os.makedirs(project_dir)
+
+            draft_id = generate_draft_id()
+            draft_content_path = os.path.join(project_dir, "draft_content.json")
+            with open(draft_content_path, 'w', encoding='utf-8') as f:
+                f.write(esqueleto.carimbar(draft_id, project_name, int(time.time())))
+            create_draft_info(project_dir, draft_id, project_name)
+            create_draft_meta_info(project_dir, draft_id, project_name, output_dir)
+            if registro is not None:
+                register_in_root_meta(root_meta_path, project_dir, draft_id, project_name, output_dir, registro)
+                registro.atualizar(draft_id, {"tm_duration": esqueleto.duracao})
+
+            projects.append({"projectPath": project_dir, "projectName": project_name,
+                             "draftContentPath": draft_content_path, "draftId": draft_id})
+        except Exception as e:
+            if project_dir and os.path.isdir(project_dir):
+                shutil.rmtree(project_dir, ignore_errors=True)
+            errors.append({"name": nome, "error": str(e)})
+
+    try:
+        if registro is not None:
+            registro.salvar()
+    except Exception as e:
+        return {"success": False, "error": str(e), "projects": projects, "errors": errors}
+
+    return {
+        "success": len(projects) > 0,
+        "created": len(projects),
+        "failed": len(errors),
+        "projects": projects,
+        "errors": errors,
+        "templateName": os.path.basename(template_path.rstrip("/\\")),
+        "timings": {"compile": compilado_ms, "total": round((time.perf_counter() - inicio) * 1000, 1)}
+    }
+
+
+def _copiar_bloco(src, dst, pos, tamanho):
+    """Copia ate tamanho bytes de src para dst na mesma posicao; o kernel faz a copia quando pode"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            return os.copy_file_range(src.fileno(), dst.fileno(), tamanho, pos, pos)
+        except OSError:
+            pass  # Ex.: sistemas de arquivos diferentes em kernels antigos
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        try:
+            os.lseek(dst.fileno(), pos, os.SEEK_SET)
+            return os.sendfile(dst.fileno(), src.fileno(), pos, tamanho)
+        except OSError:
+            pass
+    src.seek(pos)
+    dst.seek(pos)
+    copiado = 0
+    while copiado < tamanho:
+        dados = src.read(min(HASH_BLOCO, tamanho - copiado))
+        if not dados:
+            break
+        dst.write(dados)
+        copiado += len(dados)
+    return copiado
+
+
+class DiarioCopia:
+    """
+    Diario (NDJSON) de uma copia retomavel: com que versao da origem (tamanho, mtime) cada
+    .part foi comecado, ate onde ele ja esta gravado em disco e quais arquivos terminaram.
+    Gravado a cada evento, entao sobrevive a uma interrupcao no meio da copia.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.iniciados = {}
+        self.progresso = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        evento = json.loads(linha)
+                    except ValueError:
+                        continue  # Linha cortada pela interrupcao
+                    rel, versao = evento.get("arquivo"), (evento.get("size"), evento.get("mtime"))
+                    if evento.get("estado") == "iniciado":
+                        self.iniciados[rel] = versao
+                        self.progresso[rel] = 0
+                    elif evento.get("estado") == "progresso" and self.iniciados.get(rel) == versao:
+                        self.progresso[rel] = evento.get("pos", 0)
+        self.arquivo = open(path, 'a', encoding='utf-8')
+
+    def registrar(self, estado, rel, versao, pos=None):
+        evento = {"estado": estado, "arquivo": rel, "size": versao[0], "mtime": versao[1]}
+        if pos is not None:
+            evento["pos"] = pos
+        with self.lock:
+            self.arquivo.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            self.arquivo.flush()
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+def _arquivo_igual(origem, destino, st, verificar_hash=False):
+    """Destino ja e uma copia da origem: mesmo tamanho e mtime (e, se pedido, mesmo hash)"""
+    try:
+        st_destino = os.stat(destino)
+    except OSError:
+        return False
+    if st_destino.st_size != st.st_size or abs(st_destino.st_mtime_ns - st.st_mtime_ns) > TOLERANCIA_MTIME_NS:
+        return False
+    return not verificar_hash or hash_midia(origem) == hash_midia(destino)
+
+
+def _copiar_arquivo_retomavel(origem, destino, rel, st, diario):
+    """
+    Copia em blocos para destino.part e troca pelo destino no fim. Cada bloco vai para o disco
+    (fsync) antes de entrar no diario, entao um .part comecado com a mesma versao da origem e
+    retomado do ultimo bloco confirmado. Retorna (bytes copiados, bytes aproveitados do .part)
+    """
+    parcial = destino + ".part"
+    versao = (st.st_size, st.st_mtime_ns)
+    inicio = 0
+    if os.path.exists(parcial) and diario.iniciados.get(rel) == versao:
+        inicio = min(diario.progresso.get(rel, 0), os.path.getsize(parcial))
+    else:
+        diario.registrar("iniciado", rel, versao)
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(origem, 'rb') as src, open(parcial, 'r+b' if inicio else 'wb') as dst:
+        dst.truncate(inicio)
+        pos = inicio
+        while pos < st.st_size:
+            copiado = _copiar_bloco(src, dst, pos, min(BLOCO_COPIA, st.st_size - pos))
+            if copiado == 0:
+                raise IOError(f"Arquivo de origem diminuiu durante a copia: {rel}")
+            pos += copiado
+            if pos < st.st_size:
+                dst.flush()
+                os.fsync(dst.fileno())
+                diario.registrar("progresso", rel, versao, pos)
+    os.utime(parcial, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(parcial, destino)
+    diario.registrar("copiado", rel, versao)
+    return st.st_size - inicio, inicio
+
+
+def _remover_sobras(target_path, manter):
+    """
+    Apaga do destino o que nao veio da origem nesta copia (arquivos apagados ou renomeados
+    na origem, .part de arquivos que sumiram) e as pastas que ficarem vazias. Retorna quantos saiu
+    """
+    removidos = 0
+    for raiz, pastas, nomes in os.walk(target_path, topdown=False):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            rel = os.path.relpath(caminho, target_path)
+            if rel not in manter and rel not in ARQUIVOS_LOCAIS_COPIA:
+                os.remove(caminho)
+                removidos += 1
+        if raiz != target_path and not os.listdir(raiz):
+            os.rmdir(raiz)
+    return removidos
+
+
+def copy_to_local(params):
+    """
+    Copia um projeto (ex.: de uma pasta sincronizada com a nuvem) para a pasta local do CapCut
+    - Arquivos ja iguais no destino (tamanho e mtime; com verifyHash tambem o hash) sao pulados
+    - Os demais sao copiados em blocos (copy_file_range/sendfile) num pool limitado de threads
+    - Um diario na pasta de destino permite retomar uma copia interrompida de onde parou,
+      inclusive no meio de um arquivo grande
+    - No fim, os caminhos com placeholder do draft_content.json viram caminhos absolutos do destino
+      e o que nao existe mais na origem e apagado do destino (menos draft_info/draft_meta_info)
+    """
+    source_path = params.get("sourcePath")
+    target_path = params.get("targetPath")
+    verificar_hash = params.get("verifyHash", False)
+    workers = params.get("workers") or 4  # Limitado: a origem costuma ser uma pasta sincronizada lenta
+
+    if not source_path or not os.path.exists(os.path.join(source_path, "draft_content.json")):
+        return {"success": False, "error": "Arquivo draft_content.json nao encontrado"}
+    if not target_path:
+        return {"success": False, "error": "Pasta de destino nao especificada"}
+
+    inicio = time.perf_counter()
+    try:
+        arquivos = []
+        for raiz, _, nomes in os.walk(source_path):
+            for nome in nomes:
+                origem = os.path.join(raiz, nome)
+                arquivos.append((os.path.relpath(origem, source_path), origem, os.stat(origem)))
+
+        os.makedirs(target_path, exist_ok=True)
+        diario = DiarioCopia(os.path.join(target_path, DIARIO_COPIA))
+        pendentes = []
+        pulados = 0
+        try:
+            for rel, origem, st in arquivos:
+                destino = os.path.join(target_path, rel)
+                if _arquivo_igual(origem, destino, st, verificar_hash):
+                    pulados += 1
+                else:
+                    pendentes.append((rel, origem, destino, st))
+
+            copiados = aproveitados = 0
+            erros = []
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pendentes) or 1))) as pool:
+                futures = {pool.submit(_copiar_arquivo_retomavel, origem, destino, rel, st, diario): rel
+                           for rel, origem, destino, st in pendentes}
+                for future, rel in futures.items():
+                    try:
+                        n, retomado = future.result()
+                        copiados += n
+                        aproveitados += retomado
+                    except Exception as e:
+                        erros.append({"file": rel, "error": str(e)})
+        finally:
+            diario.fechar()
+
+        if erros:
+            # O diario fica: a proxima chamada retoma daqui
+            return {"success": False, "error": f"{len(erros)} arquivo(s) nao copiado(s)", "failed": erros,
+                    "resumable": True, "copiedMB": round(copiados / 1024 / 1024, 2)}
+
+        # Placeholders -> caminho absoluto do destino (projetos locais do CapCut usam caminhos absolutos)
+        draft_content_path = os.path.join(target_path, "draft_content.json")
+        with open(draft_content_path, 'r', encoding='utf-8') as f:
+            texto = f.read()
+        absoluto = json.dumps(target_path.replace("\\", "/"), ensure_ascii=False)[1:-1]
+        texto = RE_PLACEHOLDER.sub(lambda m: absoluto, texto)
+        duracao = json.loads(texto).get("duration", 0)
+        temp_path = draft_content_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(temp_path, draft_content_path)
+
+        removidos = _remover_sobras(target_path, {rel for rel, _, _ in arquivos})
+        os.remove(diario.path)
+        return {
+            "success": True,
+            "targetPath": target_path,
+            "files": len(arquivos),
+            "copied": len(pendentes),
+            "skipped": pulados,
+            "removed": removidos,
+            "copiedMB": round(copiados / 1024 / 1024, 2),
+            "resumedMB": round(aproveitados / 1024 / 1024, 2),
+            "duration": duracao,
+            "ms": round((time.perf_counter() - inicio) * 1000, 1)
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e), "resumable": True}
+
+
 def main():
     if len(sys.argv) < 2:
         print(json.dumps({"success": False, "error": "No command provided"}))
@@ -505,6 +1473,12 @@ def main():
             result = export_project(command)
         elif action == 'import':
             result = import_project(command)
+        elif action == 'import_batch':
+            result = import_batch(command)
+        elif action == 'stamp_template':
+            result = stamp_template(command)
+        elif action == 'copy_to_local':
+            result = copy_to_local(command)
         else:
             result = {"success": False, "error": f"Unknown action: {action}"}
 
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Root Meta - Registro de projetos no root_meta_info.json do CapCut
+O arquivo e compartilhado com o main.js: toda leitura-modificacao-escrita acontece sob um
+lock consultivo (root_meta_info.json.lock, criado de forma exclusiva pelos dois lados) e a
+gravacao e atomica (temporario + os.replace). As alteracoes ficam numa fila e sao aplicadas
+de uma vez, entao um lote de importacoes custa uma unica reescrita.
+"""
+
+import json
+import os
+import time
+import uuid
+
+LOCK_TIMEOUT = 10.0  # Segundos esperando o lock antes de desistir
+LOCK_VENCIDO = 30.0  # Lock mais velho que isso e de um processo que morreu: pode ser removido
+LOCK_ESPERA = 0.025
+
+
+def _ler_token(lock_path):
+    try:
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _remover_lock_vencido(lock_path, token):
+    """
+    Remove um lock vencido so se ele ainda for o que foi lido (token): renomeia para um nome
+    unico (atomico) e confere o conteudo; se outro processo acabou de pegar o lock, devolve o arquivo
+    """
+    vencido = f"{lock_path}.{uuid.uuid4().hex}.stale"
+    try:
+        os.rename(lock_path, vencido)
+    except OSError:
+        return  # O lock sumiu entre uma chamada e outra
+    if _ler_token(vencido) != token:
+        try:
+            os.link(vencido, lock_path)  # Falha se ja existir um lock novo: nao sobrescreve
+        except OSError:
+            pass
+    try:
+        os.remove(vencido)
+    except OSError:
+        pass
+
+
+def adquirir_lock(lock_path, timeout=LOCK_TIMEOUT):
+    """
+    Cria o arquivo de lock de forma exclusiva (O_EXCL), esperando se outro processo tiver.
+    Retorna o token gravado no lock (pid:uuid), usado para liberar so o proprio lock
+    """
+    token = f"{os.getpid()}:{uuid.uuid4().hex}"
+    inicio = time.monotonic()
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, token.encode())
+            os.close(fd)
+            return token
+        except FileExistsError:
+            atual = _ler_token(lock_path)
+            try:
+                if atual is not None and time.time() - os.path.getmtime(lock_path) > LOCK_VENCIDO:
+                    _remover_lock_vencido(lock_path, atual)
+                    continue
+            except OSError:
+                continue  # O lock sumiu entre uma chamada e outra
+            if time.monotonic() - inicio > timeout:
+                raise TimeoutError("root_meta_info.json bloqueado por outro processo")
+            time.sleep(LOCK_ESPERA)
+
+
+def liberar_lock(lock_path, token):
+    """So remove o lock se ele ainda for nosso (pode ter sido tomado como vencido por outro processo)"""
+    if _ler_token(lock_path) != token:
+        return
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+
+
+class RegistroRootMeta:
+    """
+    Fila de alteracoes no root_meta_info.json, aplicadas de uma vez em salvar()
+    (ou ao sair do bloco with sem erro). O lock so e segurado durante a aplicacao.
+    """
+
+    def __init__(self, root_meta_path, root_path=None):
+        self.root_meta_path = root_meta_path
+        self.root_path = root_path or os.path.dirname(root_meta_path)
+        self.operacoes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is None:
+            self.salvar()
+        return False
+
+    def adicionar(self, entrada):
+        """Novo projeto no inicio da lista (substitui uma entrada com o mesmo draft_id)"""
+        self.operacoes.append(("adicionar", entrada.get("draft_id"), entrada))
+
+    def remover(self, draft_id):
+        self.operacoes.append(("remover", draft_id, None))
+
+    def atualizar(self, draft_id, campos):
+        self.operacoes.append(("atualizar", draft_id, campos))
+
+    def _ler(self):
+        root_meta = {
+            "all_draft_store": [],
+            "draft_ids": 0,
+            "root_path": self.root_path.replace("\\", "/")
+        }
+        if os.path.exists(self.root_meta_path):
+            try:
+                with open(self.root_meta_path, 'r', encoding='utf-8') as f:
+                    root_meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+        if not isinstance(root_meta.get("all_draft_store"), list):
+            root_meta["all_draft_store"] = []
+        return root_meta
+
+    def _aplicar(self, root_meta):
+        """
+        Aplica a fila em O(n + alteracoes): indice draft_id -> posicao na lista atual,
+        remocoes marcadas por posicao e novas entradas juntadas no fim, na frente da lista
+        """
+        entradas = root_meta["all_draft_store"]
+        indice = {entrada.get("draft_id"): i for i, entrada in enumerate(entradas)}
+        removidos = set()
+        novos = {}  # draft_id -> entrada, na ordem de insercao
+
+        for tipo, draft_id, dados in self.operacoes:
+            if tipo == "adicionar":
+                if draft_id in indice:
+                    removidos.add(indice.pop(draft_id))
+                novos.pop(draft_id, None)
+                novos[draft_id] = dados
+            elif tipo == "remover":
+                if draft_id in novos:
+                    del novos[draft_id]
+                elif draft_id in indice:
+                    removidos.add(indice.pop(draft_id))
+            elif tipo == "atualizar":
+                if draft_id in novos:
+                    novos[draft_id].update(dados)
+                elif draft_id in indice:
+                    entradas[indice[draft_id]].update(dados)
+
+        root_meta["all_draft_store"] = list(reversed(list(novos.values()))) + \
+            [entrada for i, entrada in enumerate(entradas) if i not in removidos]
+        root_meta["draft_ids"] = root_meta.get("draft_ids", 0) + len(novos)
+        return root_meta
+
+    def salvar(self):
+        """Trava, rele o arquivo, aplica a fila e grava atomicamente. Retorna o root_meta final"""
+        if not self.operacoes:
+            return None
+        lock_path = f"{self.root_meta_path}.lock"
+        token = adquirir_lock(lock_path)
+        try:
+            root_meta = self._aplicar(self._ler())
+            temp_path = f"{self.root_meta_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(root_meta, f, ensure_ascii=False)
+            os.replace(temp_path, self.root_meta_path)
+            self.operacoes = []
+            return root_meta
+        finally:
+            liberar_lock(lock_path, token)
@@ -8,9 +8,13 @@ import json
 import sys
 import os
 import re
+import shutil
+import hashlib
+import tempfile
 from datetime import datetime
 import random
 import uuid
+import time
 
 # 14 Effect Templates
 EFFECT_TEMPLATES = [
@@ -117,6 +121,13 @@ def create_backup(file_path):
         f.write(content)
     return backup_path
 
+def _salvar_draft_atomico(draft_path, projeto):
+    """Grava o draft num .tmp e troca de uma vez (o CapCut nunca lê um JSON pela metade)."""
+    temp_path = draft_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(projeto, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, draft_path)
+
 def parse_srt(filepath, debug=True):
     """
     Parse SRT file and return list of subtitles.
@@ -464,8 +475,7 @@ def sync_project(draft_path, audio_track_index, mode='audio', sync_subtitles=Tru
                 media_mod += 1
             logs.append(f"Mídias por legenda: {media_mod}")
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
         logs.append("[OK] Salvo!")
         return {'success': True, 'logs': logs, 'stats': {'gapsRemoved': gaps, 'mediaModified': media_mod, 'subtitlesModified': sub_mod}}
     except Exception as e:
@@ -509,8 +519,7 @@ def loop_video(draft_path, audio_track_index, order='random'):
                 cur += ns['target_timerange']['duration']
 
         projeto['tracks'][vid_idx]['segments'] = novos
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
         logs.append(f"Ciclos: {ciclos}, Total: {len(novos)}")
         return {'success': True, 'logs': logs, 'stats': {'originalCount': len(vid_orig), 'newCount': len(novos), 'cycles': ciclos}}
     except Exception as e:
@@ -540,8 +549,7 @@ def loop_audio(draft_path, track_index, target_duration):
                 cur += ns['target_timerange']['duration']
 
         projeto['tracks'][track_index]['segments'] = novos
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
         logs.append(f"Ciclos: {ciclos}, Total: {len(novos)}")
         return {'success': True, 'logs': logs, 'stats': {'originalCount': len(orig), 'newCount': len(novos), 'cycles': ciclos}}
     except Exception as e:
@@ -681,8 +689,7 @@ def insert_srt(draft_path, srt_folders=None, create_title=True, selected_file_pa
         projeto['materials'].setdefault('material_animations', []).extend(spds)
         projeto['tracks'].extend(tracks)
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
         logs.append(f"Legendas: {total}")
         logs.append(f"Legendas inseridas! {len(all_subtitle_segs)} segmentos em {len(tracks)} track(s)")
         return {'success': True, 'logs': logs, 'stats': {'totalSubtitles': total, 'tracksCreated': len(tracks)}}
@@ -809,8 +816,7 @@ def insert_srt_batch(draft_path, srt_files, create_title=True, gap_ms=2000000):
             projeto['duration'] = total_duration
             logs.append(f"[+] Duration do projeto: {total_duration/1000000:.2f}s")
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         logs.append(f"Total: {total} legendas em {len(srt_files)} arquivos")
         return {
@@ -990,8 +996,7 @@ def insert_media_batch(draft_path, media_files, image_duration=5000000):
             projeto['duration'] = current_time
             logs.append(f"[+] Duração: {current_time/1000000:.2f}s")
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         return {'success': True, 'logs': logs, 'stats': {'totalMedia': len(media_files), 'totalDuration': current_time}}
     except Exception as e:
@@ -1029,8 +1034,8 @@ def criar_materiais_auxiliares_audio():
         'refs': [speed_id, placeholder_id, beat_id, channel_id, vocal_id]
     }
 
-def criar_segmento_audio(mat_id, start, duration, extra_refs, render_index=0):
-    """Cria um segmento de áudio para a timeline."""
+def criar_segmento_audio(mat_id, start, duration, extra_refs, render_index=0, source_start=0):
+    """Cria um segmento de áudio para a timeline (source_start: início do trecho dentro do arquivo)."""
     seg_id = str(uuid.uuid4()).upper()
     return {
         "caption_info": None, "cartoon": False, "clip": None,
@@ -1042,7 +1047,7 @@ def criar_segmento_audio(mat_id, start, duration, extra_refs, render_index=0):
         "render_timerange": {"duration": 0, "start": 0},
         "responsive_layout": {"enable": False, "horizontal_pos_layout": 0, "size_layout": 0, "target_follow": "", "vertical_pos_layout": 0},
         "reverse": False, "source": "segmentsourcenormal",
-        "source_timerange": {"duration": duration, "start": 0},
+        "source_timerange": {"duration": duration, "start": source_start},
         "speed": 1.0, "state": 0, "target_timerange": {"duration": duration, "start": start},
         "template_id": "", "template_scene": "default", "track_attribute": 0, "track_render_index": 1,
         "uniform_scale": None, "visible": True, "volume": 1.0
@@ -1130,8 +1135,7 @@ def insert_audio_batch(draft_path, audio_files, use_existing_track=False, track_
             projeto['duration'] = current_time
             logs.append(f"[+] Duração: {current_time/1000000:.2f}s")
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         return {'success': True, 'logs': logs, 'stats': {'totalAudio': len(audio_files), 'totalDuration': current_time}}
     except Exception as e:
@@ -1185,8 +1189,7 @@ def randomize_existing_media(draft_path):
         logs.append(f"[+] Ordem randomizada!")
 
         # Salvar
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         return {'success': True, 'logs': logs, 'stats': {'totalMedia': len(segments)}}
     except Exception as e:
@@ -1616,8 +1619,7 @@ def import_media_folder(draft_path, folder_path, add_animations=True, sync_to_au
         if final_duration > projeto.get('duration', 0):
             projeto['duration'] = final_duration
 
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         logs.append(f"[OK] Importação concluída! Duração: {final_duration/1000000:.2f}s")
 
@@ -1637,6 +1639,91 @@ def import_media_folder(draft_path, folder_path, add_animations=True, sync_to_au
         return {'error': str(e), 'traceback': traceback.format_exc()}
 
 # ============ INSERT CREATOR CONTENT ============
+ANIMACOES_CREATOR = [
+    criar_keyframe_zoom_in_suave,
+    criar_keyframe_pan_down,
+    criar_keyframe_zoom_out,
+    criar_keyframe_zoom_in_forte,
+    criar_keyframe_pan_down_forte,
+    criar_keyframe_pan_horizontal
+]
+
+def _track_creator(projeto, tipo, logs):
+    """Índice da primeira track do tipo ('video' ou 'audio'); cria se não existir."""
+    for idx, track in enumerate(projeto.get('tracks', [])):
+        if track.get('type') == tipo:
+            return idx
+    track = {
+        "attribute": 0, "flag": 0, "id": str(uuid.uuid4()).upper(),
+        "is_default_name": True, "name": "", "segments": [], "type": tipo
+    }
+    if tipo == 'video':
+        projeto.setdefault('tracks', []).insert(0, track)
+        idx = 0
+    else:
+        projeto.setdefault('tracks', []).append(track)
+        idx = len(projeto['tracks']) - 1
+    logs.append(f"[+] Track de {'vídeo' if tipo == 'video' else 'áudio'} criada")
+    return idx
+
+def _animar_imagem_creator(segment, anim_index, duration):
+    """(Re)cria os keyframes da animação da imagem para a duração do segmento."""
+    keyframes = ANIMACOES_CREATOR[anim_index % len(ANIMACOES_CREATOR)](duration)
+    for kf in keyframes:
+        kf['material_id'] = segment['material_id']
+    segment['common_keyframes'] = keyframes
+
+def _inserir_imagem_creator(projeto, track_idx, file_path, start, duration, anim_index=None, dimensoes=None):
+    """
+    Cria material + segmento de uma imagem do Creator e adiciona à track. Retorna (segmento, material).
+    dimensoes: (largura, altura) já conhecidas (imagens.json); sem elas usa get_media_info.
+    """
+    if dimensoes:
+        width, height = dimensoes
+    else:
+        info = get_media_info(file_path)
+        width, height = info['width'], info['height']
+
+    # Criar material de vídeo/imagem
+    mat_id, local_mat_id, video_mat = criar_material_video(
+        file_path, duration, width, height, False, 'photo'
+    )
+    projeto['materials'].setdefault('videos', []).append(video_mat)
+
+    # Criar materiais auxiliares
+    aux = criar_materiais_auxiliares_video()
+    projeto['materials'].setdefault('speeds', []).append(aux['speed'])
+    projeto['materials'].setdefault('placeholder_infos', []).append(aux['placeholder'])
+    projeto['materials'].setdefault('canvases', []).append(aux['canvas'])
+    projeto['materials'].setdefault('sound_channel_mappings', []).append(aux['channel'])
+    projeto['materials'].setdefault('material_colors', []).append(aux['color'])
+    projeto['materials'].setdefault('vocal_separations', []).append(aux['vocal'])
+
+    # Criar segmento (com animação, se pedida)
+    segment = criar_segmento_video(mat_id, start, duration, aux['refs'])
+    if anim_index is not None:
+        _animar_imagem_creator(segment, anim_index, duration)
+
+    projeto['tracks'][track_idx]['segments'].append(segment)
+    return segment, video_mat
+
+def _inserir_audio_creator(projeto, track_idx, part_path, start, duration, source_start=0, material_duration=None):
+    """Cria material + segmento de uma parte de áudio do Creator e adiciona à track. Retorna (segmento, material)."""
+    mat_id, local_mat_id, audio_mat = criar_material_audio(part_path, material_duration or duration)
+    projeto['materials'].setdefault('audios', []).append(audio_mat)
+
+    # Criar materiais auxiliares do áudio
+    aux = criar_materiais_auxiliares_audio()
+    projeto['materials'].setdefault('speeds', []).append(aux['speed'])
+    projeto['materials'].setdefault('placeholder_infos', []).append(aux['placeholder'])
+    projeto['materials'].setdefault('beats', []).append(aux['beat'])
+    projeto['materials'].setdefault('sound_channel_mappings', []).append(aux['channel'])
+    projeto['materials'].setdefault('vocal_separations', []).append(aux['vocal'])
+
+    segment = criar_segmento_audio(mat_id, start, duration, aux['refs'], source_start=source_start)
+    projeto['tracks'][track_idx]['segments'].append(segment)
+    return segment, audio_mat
+
 def insert_creator_content(draft_path, content_folder, add_animations=True):
     """
     Insere conteúdo gerado pelo Creator (imagens + áudio) no projeto.
@@ -1663,12 +1750,21 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
         if not os.path.exists(images_folder):
             return {'error': f'Pasta de imagens não encontrada: {images_folder}'}
 
-        # Listar imagens ordenadas
-        image_files = sorted([
+        # Listar imagens ordenadas: as da pasta + as do imagens.json (já otimizadas, com as dimensões
+        # reais). Uma imagem cuja otimização falhou continua na pasta como original e entra com as
+        # dimensões lidas do arquivo
+        image_dims = {}
+        imagens_json = os.path.join(content_folder, 'imagens.json')
+        if os.path.exists(imagens_json):
+            with open(imagens_json, 'r', encoding='utf-8') as f:
+                for img in json.load(f):
+                    if 'erro' not in img and os.path.exists(os.path.join(images_folder, img['arquivo'])):
+                        image_dims[os.path.join(images_folder, img['arquivo'])] = (img['largura'], img['altura'])
+        image_files = sorted(set(image_dims) | {
             os.path.join(images_folder, f)
             for f in os.listdir(images_folder)
             if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))
-        ])
+        })
 
         if not image_files:
             return {'error': 'Nenhuma imagem encontrada na pasta'}
@@ -1686,9 +1782,25 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
 
         # Calcular duração total do áudio (partes ou completo)
         audio_duration = 0
-        audio_parts_info = []  # Lista de (path, duration) para cada parte
-
-        if audio_parts:
+        audio_parts_info = []  # Lista de (path, duration, source_start, material_duration) para cada parte
+        duracoes_file = os.path.join(content_folder, 'duracoes.json')
+
+        if audio_parts and os.path.exists(duracoes_file):
+            # Durações já calculadas pelo Creator (com o corte de silêncio entre as partes)
+            with open(duracoes_file, 'r', encoding='utf-8') as f:
+                duracoes = json.load(f)
+            for parte in duracoes.get('partes', []):
+                if not parte.get('arquivo') or parte.get('duracao', 0) <= 0:
+                    continue
+                part_duration = int(parte['duracao'] * 1000000)
+                audio_parts_info.append((
+                    os.path.join(audios_folder, parte['arquivo']), part_duration,
+                    int(parte.get('corte_inicio', 0) * 1000000),
+                    int(parte.get('duracao_original', parte['duracao']) * 1000000)
+                ))
+                audio_duration += part_duration
+            logs.append(f"[INFO] {len(audio_parts_info)} partes de áudio ({audio_duration/1000000:.2f}s total, duracoes.json)")
+        elif audio_parts:
             import wave
             for part_path in audio_parts:
                 try:
@@ -1696,7 +1808,7 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
                         frames = wav.getnframes()
                         rate = wav.getframerate()
                         part_duration = int((frames / rate) * 1000000)  # microseconds
-                        audio_parts_info.append((part_path, part_duration))
+                        audio_parts_info.append((part_path, part_duration, 0, part_duration))
                         audio_duration += part_duration
                 except Exception as e:
                     logs.append(f"[WARN] Erro ao ler {os.path.basename(part_path)}: {e}")
@@ -1708,7 +1820,7 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
                     frames = wav.getnframes()
                     rate = wav.getframerate()
                     audio_duration = int((frames / rate) * 1000000)  # microseconds
-                    audio_parts_info.append((audio_completo_file, audio_duration))
+                    audio_parts_info.append((audio_completo_file, audio_duration, 0, audio_duration))
                 logs.append(f"[INFO] Áudio completo: {audio_duration/1000000:.2f}s")
             except Exception as e:
                 logs.append(f"[WARN] Erro ao ler áudio: {e}")
@@ -1722,20 +1834,7 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
         image_duration = audio_duration // len(image_files)
         logs.append(f"[INFO] Duração por imagem: {image_duration/1000000:.2f}s")
 
-        # Encontrar ou criar track de vídeo
-        video_track_idx = None
-        for idx, track in enumerate(projeto.get('tracks', [])):
-            if track.get('type') == 'video':
-                video_track_idx = idx
-                break
-
-        if video_track_idx is None:
-            projeto.setdefault('tracks', []).insert(0, {
-                "attribute": 0, "flag": 0, "id": str(uuid.uuid4()).upper(),
-                "is_default_name": True, "name": "", "segments": [], "type": "video"
-            })
-            video_track_idx = 0
-            logs.append("[+] Track de vídeo criada")
+        video_track_idx = _track_creator(projeto, 'video', logs)
 
         # Calcular posição inicial (final do último segmento ou 0)
         current_time = 0
@@ -1745,86 +1844,23 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
 
         start_time = current_time  # Guardar para o áudio
 
-        # Lista de animações disponíveis
-        animation_funcs = [
-            criar_keyframe_zoom_in_suave,
-            criar_keyframe_pan_down,
-            criar_keyframe_zoom_out,
-            criar_keyframe_zoom_in_forte,
-            criar_keyframe_pan_down_forte,
-            criar_keyframe_pan_horizontal
-        ]
-
         # Inserir imagens
         for i, file_path in enumerate(image_files):
-            info = get_media_info(file_path)
-
-            # Criar material de vídeo/imagem
-            mat_id, local_mat_id, video_mat = criar_material_video(
-                file_path, image_duration, info['width'], info['height'], False, 'photo'
-            )
-            projeto['materials'].setdefault('videos', []).append(video_mat)
-
-            # Criar materiais auxiliares
-            aux = criar_materiais_auxiliares_video()
-            projeto['materials'].setdefault('speeds', []).append(aux['speed'])
-            projeto['materials'].setdefault('placeholder_infos', []).append(aux['placeholder'])
-            projeto['materials'].setdefault('canvases', []).append(aux['canvas'])
-            projeto['materials'].setdefault('sound_channel_mappings', []).append(aux['channel'])
-            projeto['materials'].setdefault('material_colors', []).append(aux['color'])
-            projeto['materials'].setdefault('vocal_separations', []).append(aux['vocal'])
-
-            # Criar segmento
-            segment = criar_segmento_video(mat_id, current_time, image_duration, aux['refs'])
-
-            # Adicionar animação
-            if add_animations:
-                anim_func = animation_funcs[i % len(animation_funcs)]
-                keyframes = anim_func(image_duration)
-                for kf in keyframes:
-                    kf['material_id'] = mat_id
-                segment['common_keyframes'] = keyframes
-
-            projeto['tracks'][video_track_idx]['segments'].append(segment)
+            _inserir_imagem_creator(projeto, video_track_idx, file_path, current_time, image_duration,
+                                    i if add_animations else None, image_dims.get(file_path))
             current_time += image_duration
 
         logs.append(f"[+] {len(image_files)} imagens inseridas")
 
         # Inserir áudio se existir (partes individuais ou completo)
         if audio_parts_info:
-            # Criar track de áudio
-            audio_track_idx = None
-            for idx, track in enumerate(projeto.get('tracks', [])):
-                if track.get('type') == 'audio':
-                    audio_track_idx = idx
-                    break
-
-            if audio_track_idx is None:
-                projeto['tracks'].append({
-                    "attribute": 0, "flag": 0, "id": str(uuid.uuid4()).upper(),
-                    "is_default_name": True, "name": "", "segments": [], "type": "audio"
-                })
-                audio_track_idx = len(projeto['tracks']) - 1
-                logs.append("[+] Track de áudio criada")
+            audio_track_idx = _track_creator(projeto, 'audio', logs)
 
             # Inserir cada parte de áudio
             audio_time = start_time
-            for part_path, part_duration in audio_parts_info:
-                # Criar material de áudio
-                mat_id, local_mat_id, audio_mat = criar_material_audio(part_path, part_duration)
-                projeto['materials'].setdefault('audios', []).append(audio_mat)
-
-                # Criar materiais auxiliares do áudio
-                aux = criar_materiais_auxiliares_audio()
-                projeto['materials'].setdefault('speeds', []).append(aux['speed'])
-                projeto['materials'].setdefault('placeholder_infos', []).append(aux['placeholder'])
-                projeto['materials'].setdefault('beats', []).append(aux['beat'])
-                projeto['materials'].setdefault('sound_channel_mappings', []).append(aux['channel'])
-                projeto['materials'].setdefault('vocal_separations', []).append(aux['vocal'])
-
-                # Criar segmento de áudio
-                audio_segment = criar_segmento_audio(mat_id, audio_time, part_duration, aux['refs'])
-                projeto['tracks'][audio_track_idx]['segments'].append(audio_segment)
+            for part_path, part_duration, source_start, material_duration in audio_parts_info:
+                _inserir_audio_creator(projeto, audio_track_idx, part_path, audio_time, part_duration,
+                                       source_start, material_duration)
                 audio_time += part_duration
 
             logs.append(f"[+] {len(audio_parts_info)} áudio(s) inserido(s) ({audio_duration/1000000:.2f}s total)")
@@ -1834,8 +1870,7 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
             projeto['duration'] = current_time
 
         # Salvar
-        with open(draft_path, 'w', encoding='utf-8') as f:
-            json.dump(projeto, f, indent=2, ensure_ascii=False)
+        _salvar_draft_atomico(draft_path, projeto)
 
         logs.append(f"[OK] Conteúdo inserido! Duração total: {current_time/1000000:.2f}s")
 
@@ -1853,6 +1888,660 @@ def insert_creator_content(draft_path, content_folder, add_animations=True):
         import traceback
         return {'error': str(e), 'traceback': traceback.format_exc()}
 
+# ============ INSERT CREATOR CONTENT (ACOMPANHANDO A GERAÇÃO) ============
+def _ler_eventos(events_file, offset, pendente):
+    """Lê as linhas completas novas do NDJSON a partir de offset. Retorna (eventos, offset, pendente)."""
+    with open(events_file, 'rb') as f:
+        f.seek(offset)
+        dados = f.read()
+    offset += len(dados)
+    linhas = (pendente + dados).split(b'\n')
+    pendente = linhas.pop()  # Linha ainda sendo escrita
+    eventos = []
+    for linha in linhas:
+        if linha.strip():
+            try:
+                eventos.append(json.loads(linha.decode('utf-8')))
+            except ValueError:
+                continue
+    return eventos, offset, pendente
+
+def follow_creator_content(draft_path, events_file, add_animations=True, image_duration=5000000,
+                           save_interval=3.0, idle_timeout=600):
+    """
+    Insere o conteúdo do Creator no projeto enquanto ele ainda está sendo gerado.
+    Acompanha o stream de eventos (eventsFile do content_creator) e, a cada imagem ou parte de áudio
+    pronta, anexa o segmento na ordem (esperando as anteriores). O draft é salvo de forma atômica
+    no máximo a cada `save_interval` segundos, então já pode ser aberto no CapCut durante a geração.
+    No fim, ajusta as imagens à duração total do áudio e as partes às durações do duracoes.json.
+
+    Args:
+        draft_path: Caminho do draft_content.json
+        events_file: Stream NDJSON de eventos da geração
+        image_duration: Duração provisória de cada imagem até o áudio terminar (microssegundos)
+        idle_timeout: Desiste se não chegar nenhum evento novo por esse tempo (segundos)
+    """
+    try:
+        logs = []
+        backup_path = create_backup(draft_path)
+        logs.append(f"[BACKUP] {os.path.basename(backup_path)}")
+
+        with open(draft_path, 'r', encoding='utf-8') as f:
+            projeto = json.load(f)
+
+        video_track_idx = _track_creator(projeto, 'video', logs)
+        audio_track_idx = None
+
+        start_time = 0
+        if projeto['tracks'][video_track_idx].get('segments'):
+            last_seg = projeto['tracks'][video_track_idx]['segments'][-1]
+            start_time = last_seg['target_timerange']['start'] + last_seg['target_timerange']['duration']
+
+        content_folder = None
+        imagens_prontas, proxima_imagem, imagens = {}, 1, []  # imagens: [(segmento, material)]
+        material_por_imagem = {}  # item -> material (para trocar pelo arquivo otimizado)
+        dimensoes_por_imagem = {}
+        audios_prontos, proximo_audio, audios = {}, 1, []  # audios: [(segmento, material, arquivo)]
+        image_time, audio_time = start_time, start_time
+        offset, pendente = 0, b''
+        terminou = False
+        sujo = False
+        ultimo_save = time.monotonic()
+        ultimo_evento = time.monotonic()
+        saves = 0
+
+        def anexar_disponiveis(final=False):
+            """Anexa imagens/áudios em ordem; no final, também os que ficaram depois de um buraco."""
+            nonlocal proxima_imagem, proximo_audio, image_time, audio_time, audio_track_idx, sujo
+            while proxima_imagem in imagens_prontas or (final and imagens_prontas):
+                if proxima_imagem not in imagens_prontas:
+                    proxima_imagem = min(imagens_prontas)
+                file_path = imagens_prontas.pop(proxima_imagem)
+                if file_path:
+                    anim = len(imagens) if add_animations else None
+                    imagens.append(_inserir_imagem_creator(projeto, video_track_idx, file_path, image_time,
+                                                           image_duration, anim, dimensoes_por_imagem.get(proxima_imagem)))
+                    material_por_imagem[proxima_imagem] = imagens[-1][1]
+                    image_time += image_duration
+                    sujo = True
+                proxima_imagem += 1
+            while proximo_audio in audios_prontos or (final and audios_prontos):
+                if proximo_audio not in audios_prontos:
+                    proximo_audio = min(audios_prontos)
+                parte = audios_prontos.pop(proximo_audio)
+                if parte:
+                    part_path, part_duration = parte
+                    if audio_track_idx is None:
+                        audio_track_idx = _track_creator(projeto, 'audio', logs)
+                    segment, audio_mat = _inserir_audio_creator(projeto, audio_track_idx, part_path,
+                                                                audio_time, part_duration)
+                    audios.append((segment, audio_mat, os.path.basename(part_path)))
+                    audio_time += part_duration
+                    sujo = True
+                proximo_audio += 1
+
+        while not terminou:
+            try:
+                eventos, offset, pendente = _ler_eventos(events_file, offset, pendente)
+            except FileNotFoundError:
+                # Stream removido pelo app depois do fim da geração
+                if offset:
+                    break
+                eventos = []
+
+            for evento in eventos:
+                stage = evento.get('stage')
+                if evento.get('projectPath') and not content_folder:
+                    content_folder = evento['projectPath']
+                if stage == 'imagem' and evento.get('item') is not None:
+                    imagens_prontas[evento['item']] = evento.get('path') if evento.get('ok') else None
+                elif stage == 'imagem_processada' and evento.get('ok') and evento.get('path'):
+                    item = evento.get('item')
+                    dimensoes_por_imagem[item] = (evento.get('width'), evento.get('height'))
+                    if item in material_por_imagem:
+                        # Já está na timeline: aponta o material para o arquivo otimizado
+                        video_mat = material_por_imagem[item]
+                        video_mat['path'] = evento['path'].replace('\\', '/')
+                        video_mat['material_name'] = os.path.basename(evento['path'])
+                        video_mat['width'], video_mat['height'] = dimensoes_por_imagem[item]
+                        sujo = True
+                    elif imagens_prontas.get(item):
+                        imagens_prontas[item] = evento['path']
+                elif stage == 'tts' and evento.get('item') is not None:
+                    if evento.get('ok') and evento.get('path'):
+                        audios_prontos[evento['item']] = (evento['path'], int(evento.get('duration', 0) * 1000000))
+                    else:
+                        audios_prontos[evento['item']] = None
+                elif stage == 'fim':
+                    terminou = True
+
+            if eventos:
+                ultimo_evento = time.monotonic()
+                anexar_disponiveis()
+            elif time.monotonic() - ultimo_evento > idle_timeout:
+                logs.append(f"[WARN] Nenhum evento em {idle_timeout}s, finalizando")
+                break
+
+            if sujo and time.monotonic() - ultimo_save >= save_interval:
+                projeto['duration'] = max(projeto.get('duration', 0), image_time, audio_time)
+                _salvar_draft_atomico(draft_path, projeto)
+                saves += 1
+                sujo = False
+                ultimo_save = time.monotonic()
+
+            if not eventos and not terminou:
+                time.sleep(0.25)
+
+        anexar_disponiveis(final=True)
+
+        # Áudio: usar as durações finais (com o corte de silêncio entre as partes)
+        duracoes_file = os.path.join(content_folder, 'duracoes.json') if content_folder else None
+        if audios and duracoes_file and os.path.exists(duracoes_file):
+            with open(duracoes_file, 'r', encoding='utf-8') as f:
+                por_arquivo = {p['arquivo']: p for p in json.load(f).get('partes', []) if p.get('arquivo')}
+            audio_time = start_time
+            for segment, audio_mat, arquivo in audios:
+                parte = por_arquivo.get(arquivo)
+                if parte:
+                    duracao = int(parte['duracao'] * 1000000)
+                    segment['source_timerange'] = {"duration": duracao, "start": int(parte.get('corte_inicio', 0) * 1000000)}
+                    audio_mat['duration'] = int(parte.get('duracao_original', parte['duracao']) * 1000000)
+                else:
+                    duracao = segment['target_timerange']['duration']
+                segment['target_timerange'] = {"duration": duracao, "start": audio_time}
+                audio_time += duracao
+
+        # Imagens: distribuir uniformemente pela duração do áudio (como no insert_creator_content)
+        audio_duration = audio_time - start_time
+        if imagens and audio_duration > 0:
+            duracao_imagem = audio_duration // len(imagens)
+            image_time = start_time
+            for i, (segment, video_mat) in enumerate(imagens):
+                segment['target_timerange'] = {"duration": duracao_imagem, "start": image_time}
+                segment['source_timerange'] = {"duration": duracao_imagem, "start": 0}
+                video_mat['duration'] = duracao_imagem
+                if segment.get('common_keyframes'):
+                    _animar_imagem_creator(segment, i, duracao_imagem)
+                image_time += duracao_imagem
+
+        current_time = max(image_time, audio_time)
+        if current_time > projeto.get('duration', 0):
+            projeto['duration'] = current_time
+        _salvar_draft_atomico(draft_path, projeto)
+        saves += 1
+
+        logs.append(f"[+] {len(imagens)} imagens e {len(audios)} parte(s) de áudio inseridas durante a geração")
+        logs.append(f"[OK] Conteúdo inserido! Duração total: {current_time/1000000:.2f}s ({saves} salvamentos)")
+
+        return {
+            'success': True,
+            'logs': logs,
+            'stats': {
+                'imagesInserted': len(imagens),
+                'audioInserted': len(audios) > 0,
+                'audioPartsInserted': len(audios),
+                'totalDuration': current_time,
+                'saves': saves,
+                'generationFinished': terminou
+            }
+        }
+    except Exception as e:
+        import traceback
+        return {'error': str(e), 'traceback': traceback.format_exc()}
+
+# ============ MERGE (VÁRIOS DRAFTS EM UM PROJETO) ============
+EXTENSOES_MIDIA_MERGE = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.mp4', '.mov', '.avi', '.mkv',
+                         '.mp3', '.m4a', '.wav', '.aac', '.ogg', '.flac')
+
+# Todas as listas de materials que o CapCut espera encontrar (mesmo vazias)
+TIPOS_MATERIAIS = (
+    'ai_translates', 'audio_balances', 'audio_effects', 'audio_fades', 'audio_pannings', 'audio_pitch_shifts',
+    'audio_track_indexes', 'audios', 'beats', 'canvases', 'chromas', 'color_curves', 'common_mask',
+    'digital_human_model_dressing', 'digital_humans', 'drafts', 'effects', 'filter_mask_infos', 'filters',
+    'green_screens', 'handwrites', 'hsl', 'images', 'log_color_wheels', 'loudnesses', 'manual_deformations',
+    'material_animations', 'material_colors', 'material_group_infos', 'multi_language_refs', 'placeholder_infos',
+    'plugin_contexts', 'primary_color_wheels', 'realtime_denoises', 'shape_masks', 'shapes', 'smart_crops',
+    'smart_relights', 'sound_channel_mappings', 'speeds', 'stickers', 'tail_leaders', 'text_templates', 'texts',
+    'time_marks', 'transitions', 'video_effects', 'video_trackings', 'videos', 'vocal_separations'
+)
+
+# Materiais que podem ser compartilhados entre segmentos: cópias idênticas (fora o id) viram um só.
+# Mídias (mesmo arquivo, mesmos ajustes) e auxiliares sem estado editável; speeds, canvases, cores
+# e fades ficam um por segmento, senão editar um segmento no CapCut mudaria os outros.
+MATERIAIS_DEDUPLICAVEIS = ('videos', 'audios', 'sound_channel_mappings', 'vocal_separations', 'placeholder_infos', 'beats')
+
+RE_PLACEHOLDER = re.compile(r'##_draftpath_placeholder_([A-Fa-f0-9-]+)_##')
+
+def _json_compacto(valor):
+    return json.dumps(valor, ensure_ascii=False, separators=(',', ':'))
+
+class _SpoolMerge:
+    """
+    Listas do projeto final em arquivos temporários (um item JSON por linha). Só um draft de
+    origem fica na memória por vez; o draft_content.json é montado no fim, lendo os arquivos.
+    """
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.arquivos = {}
+
+    def adicionar(self, chave, item):
+        f = self.arquivos.get(chave)
+        if f is None:
+            f = self.arquivos[chave] = open(os.path.join(self.pasta, f'{len(self.arquivos)}.ndjson'), 'w+', encoding='utf-8')
+        f.write(_json_compacto(item) + '\n')
+
+    def escrever_lista(self, saida, chave):
+        saida.write('[')
+        f = self.arquivos.get(chave)
+        if f is not None:
+            f.seek(0)
+            for i, linha in enumerate(f):
+                if i:
+                    saida.write(',')
+                saida.write(linha.rstrip('\n'))
+        saida.write(']')
+
+    def fechar(self):
+        for f in self.arquivos.values():
+            f.close()
+
+def _reordenar_conteudo_texto(material):
+    """O CapCut espera styles antes de text no content; com text primeiro ele embrulha o texto de novo."""
+    content = material.get('content')
+    if not isinstance(content, str):
+        return
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        return
+    if isinstance(parsed, dict) and parsed.get('text') and parsed.get('styles'):
+        reordenado = {'styles': parsed['styles'], 'text': parsed['text']}
+        reordenado.update((k, v) for k, v in parsed.items() if k not in reordenado)
+        material['content'] = _json_compacto(reordenado)
+
+def _ler_draft_merge(project_path, draft_id):
+    """Lê um draft de origem com o placeholder de caminho trocado pelo do projeto novo."""
+    with open(os.path.join(project_path, 'draft_content.json'), 'r', encoding='utf-8') as f:
+        texto = f.read()
+    m = RE_PLACEHOLDER.search(texto)
+    if m:
+        texto = texto.replace(m.group(0), f'##_draftpath_placeholder_{draft_id}_##')
+    projeto = json.loads(texto)
+    for txt in projeto.get('materials', {}).get('texts', []):
+        _reordenar_conteudo_texto(txt)
+    return projeto
+
+def _duracao_draft(projeto):
+    if projeto.get('duration'):
+        return projeto['duration']
+    fim = 0
+    for track in projeto.get('tracks', []):
+        for seg in track.get('segments', []):
+            tr = seg.get('target_timerange') or {}
+            fim = max(fim, tr.get('start', 0) + tr.get('duration', 0))
+    return fim
+
+def _copiar_midias_projeto(origem, destino):
+    """Copia as mídias soltas na pasta do projeto de origem (pula as que já existem com o mesmo tamanho)."""
+    copiadas = 0
+    with os.scandir(origem) as it:
+        for entry in it:
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in EXTENSOES_MIDIA_MERGE:
+                continue
+            alvo = os.path.join(destino, entry.name)
+            if os.path.exists(alvo) and os.path.getsize(alvo) == entry.stat().st_size:
+                continue
+            shutil.copyfile(entry.path, alvo)
+            copiadas += 1
+    return copiadas
+
+def _novo_id(draft_id, indice, id_antigo):
+    """Id determinístico por (projeto novo, draft de origem, id antigo): origens diferentes nunca colidem."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f'{draft_id}/{indice}/{id_antigo}')).upper()
+
+def _remapear_ids(valor, mapa):
+    if isinstance(valor, str):
+        return mapa.get(valor, valor)
+    if isinstance(valor, list):
+        return [_remapear_ids(v, mapa) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _remapear_ids(v, mapa) for k, v in valor.items()}
+    return valor
+
+def _merge_flat_origem(projeto, indice, draft_id, offset, spool, trilhas, vistos, stats):
+    """Acrescenta um draft de origem ao spool: materiais remapeados/deduplicados e segmentos deslocados."""
+    materials = projeto.get('materials') or {}
+
+    # 1) Ids novos para todos os materiais da origem (os deduplicados apontam para o já gravado)
+    mapa = {}
+    pendentes = []
+    for tipo, lista in materials.items():
+        if not isinstance(lista, list):
+            continue
+        for mat in lista:
+            if not isinstance(mat, dict) or not mat.get('id'):
+                continue
+            id_antigo = mat['id']
+            if tipo in MATERIAIS_DEDUPLICAVEIS:
+                chave = (tipo, hashlib.blake2b(json.dumps({k: v for k, v in mat.items() if k != 'id'},
+                                                         sort_keys=True).encode('utf-8'), digest_size=16).digest())
+                if chave in vistos:
+                    mapa[id_antigo] = vistos[chave]
+                    stats['deduplicated'] += 1
+                    continue
+                vistos[chave] = mapa[id_antigo] = _novo_id(draft_id, indice, id_antigo)
+            else:
+                mapa[id_antigo] = _novo_id(draft_id, indice, id_antigo)
+            pendentes.append((tipo, mat))
+
+    # 2) Materiais com as referências internas remapeadas
+    for tipo, mat in pendentes:
+        spool.adicionar(f'materials/{tipo}', _remapear_ids(mat, mapa))
+        stats['materials'] += 1
+
+    # 3) k-ésima track de cada tipo na k-ésima track desse tipo do projeto final
+    ordinais = {}
+    for track in projeto.get('tracks', []):
+        tipo = track.get('type', 'video')
+        ordinal = ordinais.get(tipo, 0)
+        ordinais[tipo] = ordinal + 1
+        chave = f'tracks/{tipo}/{ordinal}'
+        if chave not in trilhas:
+            trilhas[chave] = {'type': tipo, 'attribute': track.get('attribute', 0), 'flag': track.get('flag', 0),
+                              'id': str(uuid.uuid4()).upper()}
+        for seg in track.get('segments', []):
+            novo = _remapear_ids(seg, mapa)
+            novo['id'] = _novo_id(draft_id, indice, seg.get('id') or str(uuid.uuid4()))
+            if novo.get('target_timerange'):
+                novo['target_timerange']['start'] = novo['target_timerange'].get('start', 0) + offset
+            spool.adicionar(chave, novo)
+            stats['segments'] += 1
+
+def _merge_grupo_origem(projeto, project_path, output_path, draft_id, offset, numero, spool):
+    """Grava o draft de origem como subdraft e acrescenta o clipe composto que aponta para ele."""
+    duracao = _duracao_draft(projeto)
+    canvas = projeto.get('canvas_config') or {}
+    ids = {nome: str(uuid.uuid4()).upper() for nome in (
+        'draft', 'subdraft', 'combination', 'video', 'segment', 'canvas', 'speed', 'sound_channel',
+        'placeholder_info', 'material_color', 'vocal_separation')}
+
+    pasta_subdraft = os.path.join(output_path, 'subdraft', ids['subdraft'])
+    os.makedirs(pasta_subdraft, exist_ok=True)
+    with open(os.path.join(pasta_subdraft, 'draft_content.json'), 'w', encoding='utf-8') as f:
+        f.write(_json_compacto(projeto))
+    with open(os.path.join(pasta_subdraft, 'sub_draft_config.json'), 'w', encoding='utf-8') as f:
+        f.write(_json_compacto({'draft_id': ids['subdraft'], 'name': '', 'type': 'combination'}))
+
+    spool.adicionar('materials/drafts', {
+        'aimusic_mv_template_info': None, 'category_id': '', 'category_name': '',
+        'combination_id': ids['combination'], 'combination_type': 'none', 'draft': projeto,
+        'draft_config_path': '', 'draft_cover_path': '',
+        'draft_file_path': f"##_draftpath_placeholder_{draft_id}_##\\subdraft\\{ids['subdraft']}\\draft_content.json",
+        'formula_id': '', 'id': ids['draft'], 'name': '', 'precompile_combination': False, 'type': 'combination'
+    })
+    spool.adicionar('materials/canvases', {'album_image': '', 'blur': 0.0, 'color': '', 'id': ids['canvas'], 'image': '',
+                                           'image_id': '', 'image_name': '', 'source_platform': 0, 'team_id': '',
+                                           'type': 'canvas_color'})
+    spool.adicionar('materials/speeds', {'curve_speed': None, 'id': ids['speed'], 'mode': 0, 'speed': 1.0, 'type': 'speed'})
+    spool.adicionar('materials/sound_channel_mappings', {'audio_channel_mapping': 0, 'id': ids['sound_channel'],
+                                                         'is_config_open': False, 'type': ''})
+    spool.adicionar('materials/placeholder_infos', {'error_path': '', 'id': ids['placeholder_info'], 'meta_type': '',
+                                                    'res_path': '', 'res_request_id': '', 'resource_id': '',
+                                                    'source_from': '', 'source_platform': 0, 'team_id': '',
+                                                    'type': 'placeholder_info'})
+    spool.adicionar('materials/material_colors', {'color_lut_path_list': [], 'color_model_lut_path_list': [],
+                                                  'color_model_path': '', 'enable_skin_tone_restore': False,
+                                                  'enable_smart': 0, 'formula_id': '', 'id': ids['material_color'],
+                                                  'intensity': 1.0, 'path': '', 'skin_tone_restore_path': '',
+                                                  'type': 'material_color'})
+    spool.adicionar('materials/vocal_separations', {'choice': 0, 'enter_from': '', 'final_algorithm': '',
+                                                    'id': ids['vocal_separation'], 'production_path': '',
+                                                    'removed_sounds': [], 'time_range': None, 'type': 'vocal_separation'})
+    spool.adicionar('materials/videos', {
+        'aigc_history_id': '', 'aigc_item_id': '', 'aigc_type': 'none', 'audio_fade': None,
+        'beauty_body_auto_preset': None, 'beauty_body_preset_id': '',
+        'beauty_face_auto_preset': {'name': '', 'preset_id': '', 'rate_map': '', 'scene': ''},
+        'beauty_face_auto_preset_infos': [], 'beauty_face_preset_infos': [], 'cartoon_path': '',
+        'category_id': '', 'category_name': '', 'check_flag': 62978047, 'content_feature_info': None, 'corner_pin': None,
+        'crop': {'lower_left_x': 0, 'lower_left_y': 1, 'lower_right_x': 1, 'lower_right_y': 1,
+                 'upper_left_x': 0, 'upper_left_y': 0, 'upper_right_x': 1, 'upper_right_y': 0},
+        'crop_ratio': 'free', 'crop_scale': 1, 'duration': duracao,
+        'extra_type_option': 2,  # Marca o material como clipe composto
+        'formula_id': '', 'freeze': None, 'has_audio': True, 'has_sound_separated': False,
+        'height': canvas.get('height', 1080), 'id': ids['video'], 'intensifies_audio_path': '', 'intensifies_path': '',
+        'is_ai_generate_content': False, 'is_copyright': False, 'is_text_edit_overdub': False,
+        'is_unified_beauty_mode': False, 'live_photo_cover_path': '', 'live_photo_timestamp': -1,
+        'local_id': '', 'local_material_from': '', 'local_material_id': '', 'material_id': '',
+        'material_name': f'Clipe composto{numero}', 'material_url': '',
+        'matting': {'custom_matting_id': '', 'enable_matting_stroke': False, 'expansion': 0, 'feather': 0, 'flag': 0,
+                    'has_use_quick_brush': False, 'has_use_quick_eraser': False, 'interactiveTime': [], 'path': '',
+                    'reverse': False, 'strokes': []},
+        'media_path': '', 'multi_camera_info': None, 'object_locked': None, 'origin_material_id': '',
+        'path': '',  # Path vazio: é um grupo
+        'picture_from': 'none', 'picture_set_category_id': '', 'picture_set_category_name': '',
+        'request_id': '', 'reverse_intensifies_path': '', 'reverse_path': '', 'smart_match_info': None,
+        'smart_motion': None, 'source': 0, 'source_platform': 0,
+        'stable': {'matrix_path': '', 'stable_level': 0, 'time_range': {'duration': 0, 'start': 0}},
+        'team_id': '', 'type': 'video',
+        'video_algorithm': {'ai_background_configs': [], 'algorithms': [], 'path': '', 'time_range': None},
+        'width': canvas.get('width', 1920)
+    })
+    spool.adicionar('tracks/video/0', {
+        'caption_info': None, 'cartoon': False,
+        'clip': {'alpha': 1, 'flip': {'horizontal': False, 'vertical': False}, 'rotation': 0,
+                 'scale': {'x': 1, 'y': 1}, 'transform': {'x': 0, 'y': 0}},
+        'common_keyframes': [], 'enable_adjust': True, 'enable_color_correct_adjust': False,
+        'enable_color_curves': True, 'enable_color_match_adjust': False, 'enable_color_wheels': True,
+        'enable_lut': True, 'enable_smart_color_adjust': False,
+        'extra_material_refs': [ids['draft'], ids['speed'], ids['placeholder_info'], ids['canvas'],
+                                ids['sound_channel'], ids['material_color'], ids['vocal_separation']],
+        'group_id': '', 'hdr_settings': {'intensity': 1, 'mode': 1, 'nits': 1000}, 'id': ids['segment'],
+        'intensifies_audio': False, 'is_placeholder': False, 'is_tone_modify': False, 'keyframe_refs': [],
+        'last_nonzero_volume': 1, 'material_id': ids['video'], 'render_index': 0,
+        'responsive_layout': {'enable': False, 'horizontal_pos_layout': 0, 'size_layout': 0, 'target_follow': '',
+                              'vertical_pos_layout': 0},
+        'reverse': False, 'source_timerange': {'duration': duracao, 'start': 0}, 'speed': 1, 'state': 0,
+        'target_timerange': {'duration': duracao, 'start': offset}, 'template_id': '', 'template_scene': 'default',
+        'track_attribute': 0, 'track_render_index': 0, 'uniform_scale': {'on': True, 'value': 1},
+        'visible': True, 'volume': 1
+    })
+    return duracao
+
+def _gravar_merge(output_path, cabecalho, spool, trilhas):
+    """Monta o draft_content.json final em streaming a partir do spool (gravação atômica)."""
+    draft_path = os.path.join(output_path, 'draft_content.json')
+    temp_path = draft_path + '.tmp'
+    tipos = list(TIPOS_MATERIAIS) + sorted(
+        chave.split('/', 1)[1] for chave in spool.arquivos
+        if chave.startswith('materials/') and chave.split('/', 1)[1] not in TIPOS_MATERIAIS)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(_json_compacto(cabecalho)[:-1] + ',"materials":{')
+        for i, tipo in enumerate(tipos):
+            f.write((',' if i else '') + json.dumps(tipo) + ':')
+            spool.escrever_lista(f, f'materials/{tipo}')
+        f.write('},"tracks":[')
+        for i, (chave, trilha) in enumerate(trilhas.items()):
+            f.write((',' if i else '') + _json_compacto(trilha)[:-1] + ',"segments":')
+            spool.escrever_lista(f, chave)
+            f.write('}')
+        f.write(']}')
+    os.replace(temp_path, draft_path)
+    return draft_path
+
+def merge_projects(project_paths, output_path, mode='flat', draft_id=None, project_name=None):
+    """
+    Junta vários drafts num projeto novo em output_path, lendo um draft de origem por vez.
+    - flat: tracks concatenadas (a k-ésima track de cada tipo vai para a k-ésima do projeto), ids
+      remapeados sem colisão, tempos deslocados e materiais idênticos (mídias e auxiliares) deduplicados
+    - groups: cada draft vira um clipe composto (subdraft), um depois do outro
+    draft_info/draft_meta_info/root_meta_info ficam com quem chamou.
+    """
+    logs = []
+    try:
+        if not project_paths or len(project_paths) < 2:
+            return {'error': 'Selecione pelo menos 2 projetos para mesclar.'}
+        if os.path.exists(output_path):
+            return {'error': 'Já existe um projeto com esse nome'}
+        for project_path in project_paths:
+            if not os.path.exists(os.path.join(project_path, 'draft_content.json')):
+                return {'error': f'Projeto não encontrado: {os.path.basename(project_path)}'}
+
+        draft_id = draft_id or str(uuid.uuid4()).upper()
+        project_name = project_name or os.path.basename(output_path)
+        os.makedirs(output_path)
+    except Exception as e:
+        return {'error': str(e)}
+
+    try:
+        stats = {'materials': 0, 'segments': 0, 'deduplicated': 0, 'mediaCopied': 0}
+        with tempfile.TemporaryDirectory() as pasta_spool:
+            spool = _SpoolMerge(pasta_spool)
+            try:
+                trilhas = {'tracks/video/0': {'type': 'video', 'attribute': 0, 'flag': 0,
+                                              'id': str(uuid.uuid4()).upper()}} if mode == 'groups' else {}
+                vistos = {}
+                base = None
+                offset = 0
+                for indice, project_path in enumerate(project_paths):
+                    projeto = _ler_draft_merge(project_path, draft_id)
+                    if base is None:
+                        base = {k: projeto.get(k) for k in ('canvas_config', 'color_space', 'config', 'fps',
+                                                            'function_assistant_info', 'last_modified_platform', 'platform')}
+                    stats['mediaCopied'] += _copiar_midias_projeto(project_path, output_path)
+                    if mode == 'groups':
+                        duracao = _merge_grupo_origem(projeto, project_path, output_path, draft_id, offset, indice + 1, spool)
+                    else:
+                        duracao = _duracao_draft(projeto)
+                        _merge_flat_origem(projeto, indice, draft_id, offset, spool, trilhas, vistos, stats)
+                    logs.append(f"[+] {os.path.basename(project_path)}: {duracao/1000000:.2f}s a partir de {offset/1000000:.2f}s")
+                    offset += duracao
+                    del projeto
+
+                agora = int(time.time())
+                cabecalho = {
+                    'canvas_config': base['canvas_config'] or {'height': 1080, 'width': 1920, 'ratio': 'original'},
+                    'color_space': base['color_space'] or 0, 'config': base['config'] or {}, 'cover': None,
+                    'create_time': agora, 'draft_type': 'video', 'duration': offset, 'extra_info': None,
+                    'fps': base['fps'] or 30.0, 'free_render_index_mode_on': False,
+                    'function_assistant_info': base['function_assistant_info'] or {}, 'group_container': None,
+                    'id': draft_id, 'is_drop_frame_timecode': False, 'keyframe_graph_list': [],
+                    'keyframes': {'adjusts': [], 'audios': [], 'effects': [], 'filters': [], 'handwrites': [],
+                                  'stickers': [], 'texts': [], 'videos': []},
+                    'last_modified_platform': base['last_modified_platform'] or {}, 'lyrics_effects': [],
+                    'mutable_config': None, 'name': project_name, 'new_version': '',
+                    'platform': base['platform'] or {}, 'relationships': [], 'render_index_track_mode_on': False,
+                    'retouch_cover': None, 'source': 'default', 'static_cover_image_path': '',
+                    'update_time': agora, 'version': 360000
+                }
+                draft_path = _gravar_merge(output_path, cabecalho, spool, trilhas)
+            finally:
+                spool.fechar()
+
+        if mode != 'groups':
+            logs.append(f"[OK] {stats['materials']} materiais ({stats['deduplicated']} duplicados reaproveitados), "
+                        f"{stats['segments']} segmentos")
+        logs.append(f"[OK] {len(project_paths)} projetos mesclados! Duração total: {offset/1000000:.2f}s")
+        return {
+            'success': True,
+            'logs': logs,
+            'path': output_path,
+            'name': project_name,
+            'draftPath': draft_path,
+            'draftId': draft_id,
+            'projectCount': len(project_paths),
+            'totalDuration': offset,
+            'stats': stats
+        }
+    except Exception as e:
+        shutil.rmtree(output_path, ignore_errors=True)
+        import traceback
+        return {'error': str(e), 'traceback': traceback.format_exc()}
+
+# ============ BATCH (UMA AÇÃO EM VÁRIOS DRAFTS) ============
+# Ações que mexem num único draft (follow_creator fica de fora: acompanha uma geração)
+ACOES_BATCH = ('analyze', 'sync', 'loop_video', 'loop_audio', 'insert_srt', 'insert_srt_batch',
+               'insert_media', 'insert_audio', 'randomize_media', 'insert_creator', 'import_folder')
+
+def _executar_item_batch(draft_path, spec):
+    """Roda num processo do pool: aplica a ação a um draft (backup e gravação atômica ficam com a ação)."""
+    inicio = time.perf_counter()
+    try:
+        r = executar_comando(dict(spec, draftPath=draft_path))
+    except Exception as e:
+        r = {'error': str(e)}
+    return {
+        'draftPath': draft_path,
+        'success': not r.get('error'),
+        'error': r.get('error'),
+        'result': r,
+        'ms': round((time.perf_counter() - inicio) * 1000, 1)
+    }
+
+def batch_drafts(draft_paths, spec, events_file=None, workers=None, ao_concluir=None):
+    """
+    Aplica a mesma ação (spec: comando sem draftPath) a vários drafts num pool de processos.
+    Cada resultado é anexado ao events_file (NDJSON) e passado para ao_concluir assim que
+    termina; a falha de um draft não interrompe os outros.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if not isinstance(spec, dict) or spec.get('action') not in ACOES_BATCH:
+        return {'error': f"Ação não suportada em lote: {(spec or {}).get('action')}"}
+    draft_paths = list(dict.fromkeys(draft_paths or []))  # Sem repetidos: dois processos no mesmo draft
+    if not draft_paths:
+        return {'error': 'Nenhum draft informado'}
+
+    inicio = time.perf_counter()
+    resultados = {}
+    eventos = open(events_file, 'a', encoding='utf-8') if events_file else None
+    try:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(draft_paths)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_executar_item_batch, path, spec): path for path in draft_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    item = future.result()
+                except Exception as e:  # Processo do pool morreu (ex: falta de memória)
+                    item = {'draftPath': path, 'success': False, 'error': str(e), 'result': None, 'ms': None}
+                resultados[path] = item
+                if eventos:
+                    eventos.write(json.dumps(item, ensure_ascii=False) + '\n')
+                    eventos.flush()
+                if ao_concluir:
+                    ao_concluir(item)
+    finally:
+        if eventos:
+            eventos.close()
+
+    ok = sum(1 for item in resultados.values() if item['success'])
+    return {
+        'success': ok == len(draft_paths),
+        'total': len(draft_paths),
+        'ok': ok,
+        'failed': len(draft_paths) - ok,
+        'workers': workers,
+        'ms': round((time.perf_counter() - inicio) * 1000, 1),
+        'results': [resultados[path] for path in draft_paths]
+    }
+
+def executar_comando(cmd):
+    action = cmd.get('action')
+    if action == 'analyze': return analyze_project(cmd['draftPath'])
+    elif action == 'sync': return sync_project(cmd['draftPath'], cmd.get('audioTrackIndex', 0), cmd.get('mode', 'audio'), cmd.get('syncSubtitles', True), cmd.get('applyAnimations', False))
+    elif action == 'loop_video': return loop_video(cmd['draftPath'], cmd.get('audioTrackIndex', 0), cmd.get('order', 'random'))
+    elif action == 'loop_audio': return loop_audio(cmd['draftPath'], cmd['trackIndex'], cmd['targetDuration'])
+    elif action == 'insert_srt': return insert_srt(cmd['draftPath'], cmd.get('srtFolders'), cmd.get('createTitle', True), cmd.get('selectedFilePaths'), cmd.get('srtFolder'), cmd.get('selectedFiles'), cmd.get('separateTracks', False))
+    elif action == 'insert_srt_batch': return insert_srt_batch(cmd['draftPath'], cmd.get('srtFiles', []), cmd.get('createTitle', True), cmd.get('gapMs', 2000000))
+    elif action == 'insert_media': return insert_media_batch(cmd['draftPath'], cmd.get('mediaFiles', []), cmd.get('imageDuration', 5000000))
+    elif action == 'insert_audio': return insert_audio_batch(cmd['draftPath'], cmd.get('audioFiles', []), cmd.get('useExistingTrack', False), cmd.get('trackIndex'))
+    elif action == 'randomize_media': return randomize_existing_media(cmd['draftPath'])
+    elif action == 'insert_creator': return insert_creator_content(cmd['draftPath'], cmd['contentFolder'], cmd.get('addAnimations', True))
+    elif action == 'follow_creator': return follow_creator_content(cmd['draftPath'], cmd['eventsFile'], cmd.get('addAnimations', True), cmd.get('imageDuration', 5000000), cmd.get('saveInterval', 3.0), cmd.get('idleTimeout', 600))
+    elif action == 'import_folder': return import_media_folder(cmd['draftPath'], cmd['folderPath'], cmd.get('addAnimations', True), cmd.get('syncToAudio', True), cmd.get('separateAudioTracks', False))
+    elif action == 'merge': return merge_projects(cmd.get('projectPaths', []), cmd['outputPath'], cmd.get('mode', 'flat'), cmd.get('draftId'), cmd.get('projectName'))
+    else: return {'error': f'Ação: {action}?'}
+
 # ============ MAIN ============
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -1865,19 +2554,12 @@ if __name__ == '__main__':
                 cmd = json.load(f)
         else:
             cmd = json.loads(sys.argv[1])
-        action = cmd.get('action')
-        if action == 'analyze': r = analyze_project(cmd['draftPath'])
-        elif action == 'sync': r = sync_project(cmd['draftPath'], cmd.get('audioTrackIndex', 0), cmd.get('mode', 'audio'), cmd.get('syncSubtitles', True), cmd.get('applyAnimations', False))
-        elif action == 'loop_video': r = loop_video(cmd['draftPath'], cmd.get('audioTrackIndex', 0), cmd.get('order', 'random'))
-        elif action == 'loop_audio': r = loop_audio(cmd['draftPath'], cmd['trackIndex'], cmd['targetDuration'])
-        elif action == 'insert_srt': r = insert_srt(cmd['draftPath'], cmd.get('srtFolders'), cmd.get('createTitle', True), cmd.get('selectedFilePaths'), cmd.get('srtFolder'), cmd.get('selectedFiles'), cmd.get('separateTracks', False))
-        elif action == 'insert_srt_batch': r = insert_srt_batch(cmd['draftPath'], cmd.get('srtFiles', []), cmd.get('createTitle', True), cmd.get('gapMs', 2000000))
-        elif action == 'insert_media': r = insert_media_batch(cmd['draftPath'], cmd.get('mediaFiles', []), cmd.get('imageDuration', 5000000))
-        elif action == 'insert_audio': r = insert_audio_batch(cmd['draftPath'], cmd.get('audioFiles', []), cmd.get('useExistingTrack', False), cmd.get('trackIndex'))
-        elif action == 'randomize_media': r = randomize_existing_media(cmd['draftPath'])
-        elif action == 'insert_creator': r = insert_creator_content(cmd['draftPath'], cmd['contentFolder'], cmd.get('addAnimations', True))
-        elif action == 'import_folder': r = import_media_folder(cmd['draftPath'], cmd['folderPath'], cmd.get('addAnimations', True), cmd.get('syncToAudio', True), cmd.get('separateAudioTracks', False))
-        else: r = {'error': f'Ação: {action}?'}
+        if cmd.get('action') == 'batch':
+            # Cada draft concluído sai numa linha do stdout; o resumo é a última linha
+            r = batch_drafts(cmd.get('draftPaths', []), cmd.get('spec'), cmd.get('eventsFile'), cmd.get('workers'),
+                             lambda item: print(json.dumps(item, ensure_ascii=False), flush=True))
+        else:
+            r = executar_comando(cmd)
         print(json.dumps(r, ensure_ascii=False))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
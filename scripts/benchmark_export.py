@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark da exportacao de projetos (project_manager.export_project)
+Gera um projeto sintetico (por padrao ~5 GB: videos, imagens, audios e JSON do CapCut)
+e compara a politica antiga (tudo em deflate) com a nova (midias sem compressao,
+texto comprimido em paralelo), mostrando tempo, tamanho do ZIP e taxa por tipo.
+Depois edita uma linha do draft_content.json e mede a reexportacao incremental
+
+Uso: python benchmark_export.py [--tamanho-gb 5] [--pasta /tmp/bench_export] [--manter]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python"))
+
+from project_manager import export_project
+
+# Fracao do tamanho total por tipo de midia (parecido com um projeto real)
+DISTRIBUICAO = [(".mp4", 0.80, 200), (".jpg", 0.12, 3), (".mp3", 0.08, 8)]  # ext, fracao, MB por arquivo
+BLOCO = 4 * 1024 * 1024
+
+
+def gravar_midia(path, tamanho, rng):
+    """Bytes pseudo-aleatorios (incompressiveis, como midia de verdade), gerados em blocos"""
+    with open(path, 'wb') as f:
+        restante = tamanho
+        while restante > 0:
+            n = min(BLOCO, restante)
+            f.write(rng.randbytes(n))
+            restante -= n
+
+
+def gerar_projeto(pasta, tamanho_total):
+    rng = random.Random(42)
+    pasta_midias = os.path.join(pasta, "midias")
+    pasta_projeto = os.path.join(pasta, "projeto")
+    os.makedirs(pasta_midias, exist_ok=True)
+    os.makedirs(os.path.join(pasta_projeto, "Resources"), exist_ok=True)
+
+    materiais = {"videos": [], "audios": [], "images": [], "texts": []}
+    chave = {".mp4": "videos", ".jpg": "images", ".mp3": "audios"}
+    for ext, fracao, mb in DISTRIBUICAO:
+        tamanho_tipo = int(tamanho_total * fracao)
+        por_arquivo = mb * 1024 * 1024
+        for i in range(max(1, tamanho_tipo // por_arquivo)):
+            path = os.path.join(pasta_midias, f"midia_{i:04d}{ext}")
+            gravar_midia(path, min(por_arquivo, tamanho_tipo), rng)
+            materiais[chave[ext]].append({"id": f"{ext[1:]}_{i}", "path": path})
+
+    # JSON grande e repetitivo, como o draft_content de um projeto longo
+    for i in range(20000):
+        materiais["texts"].append({"id": f"texto_{i}", "content": f"Legenda numero {i} " * 4,
+                                   "font_size": 8.0, "alignment": 1})
+    with open(os.path.join(pasta_projeto, "draft_content.json"), 'w', encoding='utf-8') as f:
+        json.dump({"materials": materiais, "tracks": []}, f, indent=2)
+    for nome in ("draft_meta_info.json", "draft_settings", "Resources/cache.json"):
+        with open(os.path.join(pasta_projeto, nome), 'w', encoding='utf-8') as f:
+            json.dump({"chave": "valor " * 500}, f)
+    return pasta_projeto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da exportacao de projetos")
+    parser.add_argument("--tamanho-gb", type=float, default=5.0)
+    parser.add_argument("--pasta", default=os.path.join(tempfile.gettempdir(), "bench_export"))
+    parser.add_argument("--manter", action="store_true", help="Nao apaga o projeto sintetico no fim")
+    args = parser.parse_args()
+
+    print(f"Gerando projeto sintetico de {args.tamanho_gb:g} GB em {args.pasta}")
+    inicio = time.perf_counter()
+    pasta_projeto = gerar_projeto(args.pasta, int(args.tamanho_gb * 1024 ** 3))
+    print(f"Projeto gerado em {time.perf_counter() - inicio:.1f} s")
+    print("-" * 50)
+
+    try:
+        saida = os.path.join(args.pasta, "export.zip")
+        for rotulo, politica, incremental in (("deflate", "deflate", False), ("auto", "auto", False),
+                                              ("incremental", "auto", True)):
+            if incremental:
+                # Edicao de uma linha no projeto
+                draft = os.path.join(pasta_projeto, "draft_content.json")
+                with open(draft, 'r+', encoding='utf-8') as f:
+                    dados = json.load(f)
+                    dados["materials"]["texts"][0]["content"] = "Legenda editada"
+                    f.seek(0)
+                    json.dump(dados, f, indent=2)
+                    f.truncate()
+            inicio = time.perf_counter()
+            resultado = export_project({"draftPath": pasta_projeto, "outputPath": saida,
+                                        "compressionPolicy": politica, "incremental": incremental})
+            tempo = time.perf_counter() - inicio
+            if not resultado.get("success"):
+                print(f"{rotulo}: ERRO {resultado.get('error')}")
+                continue
+            print(f"{rotulo}: {tempo:.1f} s, ZIP de {resultado['fileSizeMB']:.0f} MB, "
+                  f"{resultado['reusedMembers']} membros reaproveitados")
+            for ext, item in sorted(resultado["compression"].items()):
+                print(f"  {ext}: {item['files']} arquivos, {item['bytes'] / 1024 ** 2:.1f} MB, taxa {item['ratio']}")
+    finally:
+        if not args.manter:
+            shutil.rmtree(args.pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
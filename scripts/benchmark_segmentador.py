@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark do segmentador de roteiro (content_creator.segmentar_texto)
+Gera um roteiro sintetico de ~1 MB por idioma e mede o tempo de segmentacao
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python"))
+
+from content_creator import segmentar_texto, TTS_CHUNK_ALVO, TTS_CHUNK_MAX
+
+FRASES = {
+    "pt-BR": ["O Dr. Silva chegou cedo, como sempre.", "Voce sabia disso?", "Incrivel!",
+              "A historia, porem, nao termina aqui; ainda ha muito a contar."],
+    "en-US": ["Mr. Smith arrived early, as usual.", "Did you know that?", "Amazing!",
+              "The story, however, does not end here; there is much more to tell."],
+    "es-ES": ["El Sr. Garcia llego temprano, como siempre.", "¿Sabias eso?", "¡Increible!",
+              "La historia, sin embargo, no termina aqui; queda mucho por contar."],
+}
+
+TAMANHO = 1024 * 1024
+
+
+def gerar_roteiro(frases, tamanho):
+    rng = random.Random(42)
+    partes, total = [], 0
+    while total < tamanho:
+        paragrafo = " ".join(rng.choice(frases) for _ in range(rng.randint(3, 40)))
+        partes.append(paragrafo)
+        total += len(paragrafo) + 2
+    return "\n\n".join(partes)[:tamanho]
+
+
+def main():
+    print(f"Segmentando roteiros de {TAMANHO // 1024} KB (alvo={TTS_CHUNK_ALVO}, max={TTS_CHUNK_MAX})")
+    print("-" * 50)
+    for idioma, frases in FRASES.items():
+        texto = gerar_roteiro(frases, TAMANHO)
+        inicio = time.perf_counter()
+        trechos = segmentar_texto(texto, TTS_CHUNK_ALVO, TTS_CHUNK_MAX, idioma)
+        tempo = time.perf_counter() - inicio
+        maior = max(fim - ini for ini, fim in trechos)
+        print(f"{idioma}: {len(trechos)} trechos, maior={maior} chars, {tempo * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
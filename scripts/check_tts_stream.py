@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Verificacao do TTS em streaming (content_creator.gravar_tts_stream) sem a API do Gemini
+Usa um cliente falso cujo generate_content_stream devolve o PCM em base64 cortado
+em pontos arbitrarios (no meio de um grupo de 4 caracteres, de uma amostra, pedacos
+de 1 caractere, respostas sem audio no meio) e confere, byte a byte, o WAV gravado.
+Tambem cobre os retries: erro transitorio antes do primeiro audio e repetido,
+erro depois de audio gravado ou erro permanente sobe direto.
+
+Uso: python check_tts_stream.py [--rodadas 200] [--seed 1]
+"""
+
+import os
+import sys
+import time
+import wave
+import random
+import base64
+import shutil
+import tempfile
+import argparse
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python"))
+
+import content_creator as cc
+from content_creator import gravar_tts_stream, MetricasGeracao, MODELO_TTS
+
+
+class _Obj:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ErroApiFalso(Exception):
+    """Mesmos atributos do google.genai.errors.APIError (code HTTP e status)"""
+
+    def __init__(self, code, status, mensagem=""):
+        super().__init__(f"{code} {status}. {mensagem}")
+        self.code = code
+        self.status = status
+
+
+def _resposta_audio(dados):
+    part = _Obj(inline_data=_Obj(data=dados), text=None)
+    return _Obj(candidates=[_Obj(content=_Obj(parts=[part]))], text=None)
+
+
+def _resposta_vazia(rng):
+    """Respostas sem audio que a API tambem manda (sem candidatos, so texto, sem parts)"""
+    return rng.choice([
+        _Obj(candidates=None, text=None),
+        _Obj(candidates=[_Obj(content=None)], text=None),
+        _Obj(candidates=[_Obj(content=_Obj(parts=None))], text=None),
+        _Obj(candidates=[_Obj(content=_Obj(parts=[_Obj(inline_data=None, text="...")]))], text=None),
+    ])
+
+
+def cortar(dados, rng, max_pedaco):
+    """Corta em pedacos de tamanho aleatorio (1..max_pedaco), sem respeitar alinhamento nenhum"""
+    i = 0
+    while i < len(dados):
+        n = rng.randint(1, max_pedaco)
+        yield dados[i:i + n]
+        i += n
+
+
+class ClienteStreamFalso:
+    """
+    Substitui genai.Client: so client.models.generate_content_stream e usado pelo streaming.
+    - formato: 'base64' (str, como a API devolve) ou 'bytes' (inline_data ja decodificado)
+    - falhas: erros levantados nas primeiras chamadas, antes de qualquer audio
+    - falhar_apos: levanta este erro depois de entregar alguns pedacos de audio
+    """
+
+    def __init__(self, pcm, rng, formato='base64', max_pedaco=37, falhas=(), falhar_apos=None, padding=True):
+        self.pcm = pcm
+        self.rng = rng
+        self.formato = formato
+        self.max_pedaco = max_pedaco
+        self.falhas = list(falhas)
+        self.falhar_apos = falhar_apos
+        self.padding = padding
+        self.chamadas = 0
+        self.models = self
+
+    def generate_content_stream(self, model, contents, config=None):
+        assert model == MODELO_TTS, model
+        self.chamadas += 1
+        if self.falhas:
+            raise self.falhas.pop(0)
+        return self._stream()
+
+    def _stream(self):
+        if self.formato == 'base64':
+            dados = base64.b64encode(self.pcm).decode('ascii')
+            if not self.padding:
+                dados = dados.rstrip('=')
+        else:
+            dados = self.pcm
+        for n, pedaco in enumerate(cortar(dados, self.rng, self.max_pedaco)):
+            if self.rng.random() < 0.1:
+                yield _resposta_vazia(self.rng)
+            if self.falhar_apos is not None and n == 3:
+                raise self.falhar_apos
+            yield _resposta_audio(pedaco)
+
+
+@contextmanager
+def sem_espera():
+    """O backoff do retry dorme 2^n segundos; aqui nao precisa esperar"""
+    original = time.sleep
+    time.sleep = lambda segundos: None
+    try:
+        yield
+    finally:
+        time.sleep = original
+
+
+def ler_pcm(path):
+    with wave.open(path, 'rb') as wav:
+        assert wav.getnchannels() == cc.TTS_CHANNELS
+        assert wav.getsampwidth() == cc.TTS_SAMPLE_WIDTH
+        assert wav.getframerate() == cc.TTS_SAMPLE_RATE
+        return wav.readframes(wav.getnframes())
+
+
+def conferir(pasta, pcm, cliente, nome, **kw):
+    parte_path = os.path.join(pasta, f"{nome}.wav")
+    metricas = MetricasGeracao()
+    primeiros = []
+    frames, nbytes, ttfa = gravar_tts_stream(cliente, metricas, "texto", None, parte_path,
+                                             ao_primeiro_audio=primeiros.append, **kw)
+    gravado = ler_pcm(parte_path)
+    assert gravado == pcm, f"{nome}: PCM diferente ({len(gravado)} de {len(pcm)} bytes)"
+    assert frames == len(pcm) // (cc.TTS_SAMPLE_WIDTH * cc.TTS_CHANNELS), f"{nome}: frames {frames}"
+    assert nbytes == len(pcm), f"{nome}: bytes {nbytes}"
+    assert ttfa is not None and primeiros == [ttfa], f"{nome}: ttfa {ttfa} {primeiros}"
+    return metricas.resumo()[MODELO_TTS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rodadas", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pasta = tempfile.mkdtemp(prefix="check_tts_stream_")
+    verificacoes = 0
+    try:
+        # Cortes arbitrarios do base64 e dos bytes crus (amostras divididas entre pedacos)
+        for rodada in range(args.rodadas):
+            pcm = rng.randbytes(2 * rng.randint(1, 4000))
+            formato = rng.choice(['base64', 'bytes'])
+            cliente = ClienteStreamFalso(pcm, rng, formato, max_pedaco=rng.choice([1, 3, 5, 37, 4096]),
+                                         padding=rng.random() < 0.7)
+            conferir(pasta, pcm, cliente, f"corte_{rodada}")
+            verificacoes += 1
+
+        pcm = rng.randbytes(48000)
+
+        # Erro transitorio antes do primeiro audio: repetido, e o arquivo final fica inteiro
+        with sem_espera():
+            cliente = ClienteStreamFalso(pcm, rng, falhas=[ErroApiFalso(503, "UNAVAILABLE"), ErroApiFalso(429, "RESOURCE_EXHAUSTED")])
+            m = conferir(pasta, pcm, cliente, "retry", max_retries=2)
+        assert cliente.chamadas == 3 and m["retries"] == 2 and m["erros"] == 2, m
+        verificacoes += 1
+
+        # Mais falhas que max_retries: o erro sobe
+        with sem_espera():
+            cliente = ClienteStreamFalso(pcm, rng, falhas=[ErroApiFalso(503, "UNAVAILABLE")] * 3)
+            try:
+                conferir(pasta, pcm, cliente, "retry_esgotado", max_retries=2)
+                raise AssertionError("retry_esgotado: deveria ter falhado")
+            except ErroApiFalso:
+                pass
+        assert cliente.chamadas == 3, cliente.chamadas
+        verificacoes += 1
+
+        # Erro permanente (400): nao repete
+        with sem_espera():
+            cliente = ClienteStreamFalso(pcm, rng, falhas=[ErroApiFalso(400, "INVALID_ARGUMENT", "voz invalida")])
+            try:
+                conferir(pasta, pcm, cliente, "permanente")
+                raise AssertionError("permanente: deveria ter falhado")
+            except ErroApiFalso:
+                pass
+        assert cliente.chamadas == 1, cliente.chamadas
+        verificacoes += 1
+
+        # Erro permanente com "500" / "INTERNAL" no texto da mensagem: o que vale e o codigo
+        with sem_espera():
+            cliente = ClienteStreamFalso(pcm, rng, falhas=[ErroApiFalso(400, "INVALID_ARGUMENT",
+                                                                       "texto com 500 caracteres, INTERNAL")])
+            try:
+                conferir(pasta, pcm, cliente, "permanente_texto")
+                raise AssertionError("permanente_texto: deveria ter falhado")
+            except ErroApiFalso:
+                pass
+        assert cliente.chamadas == 1, cliente.chamadas
+        verificacoes += 1
+
+        # Erro transitorio depois de audio gravado: nao repete (o audio ja saiu pela metade)
+        cliente = ClienteStreamFalso(pcm, rng, max_pedaco=4096, falhar_apos=ErroApiFalso(503, "UNAVAILABLE"))
+        try:
+            conferir(pasta, pcm, cliente, "meio_do_stream")
+            raise AssertionError("meio_do_stream: deveria ter falhado")
+        except ErroApiFalso:
+            pass
+        assert cliente.chamadas == 1, cliente.chamadas
+        verificacoes += 1
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    print(f"OK: {verificacoes} verificacoes ({args.rodadas} streams com cortes aleatorios)")
+
+
+if __name__ == "__main__":
+    main()
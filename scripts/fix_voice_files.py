@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 """
-Script para converter os arquivos de audio do Gemini TTS para formato WAV valido
-O Gemini retorna audio em formato PCM linear 24kHz 16-bit mono
+Normalizador dos arquivos de audio dos assets (por padrao assets/voices)
+
+- PCM cru (sem header, como o Gemini TTS devolve: 24kHz 16-bit mono) vira WAV valido,
+  convertido em blocos de tamanho fixo (memoria constante, qualquer tamanho de arquivo)
+- WAV existente tem o header validado: formato PCM, taxa/canais esperados e os tamanhos
+  RIFF/data conferidos com o tamanho real do arquivo (corrigidos no lugar se estiverem errados)
+- Opcional: normaliza o volume (RMS em dBFS, com limite de pico) usando NumPy, em duas passadas
+- Os arquivos sao processados em paralelo num pool de processos
+
+Uso: python fix_voice_files.py [pasta] [--recursivo] [--normalizar -20] [--workers N] [--verificar]
 """
 
 import os
+import sys
+import math
 import wave
 import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Pasta dos audios
 VOICES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "voices")
@@ -16,57 +28,200 @@ SAMPLE_RATE = 24000  # 24kHz
 CHANNELS = 1  # Mono
 SAMPLE_WIDTH = 2  # 16-bit = 2 bytes
 
-def fix_wav_file(input_path, output_path):
-    """Converte arquivo raw PCM para WAV valido"""
+BLOCK_BYTES = 1024 * 1024  # Tamanho do bloco lido/gravado por vez
+PICO_MAXIMO_DBFS = -1.0  # Limite de pico na normalizacao
+
+
+def ler_header_wav(path):
+    """
+    Le o header de um WAV. Retorna dict com formato, canais, taxa, bits, offset/tamanho do chunk data
+    (como declarado), posicao do campo de tamanho do data e tamanho real do arquivo.
+    Retorna None se o arquivo nao comecar com RIFF/WAVE.
+    """
+    tamanho_arquivo = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        info = {"riff_size": struct.unpack('<I', riff[4:8])[0], "tamanho_arquivo": tamanho_arquivo}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return info
+            nome, tamanho = struct.unpack('<4sI', chunk)
+            if nome == b'fmt ':
+                fmt = f.read(min(tamanho, 16))
+                info["formato"], info["canais"], info["taxa"], _, info["block_align"], info["bits"] = \
+                    struct.unpack('<HHIIHH', fmt[:16])
+                f.seek(tamanho - len(fmt) + (tamanho & 1), 1)
+            elif nome == b'data':
+                info["data_size_pos"] = f.tell() - 4
+                info["data_offset"] = f.tell()
+                info["data_size"] = tamanho
+                return info
+            else:
+                f.seek(tamanho + (tamanho & 1), 1)
+
+
+def converter_pcm(path, taxa, canais, largura):
+    """Envolve PCM cru num WAV, copiando em blocos para um temporario e trocando no fim"""
+    temp_path = f"{path}.tmp"
+    bloco = BLOCK_BYTES - BLOCK_BYTES % (largura * canais)
+    with open(path, 'rb') as src, wave.open(temp_path, 'wb') as wav:
+        wav.setnchannels(canais)
+        wav.setsampwidth(largura)
+        wav.setframerate(taxa)
+        resto = b''
+        while True:
+            dados = src.read(bloco)
+            if not dados:
+                break
+            dados = resto + dados
+            util = len(dados) - len(dados) % (largura * canais)
+            wav.writeframesraw(dados[:util])
+            resto = dados[util:]
+    os.replace(temp_path, path)
+
+
+def corrigir_tamanhos(path, info):
+    """Corrige RIFF/data sizes no lugar para bater com os bytes que realmente existem"""
+    disponivel = info["tamanho_arquivo"] - info["data_offset"]
+    data_size = min(info["data_size"], disponivel) if info["data_size"] not in (0, 0xFFFFFFFF) else disponivel
+    data_size -= data_size % max(1, info.get("block_align", 1))
+    with open(path, 'r+b') as f:
+        f.seek(info["data_size_pos"])
+        f.write(struct.pack('<I', data_size))
+        f.seek(4)
+        f.write(struct.pack('<I', info["tamanho_arquivo"] - 8))
+    return data_size
+
+
+def normalizar_volume(path, alvo_dbfs):
+    """
+    Ajusta o ganho para o RMS ficar em alvo_dbfs (sem passar de PICO_MAXIMO_DBFS).
+    Duas passadas em blocos: medir (RMS e pico) e gravar o resultado num temporario.
+    Retorna o ganho aplicado em dB, ou None se o NumPy nao estiver instalado.
+    """
     try:
-        # Ler dados raw
-        with open(input_path, 'rb') as f:
-            raw_data = f.read()
-
-        # Criar arquivo WAV com header correto
-        with wave.open(output_path, 'wb') as wav:
-            wav.setnchannels(CHANNELS)
-            wav.setsampwidth(SAMPLE_WIDTH)
-            wav.setframerate(SAMPLE_RATE)
-            wav.writeframes(raw_data)
-
-        return True
+        import numpy as np
+    except ImportError:
+        return None
+
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            return 0.0
+        params = wav.getparams()
+        frames_bloco = BLOCK_BYTES // (2 * params.nchannels)
+        soma, n, pico = 0.0, 0, 0
+        while True:
+            amostras = np.frombuffer(wav.readframes(frames_bloco), dtype='<i2')
+            if not len(amostras):
+                break
+            soma += float(np.dot(amostras.astype(np.float64), amostras))
+            n += len(amostras)
+            pico = max(pico, int(np.abs(amostras.astype(np.int32)).max()))
+
+    if not n or not pico:
+        return 0.0
+    rms_dbfs = 10 * math.log10(soma / n / 32768.0 ** 2)
+    pico_dbfs = 20 * math.log10(pico / 32768.0)
+    ganho_db = min(alvo_dbfs - rms_dbfs, PICO_MAXIMO_DBFS - pico_dbfs)
+    if abs(ganho_db) < 0.1:
+        return 0.0
+
+    ganho = 10 ** (ganho_db / 20)
+    temp_path = f"{path}.tmp"
+    with wave.open(path, 'rb') as src, wave.open(temp_path, 'wb') as dst:
+        dst.setparams(params)
+        while True:
+            amostras = np.frombuffer(src.readframes(frames_bloco), dtype='<i2')
+            if not len(amostras):
+                break
+            saida = np.clip(np.rint(amostras * ganho), -32768, 32767).astype('<i2')
+            dst.writeframesraw(saida.tobytes())
+    os.replace(temp_path, path)
+    return ganho_db
+
+
+def processar_arquivo(tarefa):
+    """Roda num processo do pool. Retorna (arquivo, status, detalhe)"""
+    path, taxa, canais, largura, alvo_dbfs, verificar = tarefa
+    try:
+        info = ler_header_wav(path)
+        acoes = []
+
+        if info is None:
+            if verificar:
+                return path, "pendente", "PCM cru, sem header"
+            converter_pcm(path, taxa, canais, largura)
+            acoes.append("convertido")
+        else:
+            if "formato" not in info or "data_offset" not in info:
+                return path, "invalido", "header sem chunks fmt/data"
+            if info["formato"] != 1:
+                return path, "invalido", f"formato {info['formato']} (esperado PCM)"
+            if info["taxa"] != taxa or info["canais"] != canais or info["bits"] != largura * 8:
+                return path, "invalido", f"{info['taxa']}Hz {info['canais']}ch {info['bits']}bit"
+            disponivel = info["tamanho_arquivo"] - info["data_offset"]
+            data_ok = info["data_size"] <= disponivel and info["data_size"] % info["block_align"] == 0
+            riff_ok = info["riff_size"] == info["tamanho_arquivo"] - 8
+            if not data_ok or not riff_ok or info["data_size"] == 0 and disponivel:
+                if verificar:
+                    return path, "pendente", f"tamanhos do header nao batem (data={info['data_size']}, real={disponivel})"
+                corrigir_tamanhos(path, info)
+                acoes.append("header corrigido")
+
+        if alvo_dbfs is not None and not verificar:
+            ganho = normalizar_volume(path, alvo_dbfs)
+            if ganho is None:
+                acoes.append("sem NumPy, volume mantido")
+            elif ganho:
+                acoes.append(f"volume {ganho:+.1f}dB")
+
+        return path, "corrigido" if acoes else "ok", ", ".join(acoes)
     except Exception as e:
-        print(f"Erro: {e}")
-        return False
+        return path, "erro", str(e)
 
-def main():
-    print(f"Corrigindo arquivos em: {VOICES_DIR}")
-    print("-" * 50)
 
-    files = [f for f in os.listdir(VOICES_DIR) if f.endswith('.wav')]
+def listar_arquivos(pasta, recursivo):
+    if not recursivo:
+        return sorted(os.path.join(pasta, f) for f in os.listdir(pasta) if f.lower().endswith('.wav'))
+    arquivos = []
+    for raiz, _, nomes in os.walk(pasta):
+        arquivos.extend(os.path.join(raiz, f) for f in nomes if f.lower().endswith('.wav'))
+    return sorted(arquivos)
 
-    for filename in files:
-        input_path = os.path.join(VOICES_DIR, filename)
-        temp_path = os.path.join(VOICES_DIR, f"temp_{filename}")
 
-        print(f"Processando {filename}...", end=" ")
+def main():
+    parser = argparse.ArgumentParser(description="Converte/valida/normaliza os audios dos assets")
+    parser.add_argument("pasta", nargs="?", default=VOICES_DIR)
+    parser.add_argument("--recursivo", action="store_true", help="Inclui subpastas")
+    parser.add_argument("--taxa", type=int, default=SAMPLE_RATE, help="Taxa esperada (e usada no PCM cru)")
+    parser.add_argument("--canais", type=int, default=CHANNELS)
+    parser.add_argument("--largura", type=int, default=SAMPLE_WIDTH, help="Bytes por amostra")
+    parser.add_argument("--normalizar", type=float, metavar="DBFS", help="Volume alvo (RMS em dBFS, ex: -20)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--verificar", action="store_true", help="So relata, sem alterar os arquivos")
+    args = parser.parse_args()
 
-        # Verificar se ja tem header WAV valido
-        with open(input_path, 'rb') as f:
-            header = f.read(4)
+    print(f"Corrigindo arquivos em: {args.pasta}")
+    print("-" * 50)
 
-        if header == b'RIFF':
-            print("JA OK")
-            continue
+    files = listar_arquivos(args.pasta, args.recursivo)
+    tarefas = [(path, args.taxa, args.canais, args.largura, args.normalizar, args.verificar) for path in files]
+    contagem = {}
 
-        # Converter
-        if fix_wav_file(input_path, temp_path):
-            os.remove(input_path)
-            os.rename(temp_path, input_path)
-            print("CONVERTIDO")
-        else:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            print("ERRO")
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(tarefas) or 1))) as pool:
+        for future in as_completed([pool.submit(processar_arquivo, t) for t in tarefas]):
+            path, status, detalhe = future.result()
+            contagem[status] = contagem.get(status, 0) + 1
+            if status != "ok":
+                print(f"{os.path.relpath(path, args.pasta)}: {status.upper()}{f' ({detalhe})' if detalhe else ''}")
 
     print("-" * 50)
-    print("Concluido!")
+    print(f"Concluido! {len(files)} arquivos: " + ", ".join(f"{n} {s}" for s, n in sorted(contagem.items())))
+    if contagem.get("erro") or contagem.get("invalido") or (args.verificar and contagem.get("pendente")):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -291,7 +291,7 @@ export default function CreatorPanel({ onLog, isPro, draftPath, onReanalyze }: C
       const imageFiles = await ipcRenderer.invoke('list-folder-files', imagesFolder)
       if (imageFiles && imageFiles.length > 0) {
         const imagePaths = imageFiles
-          .filter((f: string) => f.endsWith('.png') || f.endsWith('.jpg'))
+          .filter((f: string) => f.endsWith('.png') || f.endsWith('.jpg') || f.endsWith('.webp'))
           .map((f: string) => `${imagesFolder}/${f}`)
         setPreviewImages(imagePaths)
       }
@@ -484,7 +484,7 @@ export default function CreatorPanel({ onLog, isPro, draftPath, onReanalyze }: C
             const imageFiles = await ipcRenderer.invoke('list-folder-files', imagesFolder)
             if (imageFiles && imageFiles.length > 0) {
               const imagePaths = imageFiles
-                .filter((f: string) => f.endsWith('.png') || f.endsWith('.jpg'))
+                .filter((f: string) => f.endsWith('.png') || f.endsWith('.jpg') || f.endsWith('.webp'))
                 .map((f: string) => `${imagesFolder}/${f}`)
               setPreviewImages(imagePaths)
             }
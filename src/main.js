@@ -543,8 +543,101 @@ function generateUUID() {
   });
 }
 
+// ============ ROOT META REGISTRY ============
+// root_meta_info.json e compartilhado com o project_manager.py (python/root_meta.py): toda
+// leitura-modificacao-escrita acontece sob o mesmo lock (root_meta_info.json.lock, criado com 'wx')
+// e a gravacao e atomica (temporario + rename), para operacoes simultaneas nao perderem entradas
+const ROOT_META_LOCK_TIMEOUT_MS = 10000;
+const ROOT_META_LOCK_STALE_MS = 30000;  // Lock mais velho que isso e de um processo que morreu
+
+function readLockToken(lockPath) {
+  try { return fs.readFileSync(lockPath, 'utf-8'); } catch (e) { return null; }
+}
+
+// Remove um lock vencido so se ele ainda for o que foi lido (token): renomeia para um nome unico
+// (atomico) e confere o conteudo; se outro processo acabou de pegar o lock, devolve o arquivo ao lugar
+function removeStaleRootMetaLock(lockPath, token) {
+  const stalePath = `${lockPath}.${generateUUID()}.stale`;
+  try {
+    fs.renameSync(lockPath, stalePath);
+  } catch (e) {
+    return;  // O lock sumiu entre uma chamada e outra
+  }
+  if (readLockToken(stalePath) !== token) {
+    try { fs.linkSync(stalePath, lockPath); } catch (e) { /* ja existe um lock novo: nao sobrescreve */ }
+  }
+  try { fs.unlinkSync(stalePath); } catch (e) { /* ja removido */ }
+}
+
+// Cria o lock com 'wx' e grava um token proprio (pid:uuid); espera sem bloquear o processo principal
+async function acquireRootMetaLock(lockPath) {
+  const token = `${process.pid}:${generateUUID()}`;
+  const start = Date.now();
+  while (true) {
+    try {
+      const fd = fs.openSync(lockPath, 'wx');
+      fs.writeSync(fd, token);
+      fs.closeSync(fd);
+      return token;
+    } catch (e) {
+      if (e.code !== 'EEXIST') throw e;
+    }
+    const current = readLockToken(lockPath);
+    try {
+      if (current !== null && Date.now() - fs.statSync(lockPath).mtimeMs > ROOT_META_LOCK_STALE_MS) {
+        removeStaleRootMetaLock(lockPath, current);
+        continue;
+      }
+    } catch (e) {
+      continue;  // O lock sumiu entre uma chamada e outra
+    }
+    if (Date.now() - start > ROOT_META_LOCK_TIMEOUT_MS) {
+      throw new Error('root_meta_info.json bloqueado por outro processo');
+    }
+    await new Promise(resolve => setTimeout(resolve, 25));
+  }
+}
+
+// So remove o lock se ele ainda for nosso (pode ter sido tomado como vencido por outro processo)
+function releaseRootMetaLock(lockPath, token) {
+  if (readLockToken(lockPath) !== token) return;
+  try { fs.unlinkSync(lockPath); } catch (e) { /* ja removido */ }
+}
+
+// Le, aplica mutate(rootMeta) e grava uma vez, tudo sob o lock. mutate pode devolver false para nao gravar
+async function updateRootMeta(capCutDrafts, mutate) {
+  const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
+  const lockPath = rootMetaPath + '.lock';
+  const token = await acquireRootMetaLock(lockPath);
+  try {
+    let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
+    if (fs.existsSync(rootMetaPath)) {
+      try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
+    }
+    if (!Array.isArray(rootMeta.all_draft_store)) rootMeta.all_draft_store = [];
+
+    if (mutate(rootMeta) !== false) {
+      const tempPath = `${rootMetaPath}.${process.pid}.tmp`;
+      fs.writeFileSync(tempPath, JSON.stringify(rootMeta));
+      fs.renameSync(tempPath, rootMetaPath);
+    }
+    return rootMeta;
+  } finally {
+    releaseRootMetaLock(lockPath, token);
+  }
+}
+
+// Novo projeto no inicio da lista (substitui uma entrada com o mesmo draft_id)
+async function registerRootMetaEntry(capCutDrafts, entry) {
+  return updateRootMeta(capCutDrafts, rootMeta => {
+    rootMeta.all_draft_store = rootMeta.all_draft_store.filter(d => d.draft_id !== entry.draft_id);
+    rootMeta.all_draft_store.unshift(entry);
+    rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
+  });
+}
+
 // Ensure all project files use the same draft_id (fixes CapCut visibility issues)
-function ensureConsistentDraftId(projectPath, capCutDrafts) {
+async function ensureConsistentDraftId(projectPath, capCutDrafts) {
   try {
     const draftContentPath = path.join(projectPath, 'draft_content.json');
     const draftInfoPath = path.join(projectPath, 'draft_info.json');
@@ -579,14 +672,13 @@ function ensureConsistentDraftId(projectPath, capCutDrafts) {
 
     // Fix root_meta_info.json if needed
     if (fs.existsSync(rootMetaPath)) {
-      const rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8'));
       const projectName = path.basename(projectPath);
-      const entry = rootMeta.all_draft_store.find(d => d.draft_name === projectName);
-      if (entry && entry.draft_id !== correctId) {
+      await updateRootMeta(capCutDrafts, rootMeta => {
+        const entry = rootMeta.all_draft_store.find(d => d.draft_name === projectName);
+        if (!entry || entry.draft_id === correctId) return false;
         entry.draft_id = correctId;
-        fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
         console.log('[ID Fix] root_meta_info.json updated');
-      }
+      });
     }
   } catch (e) {
     console.error('[ID Fix] Error:', e.message);
@@ -691,12 +783,6 @@ ipcMain.handle('create-new-project', async () => {
     fs.writeFileSync(path.join(projectPath, 'draft_meta_info.json'), JSON.stringify(draftMetaInfo));
 
     // Registrar no root_meta_info.json para aparecer no CapCut
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
-    if (fs.existsSync(rootMetaPath)) {
-      try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
-    }
-
     const newDraftEntry = {
       cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
       draft_cloud_purchase_info: "", draft_cloud_template_id: "", draft_cloud_tutorial_info: "",
@@ -712,12 +798,10 @@ ipcMain.handle('create-new-project', async () => {
       tm_draft_removed: 0, tm_duration: 0
     };
 
-    rootMeta.all_draft_store.unshift(newDraftEntry);
-    rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
-    fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
+    await registerRootMetaEntry(capCutDrafts, newDraftEntry);
 
     // Ensure all project files use consistent draft_id
-    ensureConsistentDraftId(projectPath, capCutDrafts);
+    await ensureConsistentDraftId(projectPath, capCutDrafts);
 
     return { success: true, path: projectPath, name: projectName, draftPath: draftPath };
   } catch (error) {
@@ -768,16 +852,14 @@ ipcMain.handle('rename-project', async (_, { projectPath, newName }) => {
 
     // Atualizar root_meta_info.json
     const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    if (fs.existsSync(rootMetaPath)) {
-      const rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8'));
-      const draftEntry = rootMeta.all_draft_store?.find(d => d.draft_fold_path?.includes(oldName));
-      if (draftEntry) {
+    if (fs.existsSync(path.join(capCutDrafts, 'root_meta_info.json'))) {
+      await updateRootMeta(capCutDrafts, rootMeta => {
+        const draftEntry = rootMeta.all_draft_store.find(d => d.draft_fold_path?.includes(oldName));
+        if (!draftEntry) return false;
         draftEntry.draft_name = newName;
         draftEntry.draft_fold_path = newPath.replace(/\\/g, '/');
         draftEntry.draft_json_file = path.join(newPath, 'draft_content.json').replace(/\\/g, '/');
-        fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
-      }
+      });
     }
 
     return {
@@ -792,6 +874,8 @@ ipcMain.handle('rename-project', async (_, { projectPath, newName }) => {
 });
 
 // ============ CREATE FROM TEMPLATE ============
+// O template e compilado uma vez no project_manager.py (acao 'stamp_template') e carimbado
+// com ids novos; o registro no root_meta_info.json e feito la, numa gravacao so
 ipcMain.handle('create-from-template', async (_, { templatePath, newName, keepMedia, expandEffects }) => {
   try {
     const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
@@ -800,171 +884,59 @@ ipcMain.handle('create-from-template', async (_, { templatePath, newName, keepMe
     }
 
     const timestamp = Date.now();
-    const microTimestamp = timestamp * 1000 + Math.floor(Math.random() * 1000);
     const projectName = newName || `Template_${new Date().toISOString().slice(0, 10).replace(/-/g, '')}_${timestamp}`;
-    const projectPath = path.join(capCutDrafts, projectName);
-    const newDraftId = generateUUID();
 
     // Verificar se já existe
-    if (fs.existsSync(projectPath)) {
+    if (fs.existsSync(path.join(capCutDrafts, projectName))) {
       return { error: 'Já existe um projeto com esse nome' };
     }
 
-    // Criar pasta do novo projeto
-    fs.mkdirSync(projectPath, { recursive: true });
-
-    // Ler o draft_content.json do template
-    const templateDraftPath = path.join(templatePath, 'draft_content.json');
-    if (!fs.existsSync(templateDraftPath)) {
-      return { error: 'Template não contém draft_content.json' };
-    }
-
-    const templateContent = JSON.parse(fs.readFileSync(templateDraftPath, 'utf-8'));
-
-    // Modificar o conteúdo
-    templateContent.id = newDraftId;
-    templateContent.name = projectName;
-    templateContent.create_time = Math.floor(timestamp / 1000);
-    templateContent.update_time = Math.floor(timestamp / 1000);
-
-    // Se não manter mídias, REMOVER tracks de video/audio e manter apenas efeitos/filtros/texto
-    if (!keepMedia) {
-      // Remover completamente as tracks de video e audio (manter text, effect, filter)
-      templateContent.tracks = (templateContent.tracks || []).filter(track =>
-        !['video', 'audio'].includes(track.type)
-      );
-
-      // Limpar TODOS os materiais de mídia
-      if (templateContent.materials) {
-        templateContent.materials.videos = [];
-        templateContent.materials.audios = [];
-        templateContent.materials.images = [];
-        // Limpar também efeitos de áudio e configurações relacionadas a mídia
-        templateContent.materials.audio_balances = [];
-        templateContent.materials.audio_effects = [];
-        templateContent.materials.audio_fades = [];
-        templateContent.materials.loudnesses = [];
-        templateContent.materials.sound_channel_mappings = [];
-        templateContent.materials.speeds = [];
-        templateContent.materials.vocal_separations = [];
-        templateContent.materials.video_trackings = [];
-      }
-
-      // Resetar duração para 0
-      templateContent.duration = 0;
-
-      // Limpar keyframes de video e audio
-      if (templateContent.keyframes) {
-        templateContent.keyframes.videos = [];
-        templateContent.keyframes.audios = [];
-      }
-    }
-
-    // Se expandir efeitos, calcular a duração máxima e expandir tracks de efeito/filtro
-    if (expandEffects && keepMedia) {
-      // Calcular duração máxima da timeline
-      let maxDuration = 0;
-      (templateContent.tracks || []).forEach(track => {
-        (track.segments || []).forEach(seg => {
-          const end = (seg.target_timerange?.start || 0) + (seg.target_timerange?.duration || 0);
-          if (end > maxDuration) maxDuration = end;
-        });
-      });
-
-      // Expandir tracks de efeito e filtro
-      if (maxDuration > 0) {
-        templateContent.tracks = (templateContent.tracks || []).map(track => {
-          if (['effect', 'filter'].includes(track.type) && track.segments?.length > 0) {
-            track.segments = track.segments.map(seg => ({
-              ...seg,
-              target_timerange: {
-                ...seg.target_timerange,
-                start: 0,
-                duration: maxDuration
-              }
-            }));
-          }
-          return track;
-        });
-      }
-    }
-
-    // Salvar draft_content.json
-    const draftPath = path.join(projectPath, 'draft_content.json');
-    fs.writeFileSync(draftPath, JSON.stringify(templateContent, null, 2));
-
-    // Criar draft_info.json
-    const draftInfo = {
-      draft_cloud_capcut_purchase_info: null, draft_cloud_purchase_info: null, draft_cloud_template_id: "",
-      draft_cloud_tutorial_info: null, draft_cloud_videocut_purchase_info: null, draft_cover: "", draft_deeplink_url: "",
-      draft_enterprise_info: null, draft_fold_path: projectPath, draft_id: newDraftId, draft_is_ai_shorts: false,
-      draft_is_article_video_draft: false, draft_is_from_deeplink: false, draft_is_invisible: false, draft_materials_copied: false,
-      draft_materials_copied_path: null, draft_name: projectName, draft_new_version: "", draft_removable_storage_device: "",
-      draft_root_path: capCutDrafts, draft_segment_extra_info: null, draft_timeline_materials_size: 0, draft_type: "normal",
-      tm_draft_cloud_completed: null, tm_draft_cloud_modified: 0, tm_draft_create: Math.floor(timestamp / 1000),
-      tm_draft_modified: Math.floor(timestamp / 1000), tm_draft_removed: 0
-    };
-    fs.writeFileSync(path.join(projectPath, 'draft_info.json'), JSON.stringify(draftInfo, null, 2));
-
-    // Criar draft_meta_info.json
-    const draftMetaInfo = {
-      cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
-      draft_cloud_purchase_info: "", draft_cloud_template_id: "", draft_cloud_tutorial_info: "",
-      draft_cloud_videocut_purchase_info: "", draft_cover: "",
-      draft_enterprise_info: { draft_enterprise_extra: "", draft_enterprise_id: "", draft_enterprise_name: "", enterprise_material: [] },
-      draft_fold_path: projectPath.replace(/\\/g, '/'), draft_id: newDraftId,
-      draft_is_ai_shorts: false, draft_is_article_video_draft: false, draft_is_cloud_temp_draft: false,
-      draft_is_from_deeplink: "false", draft_is_invisible: false, draft_is_web_article_video: false,
-      draft_materials: [
-        { type: 0, value: [] }, { type: 1, value: [] }, { type: 2, value: [] },
-        { type: 3, value: [] }, { type: 6, value: [] }, { type: 7, value: [] }, { type: 8, value: [] }
-      ],
-      draft_materials_copied_info: [], draft_name: projectName, draft_need_rename_folder: false,
-      draft_new_version: "", draft_removable_storage_device: "",
-      draft_root_path: capCutDrafts.replace(/\\/g, '/'), draft_segment_extra_info: [],
-      draft_timeline_materials_size_: 0, draft_type: "",
-      tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp, tm_draft_removed: 0, tm_duration: 0
-    };
-    fs.writeFileSync(path.join(projectPath, 'draft_meta_info.json'), JSON.stringify(draftMetaInfo));
-
-    // Registrar no root_meta_info.json
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
-    if (fs.existsSync(rootMetaPath)) {
-      try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
+    const result = await runProjectManager({
+      action: 'stamp_template',
+      templatePath,
+      outputDir: capCutDrafts,
+      rootMetaPath: path.join(capCutDrafts, 'root_meta_info.json'),
+      names: [projectName],
+      keepMedia: !!keepMedia,
+      expandEffects: !!expandEffects
+    });
+    if (!result.success) {
+      return { error: result.error || result.errors?.[0]?.error || 'Falha ao criar projeto do template' };
     }
 
-    const newDraftEntry = {
-      cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
-      draft_cloud_purchase_info: "", draft_cloud_template_id: "", draft_cloud_tutorial_info: "",
-      draft_cloud_videocut_purchase_info: "", draft_cover: "",
-      draft_fold_path: projectPath.replace(/\\/g, '/'), draft_id: newDraftId,
-      draft_is_ai_shorts: false, draft_is_cloud_temp_draft: false, draft_is_invisible: false,
-      draft_is_web_article_video: false, draft_json_file: draftPath.replace(/\\/g, '/'),
-      draft_name: projectName, draft_new_version: "", draft_root_path: capCutDrafts.replace(/\\/g, '/'),
-      draft_timeline_materials_size: 0, draft_type: "", draft_web_article_video_enter_from: "",
-      streaming_edit_draft_ready: true, tm_draft_cloud_completed: "", tm_draft_cloud_entry_id: -1,
-      tm_draft_cloud_modified: 0, tm_draft_cloud_parent_entry_id: -1, tm_draft_cloud_space_id: -1,
-      tm_draft_cloud_user_id: -1, tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp,
-      tm_draft_removed: 0, tm_duration: 0
-    };
-
-    rootMeta.all_draft_store.unshift(newDraftEntry);
-    rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
-    fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
-
+    const project = result.projects[0];
     return {
       success: true,
-      path: projectPath,
-      name: projectName,
-      draftPath: draftPath,
-      templateName: path.basename(templatePath)
+      path: project.projectPath,
+      name: project.projectName,
+      draftPath: project.draftContentPath,
+      templateName: result.templateName
     };
   } catch (error) {
     return { error: error.message };
   }
 });
 
+// Varios projetos do mesmo template numa chamada (names ou count + baseName)
+ipcMain.handle('stamp-template', async (_, { templatePath, names, count, baseName, keepMedia, expandEffects }) => {
+  const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
+  if (!fs.existsSync(capCutDrafts)) {
+    return { error: 'Pasta de projetos do CapCut nao encontrada.' };
+  }
+
+  return runProjectManager({
+    action: 'stamp_template',
+    templatePath,
+    outputDir: capCutDrafts,
+    rootMetaPath: path.join(capCutDrafts, 'root_meta_info.json'),
+    names,
+    count,
+    baseName,
+    keepMedia: !!keepMedia,
+    expandEffects: !!expandEffects
+  });
+});
+
 // ============ DELETE PROJECT ============
 ipcMain.handle('delete-project', async (_, { projectPath }) => {
   try {
@@ -976,13 +948,12 @@ ipcMain.handle('delete-project', async (_, { projectPath }) => {
 
     // Remover do root_meta_info.json primeiro
     const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    if (fs.existsSync(rootMetaPath)) {
-      const rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8'));
-      rootMeta.all_draft_store = (rootMeta.all_draft_store || []).filter(
-        d => !d.draft_fold_path?.includes(projectName)
-      );
-      fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
+    if (fs.existsSync(path.join(capCutDrafts, 'root_meta_info.json'))) {
+      await updateRootMeta(capCutDrafts, rootMeta => {
+        rootMeta.all_draft_store = rootMeta.all_draft_store.filter(
+          d => !d.draft_fold_path?.includes(projectName)
+        );
+      });
     }
 
     // Deletar a pasta do projeto recursivamente
@@ -1002,17 +973,10 @@ ipcMain.handle('delete-multiple-projects', async (_, { projectPaths }) => {
     }
 
     const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
 
     const deleted = [];
     const errors = [];
 
-    // Read root_meta_info once
-    let rootMeta = { all_draft_store: [] };
-    if (fs.existsSync(rootMetaPath)) {
-      rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8'));
-    }
-
     for (const projectPath of projectPaths) {
       try {
         if (!fs.existsSync(projectPath)) {
@@ -1022,11 +986,6 @@ ipcMain.handle('delete-multiple-projects', async (_, { projectPaths }) => {
 
         const projectName = path.basename(projectPath);
 
-        // Remove from root_meta_info
-        rootMeta.all_draft_store = (rootMeta.all_draft_store || []).filter(
-          d => !d.draft_fold_path?.includes(projectName)
-        );
-
         // Delete project folder
         fs.rmSync(projectPath, { recursive: true, force: true });
         deleted.push(projectName);
@@ -1035,8 +994,14 @@ ipcMain.handle('delete-multiple-projects', async (_, { projectPaths }) => {
       }
     }
 
-    // Save root_meta_info once
-    fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
+    // Remove all deleted projects from root_meta_info in a single locked write
+    if (deleted.length > 0) {
+      await updateRootMeta(capCutDrafts, rootMeta => {
+        rootMeta.all_draft_store = rootMeta.all_draft_store.filter(
+          d => !deleted.some(name => d.draft_fold_path?.includes(name))
+        );
+      });
+    }
 
     return {
       success: true,
@@ -1324,10 +1289,12 @@ ipcMain.handle('start-content-generation', async (_, params) => {
   const pythonScript = path.join(basePath, 'python', 'content_creator.py');
   const timestamp = Date.now();
   const progressFile = path.join(app.getPath('temp'), `content_progress_${timestamp}.json`);
+  const eventsFile = path.join(app.getPath('temp'), `content_events_${timestamp}.ndjson`);
   const tempFile = path.join(app.getPath('temp'), `content_cmd_${timestamp}.json`);
 
-  // Adicionar arquivo de progresso aos params
+  // Adicionar arquivo de progresso e stream de eventos (NDJSON) aos params
   params.progressFile = progressFile;
+  params.eventsFile = eventsFile;
   params.action = 'generate';
 
   // Criar arquivo de progresso inicial
@@ -1372,7 +1339,7 @@ ipcMain.handle('start-content-generation', async (_, params) => {
   });
 
   // Armazenar processo
-  runningGenerations.set(progressFile, { process: pythonProcess, resultPromise, tempFile });
+  runningGenerations.set(progressFile, { process: pythonProcess, resultPromise, tempFile, eventsFile });
 
   return progressFile;
 });
@@ -1386,8 +1353,9 @@ ipcMain.handle('wait-content-generation', async (_, progressFile) => {
 
   try {
     const result = await generation.resultPromise;
-    // Limpar arquivo de progresso
+    // Limpar arquivos de progresso e eventos
     try { fs.unlinkSync(progressFile); } catch {}
+    try { fs.unlinkSync(generation.eventsFile); } catch {}
     runningGenerations.delete(progressFile);
     return result;
   } catch (error) {
@@ -1417,6 +1385,7 @@ ipcMain.handle('cancel-content-generation', async (_, progressFile) => {
     // Limpar arquivos
     try { fs.unlinkSync(progressFile); } catch {}
     try { fs.unlinkSync(generation.tempFile); } catch {}
+    try { fs.unlinkSync(generation.eventsFile); } catch {}
 
     runningGenerations.delete(progressFile);
     console.log('[ContentCreator] Generation cancelled');
@@ -1479,6 +1448,34 @@ ipcMain.handle('get-content-progress', async (_, progressFile) => {
   return { progress: 0, status: 'Aguardando...' };
 });
 
+// Le so os eventos novos do stream NDJSON (a partir do offset ja lido)
+ipcMain.handle('get-content-events', async (_, { progressFile, offset = 0 }) => {
+  const generation = runningGenerations.get(progressFile);
+  if (!generation || !generation.eventsFile) return { events: [], offset };
+  try {
+    const size = fs.statSync(generation.eventsFile).size;
+    if (size <= offset) return { events: [], offset };
+    const fd = fs.openSync(generation.eventsFile, 'r');
+    const buffer = Buffer.alloc(size - offset);
+    fs.readSync(fd, buffer, 0, buffer.length, offset);
+    fs.closeSync(fd);
+    // Ignorar linha incompleta no final (sera lida na proxima chamada)
+    const end = buffer.lastIndexOf(0x0a) + 1;
+    const events = [];
+    for (const line of buffer.subarray(0, end).toString('utf-8').split('\n')) {
+      if (!line.trim()) continue;
+      try {
+        events.push(JSON.parse(line));
+      } catch {
+        // Linha corrompida: pula e segue, senao o offset nunca passaria dela
+      }
+    }
+    return { events, offset: offset + end };
+  } catch {
+    return { events: [], offset };
+  }
+});
+
 // ============ VOICE PREVIEW (TTS) ============
 ipcMain.handle('preview-voice', async (_, { apiKey, voice, text }) => {
   const basePath = app.isPackaged
@@ -1551,6 +1548,95 @@ ipcMain.handle('insert-creator-content', async (_, { draftPath, contentFolder, a
   });
 });
 
+// Insere o conteudo no projeto enquanto a geracao (progressFile) ainda roda.
+// Processo assincrono: o runPython (spawnSync) travaria o app ate o fim da geracao.
+ipcMain.handle('follow-creator-content', async (_, { draftPath, progressFile, addAnimations }) => {
+  const generation = runningGenerations.get(progressFile);
+  if (!generation) {
+    return { error: 'Generation not found' };
+  }
+
+  const basePath = app.isPackaged
+    ? process.resourcesPath
+    : process.cwd();
+
+  const pythonScript = path.join(basePath, 'python', 'sync_engine.py');
+  const cmdJson = JSON.stringify({
+    action: 'follow_creator',
+    draftPath,
+    eventsFile: generation.eventsFile,
+    addAnimations: addAnimations !== false
+  });
+
+  return new Promise((resolve) => {
+    const pythonProcess = spawn('python', [pythonScript, cmdJson], { encoding: 'utf-8' });
+    let stdout = '';
+
+    pythonProcess.stdout.on('data', (data) => {
+      stdout += data.toString();
+    });
+
+    pythonProcess.stderr.on('data', (data) => {
+      console.log('[FollowCreator-Debug]', data.toString().trim());
+    });
+
+    pythonProcess.on('close', (code) => {
+      try {
+        resolve(JSON.parse(stdout.trim()));
+      } catch {
+        resolve({ error: `Python exited with code ${code}` });
+      }
+    });
+  });
+});
+
+// ============ BATCH (mesma acao em varios projetos, via Python) ============
+// Os projetos rodam num pool de processos; cada um que termina chega como uma linha
+// no stdout e e repassado ao renderer ('batch-draft-result'). A ultima linha e o resumo.
+ipcMain.handle('batch-drafts', async (event, { draftPaths, spec, workers }) => {
+  const basePath = app.isPackaged
+    ? process.resourcesPath
+    : process.cwd();
+
+  const pythonScript = path.join(basePath, 'python', 'sync_engine.py');
+  const tempFile = path.join(require('os').tmpdir(), `capcut_batch_${Date.now()}.json`);
+  fs.writeFileSync(tempFile, JSON.stringify({ action: 'batch', draftPaths, spec, workers }), 'utf-8');
+
+  return new Promise((resolve) => {
+    const pythonProcess = spawn('python', [pythonScript, '--file', tempFile], { encoding: 'utf-8' });
+    let pending = '';
+    let summary = null;
+
+    pythonProcess.stdout.on('data', (data) => {
+      const lines = (pending + data.toString()).split('\n');
+      pending = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        try {
+          const item = JSON.parse(line);
+          if (item.draftPath !== undefined) {
+            event.sender.send('batch-draft-result', item);
+          } else {
+            summary = item;
+          }
+        } catch {}
+      }
+    });
+
+    pythonProcess.stderr.on('data', (data) => {
+      console.log('[Batch-Debug]', data.toString().trim());
+    });
+
+    pythonProcess.on('close', (code) => {
+      try { fs.unlinkSync(tempFile); } catch {}
+      if (pending.trim()) {
+        try { summary = JSON.parse(pending); } catch {}
+      }
+      resolve(summary || { error: `Python exited with code ${code}` });
+    });
+  });
+});
+
 // ============ IMPORT MEDIA FOLDER ============
 ipcMain.handle('import-media-folder', async (_, { draftPath, folderPath, addAnimations, syncToAudio, separateAudioTracks }) => {
   return runPython({
@@ -1833,6 +1919,17 @@ ipcMain.handle('detect-capcut-folder', async (event, { customPath } = {}) => {
       return { error: customPath ? 'Pasta não encontrada' : 'Pasta do CapCut não encontrada no caminho padrão' };
     }
 
+    // Catalogo SQLite (python/draft_catalog.py): so relê os projetos que mudaram desde a ultima vez
+    const catalog = await runPythonScript('draft_catalog.py', {
+      action: 'catalog',
+      draftsRoot: capCutPath,
+      dbPath: path.join(app.getPath('userData'), 'draft_catalog.sqlite')
+    });
+    if (catalog.success) {
+      return { capCutPath, projects: catalog.projects, count: catalog.count };
+    }
+    console.error('[Catalog] Falhou, listando direto:', catalog.error);
+
     // Listar projetos (pastas que contêm draft_content.json)
     const items = fs.readdirSync(capCutPath);
     const projects = [];
@@ -1987,96 +2084,6 @@ ipcMain.handle('google-oauth-browser', async () => {
   });
 });
 
-// ============ HELPER: Copy all media files from source project to target ============
-function copyProjectMedia(sourceProjectPath, targetProjectPath) {
-  // Media file extensions to copy
-  const mediaExtensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.mp4', '.mov', '.avi', '.mkv', '.mp3', '.m4a', '.wav', '.aac', '.ogg', '.flac'];
-  let copiedCount = 0;
-
-  try {
-    // Read all files in source project folder
-    const files = fs.readdirSync(sourceProjectPath);
-
-    for (const file of files) {
-      const ext = path.extname(file).toLowerCase();
-      if (mediaExtensions.includes(ext)) {
-        const sourcePath = path.join(sourceProjectPath, file);
-        const targetPath = path.join(targetProjectPath, file);
-
-        // Only copy if source is a file (not directory)
-        const stat = fs.statSync(sourcePath);
-        if (stat.isFile()) {
-          // Skip if already exists with same size
-          if (fs.existsSync(targetPath)) {
-            const targetStat = fs.statSync(targetPath);
-            if (targetStat.size === stat.size) {
-              console.log(`Skipping (exists): ${file}`);
-              continue;
-            }
-          }
-
-          fs.copyFileSync(sourcePath, targetPath);
-          copiedCount++;
-          console.log(`Copied: ${file}`);
-        }
-      }
-    }
-
-    console.log(`Media copy complete: ${copiedCount} files from ${path.basename(sourceProjectPath)}`);
-  } catch (err) {
-    console.error(`Error copying media from ${sourceProjectPath}:`, err.message);
-  }
-
-  return copiedCount;
-}
-
-// ============ HELPER: Replace placeholder paths in content ============
-function replacePlaceholders(content, oldPlaceholderId, newPlaceholderId) {
-  // Convert content to string
-  const jsonString = typeof content === 'string' ? content : JSON.stringify(content);
-
-  // Replace all occurrences of the old placeholder with the new one
-  const oldPattern = `##_draftpath_placeholder_${oldPlaceholderId}_##`;
-  const newPattern = `##_draftpath_placeholder_${newPlaceholderId}_##`;
-
-  const updatedString = jsonString.split(oldPattern).join(newPattern);
-
-  // Return as object if input was object
-  return typeof content === 'string' ? updatedString : JSON.parse(updatedString);
-}
-
-// ============ HELPER: Extract placeholder ID from draft content ============
-function extractPlaceholderId(content) {
-  const jsonString = typeof content === 'string' ? content : JSON.stringify(content);
-  const match = jsonString.match(/##_draftpath_placeholder_([A-F0-9-]+)_##/i);
-  return match ? match[1] : null;
-}
-
-// ============ HELPER: Copy folder recursively ============
-function copyFolderRecursive(source, target) {
-  // Create target folder if it doesn't exist
-  if (!fs.existsSync(target)) {
-    fs.mkdirSync(target, { recursive: true });
-  }
-
-  // Get all files and folders in source
-  const items = fs.readdirSync(source);
-
-  for (const item of items) {
-    const sourcePath = path.join(source, item);
-    const targetPath = path.join(target, item);
-    const stat = fs.statSync(sourcePath);
-
-    if (stat.isDirectory()) {
-      // Recursively copy subdirectory
-      copyFolderRecursive(sourcePath, targetPath);
-    } else {
-      // Copy file
-      fs.copyFileSync(sourcePath, targetPath);
-    }
-  }
-}
-
 // ============ COPY CLOUD PROJECT TO LOCAL ============
 ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
   try {
@@ -2102,37 +2109,19 @@ ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
     const newProjectPath = path.join(capCutDrafts, newProjectName);
     const newDraftId = generateUUID();
 
-    // Check if already exists - delete and recreate
-    if (fs.existsSync(newProjectPath)) {
-      console.log(`Deleting existing folder: ${newProjectName}`);
-      fs.rmSync(newProjectPath, { recursive: true, force: true });
-    }
-
-    // Copy entire folder recursively
-    console.log(`Copying entire folder from ${originalName} to ${newProjectName}...`);
-    copyFolderRecursive(projectPath, newProjectPath);
-    console.log('Folder copy complete');
-
-    // Read original draft content
-    const draftContent = JSON.parse(fs.readFileSync(path.join(newProjectPath, 'draft_content.json'), 'utf-8'));
-
-    // Replace placeholders with ABSOLUTE paths (CapCut local projects use absolute paths, not placeholders!)
-    const oldPlaceholderId = extractPlaceholderId(draftContent);
-    let updatedContent = draftContent;
-    if (oldPlaceholderId) {
-      // Convert placeholder to absolute path (use forward slashes like CapCut does)
-      const absolutePath = newProjectPath.replace(/\\/g, '/');
-      const placeholderPattern = `##_draftpath_placeholder_${oldPlaceholderId}_##`;
-      console.log(`Replacing placeholder with absolute path: ${placeholderPattern} -> ${absolutePath}`);
-
-      // Convert to string, replace, and parse back
-      const jsonString = JSON.stringify(draftContent);
-      const updatedString = jsonString.split(placeholderPattern).join(absolutePath);
-      updatedContent = JSON.parse(updatedString);
+    // Copia retomavel no project_manager.py: arquivos que ja estao iguais na pasta local sao pulados,
+    // uma copia interrompida continua de onde parou e os placeholders viram caminhos absolutos
+    // (projetos locais do CapCut usam caminhos absolutos)
+    console.log(`Copying folder from ${originalName} to ${newProjectName}...`);
+    const copy = await runProjectManager({
+      action: 'copy_to_local',
+      sourcePath: projectPath,
+      targetPath: newProjectPath
+    });
+    if (!copy.success) {
+      return { error: copy.error, failed: copy.failed, resumable: copy.resumable };
     }
-
-    // Save updated draft_content.json
-    fs.writeFileSync(path.join(newProjectPath, 'draft_content.json'), JSON.stringify(updatedContent));
+    console.log(`Folder copy complete: ${copy.copied} copied, ${copy.skipped} already up to date, ${copy.removed} removed, ${copy.resumedMB} MB resumed`);
 
     // Create draft_info.json
     const draftInfo = {
@@ -2148,7 +2137,7 @@ ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
     fs.writeFileSync(path.join(newProjectPath, 'draft_info.json'), JSON.stringify(draftInfo, null, 2));
 
     // Create draft_meta_info.json
-    const duration = updatedContent.duration || 0;
+    const duration = copy.duration || 0;
     const draftMetaInfo = {
       cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
       draft_cloud_purchase_info: '', draft_cloud_template_id: '', draft_cloud_tutorial_info: '',
@@ -2170,12 +2159,6 @@ ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
     fs.writeFileSync(path.join(newProjectPath, 'draft_meta_info.json'), JSON.stringify(draftMetaInfo));
 
     // Register in root_meta_info.json
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
-    if (fs.existsSync(rootMetaPath)) {
-      try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
-    }
-
     const newDraftEntry = {
       cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
       draft_cloud_purchase_info: '', draft_cloud_template_id: '', draft_cloud_tutorial_info: '',
@@ -2191,12 +2174,10 @@ ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
       tm_draft_removed: 0, tm_duration: duration
     };
 
-    rootMeta.all_draft_store.unshift(newDraftEntry);
-    rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
-    fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
+    await registerRootMetaEntry(capCutDrafts, newDraftEntry);
 
     // Ensure all project files use consistent draft_id
-    ensureConsistentDraftId(newProjectPath, capCutDrafts);
+    await ensureConsistentDraftId(newProjectPath, capCutDrafts);
 
     console.log(`Project copied to local: ${newProjectName}`);
     return { success: true, localPath: newProjectPath, projectName: newProjectName };
@@ -2207,6 +2188,9 @@ ipcMain.handle('copy-project-to-local', async (_, { projectPath }) => {
 });
 
 // ============ MERGE PROJECTS ============
+// A mesclagem roda no sync_engine.py (acao 'merge'), em processo separado: le um projeto de origem
+// por vez, remapeia os ids e monta o draft_content.json em streaming. Aqui ficam so o nome,
+// os arquivos de info e o registro no root_meta_info.json
 ipcMain.handle('merge-projects', async (_, { projectPaths, outputName, mode = 'flat' }) => {
   try {
     const capCutDrafts = path.join(app.getPath('appData'), '..', 'Local', 'CapCut', 'User Data', 'Projects', 'com.lveditor.draft');
@@ -2232,495 +2216,21 @@ ipcMain.handle('merge-projects', async (_, { projectPaths, outputName, mode = 'f
       return { error: 'Já existe um projeto com esse nome' };
     }
 
-    // Create project folder
-    fs.mkdirSync(projectPath, { recursive: true });
-
-    // Read all source projects
-    const sourceProjects = [];
-    for (const srcPath of projectPaths) {
-      const draftPath = path.join(srcPath, 'draft_content.json');
-      if (!fs.existsSync(draftPath)) {
-        return { error: `Projeto não encontrado: ${path.basename(srcPath)}` };
-      }
-      const content = JSON.parse(fs.readFileSync(draftPath, 'utf-8'));
-
-      // Fix text content format - CapCut expects styles first, not text
-      // When content starts with {"text":, CapCut wraps it in another {"text":} layer
-      if (content.materials?.texts) {
-        content.materials.texts = content.materials.texts.map(txt => {
-          if (txt.content && typeof txt.content === 'string') {
-            try {
-              const parsed = JSON.parse(txt.content);
-              // Reorder: styles first, then text, then other properties
-              if (parsed.text && parsed.styles) {
-                const reordered = {
-                  styles: parsed.styles,
-                  text: parsed.text
-                };
-                // Copy any other properties
-                for (const key of Object.keys(parsed)) {
-                  if (key !== 'styles' && key !== 'text') {
-                    reordered[key] = parsed[key];
-                  }
-                }
-                txt.content = JSON.stringify(reordered);
-              }
-            } catch (e) {
-              // Keep original if can't parse
-            }
-          }
-          return txt;
-        });
-      }
-
-      sourceProjects.push({
-        path: srcPath,
-        name: path.basename(srcPath),
-        content
-      });
-    }
-
-    // Use first project as base for canvas config
-    const baseProject = sourceProjects[0].content;
-
-    // Create merged project structure
-    const mergedProject = {
-      canvas_config: baseProject.canvas_config || { height: 1080, width: 1920, ratio: 'original' },
-      color_space: baseProject.color_space || 0,
-      config: baseProject.config || {},
-      cover: null,
-      create_time: Math.floor(timestamp / 1000),
-      draft_type: 'video',
-      duration: 0,
-      extra_info: null,
-      fps: baseProject.fps || 30.0,
-      free_render_index_mode_on: false,
-      function_assistant_info: baseProject.function_assistant_info || {},
-      group_container: null,
-      id: newDraftId,
-      is_drop_frame_timecode: false,
-      keyframe_graph_list: [],
-      keyframes: { adjusts: [], audios: [], effects: [], filters: [], handwrites: [], stickers: [], texts: [], videos: [] },
-      last_modified_platform: baseProject.last_modified_platform || {},
-      lyrics_effects: [],
-      materials: {
-        ai_translates: [], audio_balances: [], audio_effects: [], audio_fades: [],
-        audio_pannings: [], audio_pitch_shifts: [], audio_track_indexes: [], audios: [],
-        beats: [], canvases: [], chromas: [], color_curves: [], common_mask: [],
-        digital_human_model_dressing: [], digital_humans: [], drafts: [], effects: [],
-        filter_mask_infos: [], filters: [], green_screens: [], handwrites: [],
-        hsl: [], images: [], log_color_wheels: [], loudnesses: [], manual_deformations: [],
-        material_animations: [], material_colors: [], material_group_infos: [],
-        multi_language_refs: [], placeholder_infos: [], plugin_contexts: [],
-        primary_color_wheels: [], realtime_denoises: [], shape_masks: [], shapes: [],
-        smart_crops: [], smart_relights: [], sound_channel_mappings: [], speeds: [],
-        stickers: [], tail_leaders: [], text_templates: [], texts: [], time_marks: [],
-        transitions: [], video_effects: [], video_trackings: [], videos: [],
-        vocal_separations: []
-      },
-      mutable_config: null,
-      name: projectName,
-      new_version: '',
-      platform: baseProject.platform || {},
-      relationships: [],
-      render_index_track_mode_on: false,
-      retouch_cover: null,
-      source: 'default',
-      static_cover_image_path: '',
-      tracks: mode === 'groups' ? [{ type: 'video', segments: [], attribute: 0, flag: 0, id: generateUUID() }] : [],
-      update_time: Math.floor(timestamp / 1000),
-      version: 360000
-    };
-
-    // ========== FLAT MODE: Merge all tracks directly ==========
-    if (mode === 'flat') {
-      let currentTimeOffset = 0;
-      const idMapping = {}; // Map old IDs to new IDs
-
-      for (const srcProject of sourceProjects) {
-        const srcContent = srcProject.content;
-        const projectDuration = srcContent.duration || 0;
-
-        // Copy all materials with new IDs
-        const materialTypes = [
-          'videos', 'audios', 'texts', 'text_templates', 'effects', 'filters',
-          'transitions', 'stickers', 'canvases', 'speeds', 'sound_channel_mappings',
-          'vocal_separations', 'material_colors', 'placeholder_infos', 'beats',
-          'audio_fades', 'audio_effects', 'loudnesses', 'material_animations'
-        ];
-
-        for (const matType of materialTypes) {
-          if (srcContent.materials?.[matType]) {
-            for (const mat of srcContent.materials[matType]) {
-              const newId = generateUUID();
-              idMapping[mat.id] = newId;
-              const newMat = { ...mat, id: newId };
-              if (!mergedProject.materials[matType]) {
-                mergedProject.materials[matType] = [];
-              }
-              mergedProject.materials[matType].push(newMat);
-            }
-          }
-        }
-
-        // Copy and offset all tracks
-        for (const srcTrack of (srcContent.tracks || [])) {
-          // Find or create track of same type
-          let targetTrack = mergedProject.tracks.find(t => t.type === srcTrack.type);
-          if (!targetTrack) {
-            targetTrack = {
-              type: srcTrack.type,
-              segments: [],
-              attribute: srcTrack.attribute || 0,
-              flag: srcTrack.flag || 0,
-              id: generateUUID()
-            };
-            mergedProject.tracks.push(targetTrack);
-          }
-
-          // Copy segments with offset and mapped IDs
-          for (const seg of (srcTrack.segments || [])) {
-            const newSeg = JSON.parse(JSON.stringify(seg)); // Deep clone
-            newSeg.id = generateUUID();
-
-            // Offset timing
-            if (newSeg.target_timerange) {
-              newSeg.target_timerange.start = (newSeg.target_timerange.start || 0) + currentTimeOffset;
-            }
-
-            // Map material IDs
-            if (newSeg.material_id && idMapping[newSeg.material_id]) {
-              newSeg.material_id = idMapping[newSeg.material_id];
-            }
-
-            // Map extra_material_refs
-            if (newSeg.extra_material_refs) {
-              newSeg.extra_material_refs = newSeg.extra_material_refs.map(ref => idMapping[ref] || ref);
-            }
-
-            targetTrack.segments.push(newSeg);
-          }
-        }
-
-        currentTimeOffset += projectDuration;
-      }
-
-      mergedProject.duration = currentTimeOffset;
-
-      // Copy media files from each source project to merged project
-      console.log('Copying media files from source projects...');
-      let totalCopied = 0;
-      for (const srcProject of sourceProjects) {
-        // Copy all media files from source folder
-        const copied = copyProjectMedia(srcProject.path, projectPath);
-        totalCopied += copied;
-
-        // Get the old placeholder ID from source project
-        const oldPlaceholderId = extractPlaceholderId(srcProject.content);
-        if (oldPlaceholderId) {
-          console.log(`Replacing placeholders: ${oldPlaceholderId} -> ${newDraftId}`);
-          // Update mergedProject with replaced placeholders
-          const updatedContent = replacePlaceholders(mergedProject, oldPlaceholderId, newDraftId);
-          Object.assign(mergedProject, updatedContent);
-        }
-      }
-      console.log(`Total media files copied: ${totalCopied}`);
-
-      // Save and register project (same as groups mode below)
-      const draftPath = path.join(projectPath, 'draft_content.json');
-      fs.writeFileSync(draftPath, JSON.stringify(mergedProject));
-
-      // Create draft_info.json
-      const draftInfo = {
-        draft_cloud_capcut_purchase_info: null, draft_cloud_purchase_info: null, draft_cloud_template_id: '',
-        draft_cloud_tutorial_info: null, draft_cloud_videocut_purchase_info: null, draft_cover: '', draft_deeplink_url: '',
-        draft_enterprise_info: null, draft_fold_path: projectPath, draft_id: newDraftId, draft_is_ai_shorts: false,
-        draft_is_article_video_draft: false, draft_is_from_deeplink: false, draft_is_invisible: false, draft_materials_copied: false,
-        draft_materials_copied_path: null, draft_name: projectName, draft_new_version: '', draft_removable_storage_device: '',
-        draft_root_path: capCutDrafts, draft_segment_extra_info: null, draft_timeline_materials_size: 0, draft_type: 'normal',
-        tm_draft_cloud_completed: null, tm_draft_cloud_modified: 0, tm_draft_create: Math.floor(timestamp / 1000),
-        tm_draft_modified: Math.floor(timestamp / 1000), tm_draft_removed: 0
-      };
-      fs.writeFileSync(path.join(projectPath, 'draft_info.json'), JSON.stringify(draftInfo, null, 2));
-
-      // Create draft_meta_info.json
-      const draftMetaInfo = {
-        cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
-        draft_cloud_purchase_info: '', draft_cloud_template_id: '', draft_cloud_tutorial_info: '',
-        draft_cloud_videocut_purchase_info: '', draft_cover: '',
-        draft_enterprise_info: { draft_enterprise_extra: '', draft_enterprise_id: '', draft_enterprise_name: '', enterprise_material: [] },
-        draft_fold_path: projectPath.replace(/\\/g, '/'), draft_id: newDraftId,
-        draft_is_ai_shorts: false, draft_is_article_video_draft: false, draft_is_cloud_temp_draft: false,
-        draft_is_from_deeplink: 'false', draft_is_invisible: false, draft_is_web_article_video: false,
-        draft_materials: [
-          { type: 0, value: [] }, { type: 1, value: [] }, { type: 2, value: [] },
-          { type: 3, value: [] }, { type: 6, value: [] }, { type: 7, value: [] }, { type: 8, value: [] }
-        ],
-        draft_materials_copied_info: [], draft_name: projectName, draft_need_rename_folder: false,
-        draft_new_version: '', draft_removable_storage_device: '',
-        draft_root_path: capCutDrafts.replace(/\\/g, '/'), draft_segment_extra_info: [],
-        draft_timeline_materials_size_: 0, draft_type: '',
-        tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp, tm_draft_removed: 0, tm_duration: currentTimeOffset
-      };
-      fs.writeFileSync(path.join(projectPath, 'draft_meta_info.json'), JSON.stringify(draftMetaInfo));
-
-      // Register in root_meta_info.json
-      const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-      let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
-      if (fs.existsSync(rootMetaPath)) {
-        try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
-      }
-
-      const newDraftEntry = {
-        cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
-        draft_cloud_purchase_info: '', draft_cloud_template_id: '', draft_cloud_tutorial_info: '',
-        draft_cloud_videocut_purchase_info: '', draft_cover: '',
-        draft_fold_path: projectPath.replace(/\\/g, '/'), draft_id: newDraftId,
-        draft_is_ai_shorts: false, draft_is_cloud_temp_draft: false, draft_is_invisible: false,
-        draft_is_web_article_video: false, draft_json_file: draftPath.replace(/\\/g, '/'),
-        draft_name: projectName, draft_new_version: '', draft_root_path: capCutDrafts.replace(/\\/g, '/'),
-        draft_timeline_materials_size: 0, draft_type: '', draft_web_article_video_enter_from: '',
-        streaming_edit_draft_ready: true, tm_draft_cloud_completed: '', tm_draft_cloud_entry_id: -1,
-        tm_draft_cloud_modified: 0, tm_draft_cloud_parent_entry_id: -1, tm_draft_cloud_space_id: -1,
-        tm_draft_cloud_user_id: -1, tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp,
-        tm_draft_removed: 0, tm_duration: currentTimeOffset
-      };
-
-      rootMeta.all_draft_store.unshift(newDraftEntry);
-      rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
-      fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
-
-      // Ensure all project files use consistent draft_id
-      ensureConsistentDraftId(projectPath, capCutDrafts);
-
-      return {
-        success: true,
-        path: projectPath,
-        name: projectName,
-        draftPath: draftPath,
-        projectCount: sourceProjects.length,
-        totalDuration: currentTimeOffset
-      };
-    }
-
-    // ========== GROUPS MODE: Create composite clips ==========
-
-    // Create subdraft folder for groups (like CapCut does manually)
-    const subdraftFolder = path.join(projectPath, 'subdraft');
-    fs.mkdirSync(subdraftFolder, { recursive: true });
-
-    // Process each source project and convert to a group
-    let currentTime = 0;
-    let clipNumber = 1;
-
-    for (const srcProject of sourceProjects) {
-      const srcContent = srcProject.content;
-      const projectDuration = srcContent.duration || 0;
-
-      // Generate unique IDs
-      const draftId = generateUUID();
-      const subdraftId = generateUUID();
-      const combinationId = generateUUID();
-      const videoMaterialId = generateUUID();
-      const segmentId = generateUUID();
-      const canvasId = generateUUID();
-      const speedId = generateUUID();
-      const soundChannelId = generateUUID();
-      const placeholderInfoId = generateUUID();
-      const materialColorId = generateUUID();
-      const vocalSeparationId = generateUUID();
-
-      // Create subdraft folder and save draft content (like CapCut does)
-      const subdraftPath = path.join(subdraftFolder, subdraftId);
-      fs.mkdirSync(subdraftPath, { recursive: true });
-
-      // Copy media files from source project folder to merged project folder
-      console.log(`Copying media files for subdraft ${clipNumber}...`);
-      const subdraftMediaCount = copyProjectMedia(srcProject.path, projectPath);
-      console.log(`Subdraft ${clipNumber} media copy complete: ${subdraftMediaCount} files`);
-
-      // Replace placeholders in srcContent to point to new project
-      const oldPlaceholderId = extractPlaceholderId(srcContent);
-      let updatedSrcContent = srcContent;
-      if (oldPlaceholderId) {
-        console.log(`Replacing placeholders in subdraft: ${oldPlaceholderId} -> ${newDraftId}`);
-        updatedSrcContent = replacePlaceholders(srcContent, oldPlaceholderId, newDraftId);
-      }
-
-      fs.writeFileSync(path.join(subdraftPath, 'draft_content.json'), JSON.stringify(updatedSrcContent));
-
-      // Create sub_draft_config.json
-      const subDraftConfig = {
-        draft_id: subdraftId,
-        name: '',
-        type: 'combination'
-      };
-      fs.writeFileSync(path.join(subdraftPath, 'sub_draft_config.json'), JSON.stringify(subDraftConfig));
-
-      // Build draft_file_path like CapCut does (with placeholder)
-      const draftFilePath = `##_draftpath_placeholder_${newDraftId}_##\\subdraft\\${subdraftId}\\draft_content.json`;
-
-      // Create draft entry (the group content) - must match CapCut's expected structure
-      const draftEntry = {
-        aimusic_mv_template_info: null,
-        category_id: '',
-        category_name: '',
-        combination_id: combinationId,
-        combination_type: 'none',
-        draft: updatedSrcContent,
-        draft_config_path: '',
-        draft_cover_path: '',
-        draft_file_path: draftFilePath,
-        formula_id: '',
-        id: draftId,
-        name: '',
-        precompile_combination: false,
-        type: 'combination'
-      };
-      mergedProject.materials.drafts.push(draftEntry);
-
-      // Create canvas for this segment
-      const canvasEntry = {
-        album_image: '', blur: 0.0, color: '', id: canvasId,
-        image: '', image_id: '', image_name: '', source_platform: 0, team_id: '', type: 'canvas_color'
-      };
-      mergedProject.materials.canvases.push(canvasEntry);
-
-      // Create speed entry
-      const speedEntry = {
-        curve_speed: null, id: speedId, mode: 0, speed: 1.0, type: 'speed'
-      };
-      mergedProject.materials.speeds.push(speedEntry);
-
-      // Create sound channel mapping
-      const soundChannelEntry = {
-        audio_channel_mapping: 0, id: soundChannelId, is_config_open: false, type: ''
-      };
-      mergedProject.materials.sound_channel_mappings.push(soundChannelEntry);
-
-      // Create placeholder info
-      const placeholderInfoEntry = {
-        error_path: '', id: placeholderInfoId, meta_type: '', res_path: '', res_request_id: '', resource_id: '', source_from: '', source_platform: 0, team_id: '', type: 'placeholder_info'
-      };
-      mergedProject.materials.placeholder_infos.push(placeholderInfoEntry);
-
-      // Create material color
-      const materialColorEntry = {
-        color_lut_path_list: [], color_model_lut_path_list: [], color_model_path: '', enable_skin_tone_restore: false, enable_smart: 0, formula_id: '', id: materialColorId, intensity: 1.0, path: '', skin_tone_restore_path: '', type: 'material_color'
-      };
-      mergedProject.materials.material_colors.push(materialColorEntry);
-
-      // Create vocal separation
-      const vocalSeparationEntry = {
-        choice: 0, enter_from: '', final_algorithm: '', id: vocalSeparationId, production_path: '', removed_sounds: [], time_range: null, type: 'vocal_separation'
-      };
-      mergedProject.materials.vocal_separations.push(vocalSeparationEntry);
-
-      // Create video material for the group (composite clip)
-      const videoMaterial = {
-        aigc_history_id: '', aigc_item_id: '', aigc_type: 'none',
-        audio_fade: null, beauty_body_auto_preset: null, beauty_body_preset_id: '',
-        beauty_face_auto_preset: { name: '', preset_id: '', rate_map: '', scene: '' },
-        beauty_face_auto_preset_infos: [], beauty_face_preset_infos: [],
-        cartoon_path: '', category_id: '', category_name: '', check_flag: 62978047,
-        content_feature_info: null, corner_pin: null,
-        crop: { lower_left_x: 0, lower_left_y: 1, lower_right_x: 1, lower_right_y: 1, upper_left_x: 0, upper_left_y: 0, upper_right_x: 1, upper_right_y: 0 },
-        crop_ratio: 'free', crop_scale: 1,
-        duration: projectDuration,
-        extra_type_option: 2,  // KEY: This marks it as a composite clip/group
-        formula_id: '', freeze: null,
-        has_audio: true, has_sound_separated: false,
-        height: srcContent.canvas_config?.height || 1080,
-        id: videoMaterialId,
-        intensifies_audio_path: '', intensifies_path: '',
-        is_ai_generate_content: false, is_copyright: false, is_text_edit_overdub: false,
-        is_unified_beauty_mode: false, live_photo_cover_path: '', live_photo_timestamp: -1,
-        local_id: '', local_material_from: '', local_material_id: '',
-        material_id: '',
-        material_name: `Clipe composto${clipNumber}`,  // Name shown in CapCut
-        material_url: '',
-        matting: { custom_matting_id: '', enable_matting_stroke: false, expansion: 0, feather: 0, flag: 0, has_use_quick_brush: false, has_use_quick_eraser: false, interactiveTime: [], path: '', reverse: false, strokes: [] },
-        media_path: '', multi_camera_info: null, object_locked: null, origin_material_id: '',
-        path: '',  // KEY: Empty path indicates it's a group
-        picture_from: 'none', picture_set_category_id: '', picture_set_category_name: '',
-        request_id: '', reverse_intensifies_path: '', reverse_path: '',
-        smart_match_info: null, smart_motion: null, source: 0, source_platform: 0,
-        stable: { matrix_path: '', stable_level: 0, time_range: { duration: 0, start: 0 } },
-        team_id: '', type: 'video',
-        video_algorithm: { ai_background_configs: [], algorithms: [], path: '', time_range: null },
-        width: srcContent.canvas_config?.width || 1920
-      };
-      mergedProject.materials.videos.push(videoMaterial);
-
-      // Create segment referencing the group
-      const segment = {
-        caption_info: null,
-        cartoon: false,
-        clip: { alpha: 1, flip: { horizontal: false, vertical: false }, rotation: 0, scale: { x: 1, y: 1 }, transform: { x: 0, y: 0 } },
-        common_keyframes: [],
-        enable_adjust: true,
-        enable_color_correct_adjust: false,
-        enable_color_curves: true,
-        enable_color_match_adjust: false,
-        enable_color_wheels: true,
-        enable_lut: true,
-        enable_smart_color_adjust: false,
-        extra_material_refs: [
-          draftId,           // Reference to the draft entry (group content)
-          speedId,           // Speed control
-          placeholderInfoId, // Placeholder info
-          canvasId,          // Canvas/background
-          soundChannelId,    // Sound channel mapping
-          materialColorId,   // Material color
-          vocalSeparationId  // Vocal separation
-        ],
-        group_id: '',
-        hdr_settings: { intensity: 1, mode: 1, nits: 1000 },
-        id: segmentId,
-        intensifies_audio: false,
-        is_placeholder: false,
-        is_tone_modify: false,
-        keyframe_refs: [],
-        last_nonzero_volume: 1,
-        material_id: videoMaterialId,
-        render_index: 0,
-        responsive_layout: { enable: false, horizontal_pos_layout: 0, size_layout: 0, target_follow: '', vertical_pos_layout: 0 },
-        reverse: false,
-        source_timerange: { duration: projectDuration, start: 0 },
-        speed: 1,
-        state: 0,
-        target_timerange: { duration: projectDuration, start: currentTime },
-        template_id: '',
-        template_scene: 'default',
-        track_attribute: 0,
-        track_render_index: 0,
-        uniform_scale: { on: true, value: 1 },
-        visible: true,
-        volume: 1
-      };
-      mergedProject.tracks[0].segments.push(segment);
-
-      currentTime += projectDuration;
-      clipNumber++;
-    }
-
-    // Set total duration
-    mergedProject.duration = currentTime;
-
-    // Debug: log drafts count
-    console.log('Merge: Total drafts created:', mergedProject.materials.drafts.length);
-    console.log('Merge: Total videos created:', mergedProject.materials.videos.length);
-
-    // DEBUG: Check content before save
-    if (mergedProject.materials.drafts[0]?.draft?.materials?.texts?.[0]?.content) {
-      console.log('DEBUG MERGE - Before save, draft[0] texts[0].content first 60:', mergedProject.materials.drafts[0].draft.materials.texts[0].content.substring(0, 60));
+    const merged = await runPythonScript('sync_engine.py', {
+      action: 'merge',
+      projectPaths,
+      outputPath: projectPath,
+      mode: mode === 'groups' ? 'groups' : 'flat',
+      draftId: newDraftId,
+      projectName
+    });
+    if (!merged.success) {
+      return { error: merged.error || 'Falha ao mesclar projetos' };
     }
+    (merged.logs || []).forEach(line => console.log('[Merge]', line));
 
-    // Save draft_content.json
-    const draftPath = path.join(projectPath, 'draft_content.json');
-    const jsonString = JSON.stringify(mergedProject);
-    console.log('Merge: JSON size:', jsonString.length, 'bytes');
-    fs.writeFileSync(draftPath, jsonString);
+    const draftPath = merged.draftPath;
+    const totalDuration = merged.totalDuration;
 
     // Create draft_info.json
     const draftInfo = {
@@ -2752,17 +2262,11 @@ ipcMain.handle('merge-projects', async (_, { projectPaths, outputName, mode = 'f
       draft_new_version: '', draft_removable_storage_device: '',
       draft_root_path: capCutDrafts.replace(/\\/g, '/'), draft_segment_extra_info: [],
       draft_timeline_materials_size_: 0, draft_type: '',
-      tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp, tm_draft_removed: 0, tm_duration: currentTime
+      tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp, tm_draft_removed: 0, tm_duration: totalDuration
     };
     fs.writeFileSync(path.join(projectPath, 'draft_meta_info.json'), JSON.stringify(draftMetaInfo));
 
     // Register in root_meta_info.json
-    const rootMetaPath = path.join(capCutDrafts, 'root_meta_info.json');
-    let rootMeta = { all_draft_store: [], draft_ids: 0, root_path: capCutDrafts.replace(/\\/g, '/') };
-    if (fs.existsSync(rootMetaPath)) {
-      try { rootMeta = JSON.parse(fs.readFileSync(rootMetaPath, 'utf-8')); } catch (e) { console.error('Error reading root_meta_info:', e); }
-    }
-
     const newDraftEntry = {
       cloud_draft_cover: true, cloud_draft_sync: true, draft_cloud_last_action_download: false,
       draft_cloud_purchase_info: '', draft_cloud_template_id: '', draft_cloud_tutorial_info: '',
@@ -2775,23 +2279,21 @@ ipcMain.handle('merge-projects', async (_, { projectPaths, outputName, mode = 'f
       streaming_edit_draft_ready: true, tm_draft_cloud_completed: '', tm_draft_cloud_entry_id: -1,
       tm_draft_cloud_modified: 0, tm_draft_cloud_parent_entry_id: -1, tm_draft_cloud_space_id: -1,
       tm_draft_cloud_user_id: -1, tm_draft_create: microTimestamp, tm_draft_modified: microTimestamp,
-      tm_draft_removed: 0, tm_duration: currentTime
+      tm_draft_removed: 0, tm_duration: totalDuration
     };
 
-    rootMeta.all_draft_store.unshift(newDraftEntry);
-    rootMeta.draft_ids = (rootMeta.draft_ids || 0) + 1;
-    fs.writeFileSync(rootMetaPath, JSON.stringify(rootMeta));
+    await registerRootMetaEntry(capCutDrafts, newDraftEntry);
 
     // Ensure all project files use consistent draft_id
-    ensureConsistentDraftId(projectPath, capCutDrafts);
+    await ensureConsistentDraftId(projectPath, capCutDrafts);
 
     return {
       success: true,
       path: projectPath,
       name: projectName,
       draftPath: draftPath,
-      projectCount: sourceProjects.length,
-      totalDuration: currentTime
+      projectCount: merged.projectCount,
+      totalDuration
     };
   } catch (error) {
     console.error('Error merging projects:', error);
@@ -3076,14 +2578,14 @@ ipcMain.handle('clean-subtitles', async (_, { projectPath }) => {
 });
 
 // ============ PROJECT EXPORT/IMPORT ============
-// Helper function to run project_manager.py
-function runProjectManager(params) {
+// Helper function to run a python/ script that takes a JSON command file and prints a JSON result
+function runPythonScript(scriptName, params) {
   return new Promise((resolve) => {
     const basePath = app.isPackaged
       ? process.resourcesPath
       : process.cwd();
-    const pythonScript = path.join(basePath, 'python', 'project_manager.py');
-    const tempFile = path.join(app.getPath('temp'), `project_cmd_${Date.now()}.json`);
+    const pythonScript = path.join(basePath, 'python', scriptName);
+    const tempFile = path.join(app.getPath('temp'), `project_cmd_${Date.now()}_${Math.random().toString(36).slice(2, 8)}.json`);
 
     fs.writeFileSync(tempFile, JSON.stringify(params));
 
@@ -3113,6 +2615,10 @@ function runProjectManager(params) {
   });
 }
 
+function runProjectManager(params) {
+  return runPythonScript('project_manager.py', params);
+}
+
 // Export project to ZIP
 ipcMain.handle('export-project', async (_, { draftPath }) => {
   console.log('[Export] Iniciando export para:', draftPath);